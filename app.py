@@ -1,23 +1,23 @@
 import os
-import sys
 import logging
 import argparse
 from dotenv import load_dotenv
 from flask import Flask
 from config import Config
 from extensions import db, bootstrap, limiter, migrate
-from models import Client, Sill, Settings, MaterialPrices, DefaultSettings
+from models import Client, Sill, Settings, MaterialPrices, DefaultSettings, ContractJob, OrderNumberSequence, Offcut, BoardStock, DataVersion, ClientJobSummary
 from routes import register_routes
+from commands import register_commands
+from contract_jobs import init_contract_jobs
+from preview_store import init_preview_store
+from response_cache import init_response_cache
+from metrics import init_metrics
+from sql_profiler import init_sql_profiler
+from job_summary import init_job_summaries
+from search_index import install_search_index
+from logging_config import configure_logging
+from sqlite_profile import configure_engine_options, register_pragmas, check_pragmas, is_sqlite_file
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('app.log', encoding='utf-8')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def parse_arguments():
@@ -43,18 +43,30 @@ def create_app(config_class=Config):
     """Create and configure the Flask application."""
     app = Flask(__name__, static_url_path='', static_folder='static')
     app.config.from_object(config_class)
+    configure_logging(app.config)
 
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
     # Initialize extensions
+    configure_engine_options(app)
     db.init_app(app)
+    register_pragmas(app)
     bootstrap.init_app(app)
     limiter.init_app(app)
     migrate.init_app(app, db)
+    init_response_cache(app)
+    init_metrics(app)
+    init_sql_profiler(app)
+    init_job_summaries(app)
 
-    # Register routes
+    # Background contract analysis queue and per-upload previews
+    init_contract_jobs(app)
+    init_preview_store(app)
+
+    # Register routes and CLI commands
     register_routes(app)
+    register_commands(app)
 
     return app
 
@@ -66,12 +78,14 @@ def init_db_connection(app):
             logger.info("Database connection test:")
             result = connection.execute(db.text("SELECT sqlite_version()"))
             version = result.scalar()
-            logger.info(f"Database version: {version}")
+            logger.info("Database version: %s", version)
             connection.close()
-            return True
+        if is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+            check_pragmas(app)
+        return True
     except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
-        logger.error(f"Connection string: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        logger.error("Database connection error: %s", e)
+        logger.error("Connection string: %s", app.config['SQLALCHEMY_DATABASE_URI'])
         return False
 
 def auto_manage_database(app):
@@ -85,11 +99,14 @@ def auto_manage_database(app):
             # Check database version
             result = connection.execute(db.text("SELECT sqlite_version()"))
             version = result.scalar()
-            logger.info(f"Database version: {version}")
+            logger.info("Database version: %s", version)
             
             # Create tables if they don't exist (don't drop existing ones)
             logger.info("Creating tables if they don't exist...")
             db.create_all()
+            with db.engine.begin() as search_connection:
+                if install_search_index(search_connection):
+                    logger.info("Created client search index")
             
             # Initialize default data
             logger.info("Initializing default data...")
@@ -120,14 +137,14 @@ def auto_manage_database(app):
                         fixall_per_meter=default_settings.fixall_per_meter,
                         glue_color_extra=default_settings.glue_color_extra
                     )
-                    logger.info(f"Created settings from saved defaults: cutting_allowance={default_settings.cutting_allowance}, glue_color_extra={default_settings.glue_color_extra}")
+                    logger.info("Created settings from saved defaults: cutting_allowance=%s, glue_color_extra=%s", default_settings.cutting_allowance, default_settings.glue_color_extra)
                 else:
                     # Use built-in default settings
                     settings = Settings()
-                    logger.info(f"Created built-in default settings: cutting_allowance={settings.cutting_allowance}, glue_color_extra={settings.glue_color_extra}")
+                    logger.info("Created built-in default settings: cutting_allowance=%s, glue_color_extra=%s", settings.cutting_allowance, settings.glue_color_extra)
                 db.session.add(settings)
             else:
-                logger.info(f"Existing settings found: cutting_allowance={existing_settings.cutting_allowance}, glue_color_extra={existing_settings.glue_color_extra}")
+                logger.info("Existing settings found: cutting_allowance=%s, glue_color_extra=%s", existing_settings.cutting_allowance, existing_settings.glue_color_extra)
             
             # Add default settings template
             if not DefaultSettings.query.first():
@@ -142,10 +159,21 @@ def auto_manage_database(app):
             return True
             
         except Exception as e:
-            logger.error(f"Database management error: {str(e)}")
+            logger.error("Database management error: %s", e)
             db.session.rollback()
             return False
 
+def initialize_database(app):
+    """Check the connection and create tables and default data; run once per deployment."""
+    if not init_db_connection(app):
+        logger.error("Could not start application due to database connection error")
+        return False
+    if not auto_manage_database(app):
+        logger.error("Failed to manage database")
+        return False
+    logger.info("Database management completed successfully")
+    return True
+
 if __name__ == '__main__':
     # Parse command line arguments
     args = parse_arguments()
@@ -153,8 +181,11 @@ if __name__ == '__main__':
     # Set OpenAI API key from command line if provided
     if args.openai_key:
         os.environ['OPENAI_API_KEY'] = args.openai_key
+    
+    # Development server; production runs through gunicorn (see wsgi.py and gunicorn.conf.py)
+    app = create_app()
+    if args.openai_key:
         logger.info("OpenAI API key set from command line argument")
-        logger.info(f"API key: {args.openai_key[:10]}...{args.openai_key[-4:] if len(args.openai_key) > 14 else '***'}")
     
     # Check if OpenAI API key is available
     openai_key = os.getenv('OPENAI_API_KEY')
@@ -167,13 +198,6 @@ if __name__ == '__main__':
         logger.info("  2. Use command line: python app.py --openai-key YOUR_API_KEY")
         logger.info("  3. Create .env file with: OPENAI_API_KEY=your-api-key")
     
-    app = create_app()
-    if init_db_connection(app):
-        if auto_manage_database(app):
-            logger.info("Database management completed successfully")
-            logger.info(f"Starting application on {args.host}:{args.port}")
-            app.run(host=args.host, port=args.port, debug=args.debug)
-        else:
-            logger.error("Failed to manage database")
-    else:
-        logger.error("Could not start application due to database connection error")
+    if initialize_database(app):
+        logger.info("Starting application on %s:%s", args.host, args.port)
+        app.run(host=args.host, port=args.port, debug=args.debug)
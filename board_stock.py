@@ -0,0 +1,117 @@
+"""Board stock catalogue: the lengths each board type is bought in, and their prices.
+
+Layouts, material counts and prices all take board sizes from here.
+Board types with no BoardStock rows are bought in Settings.plate_length
+at the per-board price from MaterialPrices, so a shop without a catalogue
+gets one consistent board length everywhere.
+"""
+import bisect
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from cutting_optimizer import EPSILON
+
+DEFAULT_BOARD_LENGTH = 6000.0  # mm, the Settings.plate_length default
+
+BOARD_TYPES = [
+    'GP Board',
+    'Capit Board 150mm',
+    'Capit Board 175mm',
+    'Capit Board 225mm',
+    'Capit Board 250mm',
+    'Capit Board 300mm',
+    '95mm Board',
+]
+
+# MaterialPrices field priced for a board type that has no stock rows
+_FALLBACK_PRICE_FIELDS = {'GP Board': 'gp_board_price', '95mm Board': 'board_95mm_price'}
+
+
+@dataclass(frozen=True)
+class StockLength:
+    length: float  # mm
+    price: float
+
+
+def board_type(board_name: str) -> str:
+    """'Capit Board 250mm - Oak' -> 'Capit Board 250mm'."""
+    return board_name.split(' - ', 1)[0]
+
+
+def _fallback_price(kind: str, prices) -> float:
+    if prices is None:
+        return 0.0
+    return getattr(prices, _FALLBACK_PRICE_FIELDS.get(kind, 'capit_board_price'))
+
+
+@dataclass(frozen=True)
+class StockCatalogue:
+    # Board type -> stock lengths, shortest first
+    entries: Mapping[str, Tuple[StockLength, ...]] = field(default_factory=dict)
+    default_length: float = DEFAULT_BOARD_LENGTH
+    default_prices: Mapping[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[str, float, float]], settings=None, prices=None) -> 'StockCatalogue':
+        """From (board_type, length, price) rows plus the settings and prices fallbacks."""
+        entries: Dict[str, List[StockLength]] = {}
+        for kind, length, price in rows:
+            entries.setdefault(kind, []).append(StockLength(float(length), float(price)))
+        return cls(
+            entries={kind: tuple(sorted(options, key=lambda o: (o.length, o.price)))
+                     for kind, options in entries.items()},
+            default_length=float(settings.plate_length) if settings else DEFAULT_BOARD_LENGTH,
+            default_prices={kind: _fallback_price(kind, prices) for kind in BOARD_TYPES},
+        )
+
+    @classmethod
+    def uniform(cls, length: float) -> 'StockCatalogue':
+        """Every board bought in one length, with no prices."""
+        return cls(default_length=float(length))
+
+    def options(self, board_name: str) -> Tuple[StockLength, ...]:
+        kind = board_type(board_name)
+        options = self.entries.get(kind)
+        if options:
+            return options
+        return (StockLength(self.default_length, self.default_prices.get(kind, 0.0)),)
+
+    def max_length(self, board_name: str) -> float:
+        return self.options(board_name)[-1].length
+
+    def price_table(self, board_name: str) -> Tuple[List[float], List[float]]:
+        """Stock lengths, shortest first, and for each the cheapest price of any stock at least that long."""
+        options = self.options(board_name)
+        lengths = [option.length for option in options]
+        cheapest = [option.price for option in options]
+        for i in range(len(cheapest) - 2, -1, -1):
+            cheapest[i] = min(cheapest[i], cheapest[i + 1])
+        return lengths, cheapest
+
+    def piece_cost(self, board_name: str, length: float) -> float:
+        """Price of the boards bought for one piece on its own.
+
+        A piece up to the longest stock length costs the cheapest stock it
+        fits on; a longer one takes full longest boards plus the cheapest
+        stock that fits the remainder.
+        """
+        lengths, cheapest = self.price_table(board_name)
+        longest = lengths[-1]
+        full_boards = max(math.ceil(length / longest - EPSILON), 1) - 1
+        remainder = length - full_boards * longest
+        position = min(bisect.bisect_left(lengths, remainder - EPSILON), len(lengths) - 1)
+        return full_boards * cheapest[-1] + cheapest[position]
+
+    def stock_for(self, board_name: str) -> Sequence[Tuple[float, float]]:
+        """(length, price) pairs, the form cutting_optimizer.cheapest_stock_mix takes."""
+        return [(option.length, option.price) for option in self.options(board_name)]
+
+
+def stock_summary(boards: Iterable[Mapping]) -> List[Dict]:
+    """Count layout boards by stock length, longest first, leaving out offcuts."""
+    counts: Dict[float, int] = {}
+    for board in boards:
+        if board.get('offcut_id') is None:
+            counts[board['board_length']] = counts.get(board['board_length'], 0) + 1
+    return [{'length': length, 'count': counts[length]} for length in sorted(counts, reverse=True)]
@@ -0,0 +1,132 @@
+"""Keyset-paginated client listing and prefix search.
+
+Pages are ordered by (last_name, first_name, id), which the ix_client_name
+index (plus the implicit rowid) provides without a sort. A page is fetched
+by seeking past the last row of the previous one, so every page costs the
+same no matter how deep into the list it is and the full table is never
+materialised.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, tuple_
+
+from extensions import db
+from models import Client
+
+DEFAULT_PAGE_SIZE = 50
+AUTOCOMPLETE_LIMIT = 20
+
+Cursor = Tuple[str, str, int]
+
+
+@dataclass
+class ClientPage:
+    clients: List[Client]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(client) -> str:
+    key = [client.last_name, client.first_name, client.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Decode a cursor from a query string; malformed cursors are treated as absent."""
+    if not token:
+        return None
+    try:
+        last_name, first_name, client_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return str(last_name), str(first_name), int(client_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_filter(q: Optional[str]):
+    """Prefix match on first name, last name, postcode, phone or mobile."""
+    term = (q or '').strip()
+    if not term:
+        return None
+
+    pattern = _escape_like(term) + '%'
+    conditions = [
+        Client.first_name.ilike(pattern, escape='\\'),
+        Client.last_name.ilike(pattern, escape='\\'),
+        Client.postal_code.ilike(pattern, escape='\\'),
+    ]
+    # Phone numbers are stored as typed, so match both with and without spaces
+    compact = term.replace(' ', '')
+    for phone_pattern in {pattern, _escape_like(compact) + '%'}:
+        conditions.append(Client.phone.like(phone_pattern, escape='\\'))
+        conditions.append(Client.mobile.like(phone_pattern, escape='\\'))
+    return or_(*conditions)
+
+
+def client_page(q: Optional[str] = None, after: Optional[str] = None, before: Optional[str] = None,
+                limit: int = DEFAULT_PAGE_SIZE) -> ClientPage:
+    """Return one page of clients matching q, seeking after or before a cursor."""
+    key = tuple_(Client.last_name, Client.first_name, Client.id)
+    ordering = [Client.last_name, Client.first_name, Client.id]
+    statement = select(Client)
+
+    condition = search_filter(q)
+    if condition is not None:
+        statement = statement.where(condition)
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    if before_key is not None:
+        # Walk backwards from the cursor, then restore the display order
+        statement = statement.where(key < tuple_(*before_key))
+        statement = statement.order_by(*[column.desc() for column in ordering])
+    else:
+        if after_key is not None:
+            statement = statement.where(key > tuple_(*after_key))
+        statement = statement.order_by(*ordering)
+
+    # One extra row tells us whether there is another page in this direction
+    rows = list(db.session.execute(statement.limit(limit + 1)).scalars())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_key is not None:
+        rows.reverse()
+
+    if not rows:
+        return ClientPage([], None, None)
+
+    if before_key is not None:
+        next_cursor = encode_cursor(rows[-1])
+        prev_cursor = encode_cursor(rows[0]) if has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1]) if has_more else None
+        prev_cursor = encode_cursor(rows[0]) if after_key is not None else None
+    return ClientPage(rows, next_cursor, prev_cursor)
+
+
+def autocomplete_clients(q: Optional[str], limit: int = AUTOCOMPLETE_LIMIT) -> List[Dict]:
+    """Lightweight rows for client pickers; only the columns the picker shows are loaded."""
+    statement = select(Client.id, Client.first_name, Client.last_name,
+                       Client.postal_code, Client.phone)
+    condition = search_filter(q)
+    if condition is not None:
+        statement = statement.where(condition)
+    statement = statement.order_by(Client.last_name, Client.first_name, Client.id).limit(limit)
+
+    return [
+        {
+            'id': row.id,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'postal_code': row.postal_code,
+            'phone': row.phone,
+            'label': f"{row.first_name} {row.last_name} ({row.postal_code})",
+        }
+        for row in db.session.execute(statement)
+    ]
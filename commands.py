@@ -0,0 +1,51 @@
+"""Maintenance commands available through `flask --app wsgi <command>`."""
+from datetime import datetime, timedelta
+
+import click
+
+from extensions import db
+from job_summary import rebuild_job_summaries
+from offcuts import expire_offcuts
+from query_plans import check_query_plans
+from search_index import install_search_index, rebuild_search_index
+
+
+def register_commands(app):
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if a hot route query would scan a whole table."""
+        failed = False
+        for check in check_query_plans():
+            status = 'ok' if check.ok else 'SLOW'
+            click.echo(f"[{status}] {check.name} ({check.routes})")
+            for step in check.plan:
+                click.echo(f"    {step}")
+            failed = failed or not check.ok
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Recreate the client full-text search index from the client and sill tables."""
+        with db.engine.begin() as connection:
+            if not install_search_index(connection):
+                count = rebuild_search_index(connection)
+            else:
+                count = connection.exec_driver_sql("SELECT COUNT(*) FROM client_fts").scalar()
+        click.echo(f"Indexed {count} clients")
+
+    @app.cli.command('rebuild-job-summaries')
+    def rebuild_job_summaries_command():
+        """Recompute every client's job summary from its sills."""
+        count = rebuild_job_summaries()
+        click.echo(f"Rebuilt {count} job summaries")
+
+    @app.cli.command('expire-offcuts')
+    @click.option('--days', type=int, default=None,
+                  help='Age in days (default: OFFCUT_MAX_AGE_DAYS).')
+    def expire_offcuts_command(days):
+        """Expire available offcuts that have been in stock longer than the given age."""
+        days = app.config['OFFCUT_MAX_AGE_DAYS'] if days is None else days
+        count = expire_offcuts(datetime.utcnow() - timedelta(days=days))
+        db.session.commit()
+        click.echo(f"Expired {count} offcuts older than {days} days")
@@ -11,6 +11,18 @@ class Config:
     # Database configuration
     SQLALCHEMY_DATABASE_URI = 'sqlite:///sills.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite engine profile, applied to every connection (see sqlite_profile.py)
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 10))
+    SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', 10))
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),  # negative means KiB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
     
     # File upload configuration
     UPLOAD_FOLDER = 'uploads'
@@ -40,9 +52,86 @@ class Config:
         'Conservatory'
     ]
     
+    # Cutting layout optimizer: 'auto', 'ffd', 'bfd' or 'exact'
+    CUTTING_STRATEGY = os.getenv('CUTTING_STRATEGY', 'auto')
+    
+    # Number of client job plans (layout, materials, costs) memoized per worker
+    JOB_PLAN_CACHE_SIZE = int(os.getenv('JOB_PLAN_CACHE_SIZE', 128))
+    
+    # Most sills one POST /api/what-if request may plan
+    WHAT_IF_MAX_SILLS = int(os.getenv('WHAT_IF_MAX_SILLS', 200))
+    
+    # Offcut inventory: shortest leftover worth stocking (mm), most offcuts looked up
+    # per piece length when planning a layout, and the age at which `flask expire-offcuts` throws them away
+    OFFCUT_MIN_LENGTH = float(os.getenv('OFFCUT_MIN_LENGTH', 300))
+    OFFCUT_CANDIDATES = int(os.getenv('OFFCUT_CANDIDATES', 200))
+    OFFCUT_MAX_AGE_DAYS = int(os.getenv('OFFCUT_MAX_AGE_DAYS', 180))
+    
+    # Clients per page on /clients (keyset paginated)
+    CLIENTS_PAGE_SIZE = int(os.getenv('CLIENTS_PAGE_SIZE', 50))
+    
+    # Maximum results returned by the full-text client search
+    SEARCH_RESULTS_LIMIT = int(os.getenv('SEARCH_RESULTS_LIMIT', 25))
+    
+    # Snapshots reload when the settings version changes; this bounds how long
+    # a worker keeps one anyway, for changes made outside the application
+    SETTINGS_SNAPSHOT_TTL = int(os.getenv('SETTINGS_SNAPSHOT_TTL', 30))
+    
+    # Rendered page cache (see response_cache): an in-process LRU of CACHE_THRESHOLD pages,
+    # or CACHE_TYPE=RedisCache with CACHE_REDIS_URL to share pages between workers
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'response_cache.LRUCache')
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 256))
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 3600))  # seconds
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'sills:')
+    
+    # Prometheus metrics at /metrics; under gunicorn also set PROMETHEUS_MULTIPROC_DIR (see metrics.py)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # Development SQL profiler (see sql_profiler); always on in debug mode.
+    # SQL_QUERY_BUDGET is the most statements a request may run (0 for no budget);
+    # in strict mode going over it raises instead of logging a warning
+    SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+    SQL_PROFILER_STRICT = os.getenv('SQL_PROFILER_STRICT', 'false').lower() == 'true'
+    SQL_PROFILER_REPEAT_THRESHOLD = int(os.getenv('SQL_PROFILER_REPEAT_THRESHOLD', 3))
+    SQL_QUERY_BUDGET = int(os.getenv('SQL_QUERY_BUDGET', 0))
+
+    # Logging (see logging_config.py). LOG_LEVELS overrides the level per logger,
+    # e.g. "contract_parser=DEBUG,sqlalchemy.engine=INFO"; contract text is only logged at DEBUG.
+    # The file rotates by size, or by time when LOG_ROTATE_WHEN is set ('midnight', 'H', ...)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'httpx=WARNING,openai=WARNING')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json or text
+    LOG_FILE = os.getenv('LOG_FILE', 'app.log')  # empty for stdout only
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+    
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
+    # Background contract analysis
+    CONTRACT_JOB_WORKERS = int(os.getenv('CONTRACT_JOB_WORKERS', 2))
+    CONTRACT_JOB_MAX_PENDING = int(os.getenv('CONTRACT_JOB_MAX_PENDING', 20))
+    CONTRACT_JOB_TIMEOUT = int(os.getenv('CONTRACT_JOB_TIMEOUT', 120))  # seconds per job
+    
+    # Contract images are shrunk to these limits before they are sent to the model
+    CONTRACT_IMAGE_MAX_EDGE = int(os.getenv('CONTRACT_IMAGE_MAX_EDGE', 2048))  # px
+    CONTRACT_IMAGE_TARGET_BYTES = int(os.getenv('CONTRACT_IMAGE_TARGET_BYTES', 1500000))
+    CONTRACT_IMAGE_GRAYSCALE = os.getenv('CONTRACT_IMAGE_GRAYSCALE', 'true').lower() == 'true'
+    
+    # Contract previews: kept for PREVIEW_MAX_AGE seconds after last use, cached by browsers for a year
+    PREVIEW_MAX_AGE = int(os.getenv('PREVIEW_MAX_AGE', 72 * 3600))
+    PREVIEW_GC_INTERVAL = int(os.getenv('PREVIEW_GC_INTERVAL', 3600))
+    PREVIEW_CACHE_MAX_AGE = 365 * 24 * 3600
+    
+    # Cache of contract extraction results, keyed by image content (defaults to instance/contract_cache.db)
+    CONTRACT_CACHE_ENABLED = os.getenv('CONTRACT_CACHE_ENABLED', 'true').lower() == 'true'
+    CONTRACT_CACHE_PATH = os.getenv('CONTRACT_CACHE_PATH')
+    CONTRACT_CACHE_MAX_ENTRIES = int(os.getenv('CONTRACT_CACHE_MAX_ENTRIES', 1000))
+    CONTRACT_CACHE_MAX_BYTES = int(os.getenv('CONTRACT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
     # Create upload folder if it doesn't exist
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER) 
\ No newline at end of file
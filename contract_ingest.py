@@ -0,0 +1,177 @@
+"""Bulk ingestion of a contract: one client and all of its sills.
+
+The whole contract is validated in one pass before anything is written.
+Valid sills are inserted with a single executemany INSERT, using order
+numbers reserved in one statement (see Sill.allocate_order_numbers). A
+40-sill conservatory contract is therefore a handful of statements,
+however many rows it has.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+
+from extensions import db
+from job_summary import refresh_client_summaries
+from models import Client, Sill
+
+logger = logging.getLogger(__name__)
+
+CLIENT_REQUIRED = ['first_name', 'last_name', 'phone', 'address', 'town', 'postal_code']
+CLIENT_OPTIONAL = ['mobile', 'email', 'source']
+SILL_REQUIRED_TEXT = ['location', 'color', 'sill_type']
+TRUE_VALUES = {'on', 'true', '1', 'yes', 'y'}
+
+
+@dataclass(frozen=True)
+class RowError:
+    row: Optional[int]  # None for errors in the client details
+    field: str
+    message: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'row': self.row, 'field': self.field, 'message': self.message}
+
+
+@dataclass
+class IngestResult:
+    client_id: Optional[int] = None
+    created_client: bool = False
+    order_numbers: List[str] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+
+    @property
+    def inserted(self) -> int:
+        return len(self.order_numbers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'client_id': self.client_id,
+            'created_client': self.created_client,
+            'inserted': self.inserted,
+            'order_numbers': self.order_numbers,
+            'errors': [error.to_dict() for error in self.errors],
+        }
+
+
+class ContractValidationError(ValueError):
+    """The contract has invalid rows and was not saved."""
+
+    def __init__(self, errors: List[RowError]):
+        self.errors = errors
+        super().__init__('; '.join(_describe(error) for error in errors))
+
+
+def _describe(error: RowError) -> str:
+    where = 'Client' if error.row is None else f"Sill {error.row + 1}"
+    return f"{where} {error.field}: {error.message}"
+
+
+def _number(value: Any, name: str, row: int, errors: List[RowError],
+            required: bool = True) -> Optional[float]:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            errors.append(RowError(row, name, 'is required'))
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        errors.append(RowError(row, name, f"'{value}' is not a number"))
+        return None
+    if number <= 0 and required:
+        errors.append(RowError(row, name, 'must be greater than zero'))
+        return None
+    return number
+
+
+def validate_sill(data: Mapping[str, Any], row: int) -> Tuple[Optional[Dict[str, Any]], List[RowError]]:
+    """Check one sill and return the column values to insert, or the problems found."""
+    if not isinstance(data, Mapping):
+        return None, [RowError(row, 'sill', 'must be an object')]
+    errors: List[RowError] = []
+    values = {
+        'length': _number(data.get('length'), 'length', row, errors),
+        'depth': _number(data.get('depth'), 'depth', row, errors),
+        'high': _number(data.get('high'), 'high', row, errors, required=False),
+        'angle': _number(data.get('angle'), 'angle', row, errors, required=False),
+    }
+    for name in SILL_REQUIRED_TEXT:
+        # The contract parser calls the sill type "type"
+        value = data.get(name, data.get('type') if name == 'sill_type' else None)
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            errors.append(RowError(row, name, 'is required'))
+        values[name] = value
+
+    has_95mm = data.get('has_95mm', False)
+    values['has_95mm'] = has_95mm if isinstance(has_95mm, bool) else str(has_95mm).lower() in TRUE_VALUES
+    return (None, errors) if errors else (values, [])
+
+
+def validate_client(data: Mapping[str, Any], new_client: bool = True) -> Tuple[Dict[str, Any], List[RowError]]:
+    """Normalise the client details; only the name is needed to match an existing client."""
+    if not isinstance(data, Mapping):
+        return {}, [RowError(None, 'client', 'must be an object')]
+    values = {name: str(data.get(name) or '').strip() for name in CLIENT_REQUIRED + CLIENT_OPTIONAL}
+    values['postal_code'] = values['postal_code'].upper()
+    required = CLIENT_REQUIRED if new_client else ['first_name', 'last_name']
+    errors = [RowError(None, name, 'is required') for name in required if not values[name]]
+    for name in CLIENT_OPTIONAL:
+        values[name] = values[name] or None
+    return values, errors
+
+
+def ingest_contract(client_data: Mapping[str, Any], sills: Sequence[Mapping[str, Any]],
+                    partial: bool = False) -> IngestResult:
+    """Find or create the client and insert all valid sills in one statement.
+
+    With partial=False any invalid row rejects the whole contract with
+    ContractValidationError. With partial=True invalid rows are skipped and
+    reported in the result while the valid ones are saved. The caller
+    commits.
+    """
+    client_values, errors = validate_client(client_data, new_client=False)
+    if errors:
+        raise ContractValidationError(errors)
+
+    # Same dedupe rule as before: a contract for a known name goes to that client
+    client = Client.query.filter_by(first_name=client_values['first_name'],
+                                    last_name=client_values['last_name']).first()
+    if client is None:
+        client_values, errors = validate_client(client_data)
+        if errors:
+            # Without a client there is nothing to attach even the valid rows to
+            raise ContractValidationError(errors)
+
+    rows: List[Dict[str, Any]] = []
+    for index, sill in enumerate(sills):
+        values, row_errors = validate_sill(sill, index)
+        if values is not None:
+            rows.append(values)
+        errors.extend(row_errors)
+
+    if errors and not partial:
+        raise ContractValidationError(errors)
+
+    result = IngestResult(errors=errors)
+    if client is None:
+        client = Client(**client_values)
+        db.session.add(client)
+        db.session.flush()
+        result.created_client = True
+    result.client_id = client.id
+    if not rows:
+        return result
+
+    order_numbers = Sill.allocate_order_numbers(len(rows))
+    for values, order_number in zip(rows, order_numbers):
+        values['client_id'] = client.id
+        values['order_number'] = order_number
+    db.session.execute(insert(Sill), rows)
+    # The bulk insert skips the flush events that keep job summaries current
+    refresh_client_summaries([client.id], db.session.connection())
+    result.order_numbers = order_numbers
+
+    logger.info("Ingested %d sills for client %d (%d rejected)", len(rows), client.id, len(errors))
+    return result
@@ -0,0 +1,257 @@
+"""Background contract analysis.
+
+Uploads are recorded as ContractJob rows and analysed by a small thread pool,
+so a request never waits on the OpenAI round-trips. The job table lives in the
+application's SQLite database, which means no broker (Redis, Celery) is needed
+and any worker process can answer a status poll.
+
+The pool is created lazily on first use in each process, so it is never
+started in a gunicorn master and inherited across a fork. When gunicorn
+stops or recycles a worker, its worker_exit hook calls shutdown(): running
+jobs finish (each is bounded by CONTRACT_JOB_TIMEOUT) and queued ones are
+failed at once, instead of only failing once get() finds them overdue.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from flask import Flask
+from sqlalchemy import select, update
+
+from extensions import db
+from models import ContractJob
+from contract_parser import ContractParser, PROMPT_VERSION
+from image_preprocessing import DEFAULT_MAX_EDGE, DEFAULT_TARGET_BYTES
+from extraction_cache import (
+    ExtractionCache, CachedExtraction, content_key, file_key,
+    DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 20
+DEFAULT_TIMEOUT = 120  # seconds
+
+
+class QueueFullError(Exception):
+    """Raised when too many contract jobs are already waiting."""
+
+
+def remove_upload(filepath: str) -> None:
+    """Delete an uploaded contract file once no job needs it any more."""
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove upload %s: %s", filepath, e)
+
+
+class ContractJobQueue:
+    def __init__(self, app: Flask, cache: Optional[ExtractionCache] = None):
+        self.app = app
+        self.cache = cache
+        self.workers = app.config.get('CONTRACT_JOB_WORKERS', DEFAULT_WORKERS)
+        self.max_pending = app.config.get('CONTRACT_JOB_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.timeout = app.config.get('CONTRACT_JOB_TIMEOUT', DEFAULT_TIMEOUT)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._pending = 0
+        self._job_ids = set()  # submitted to this process's pool and not finished yet
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='contract-job')
+                self._pid = os.getpid()
+                self._pending = 0
+                self._job_ids = set()
+            return self._executor
+
+    def submit(self, filepath: str, filename: str, preview_key: Optional[str] = None) -> str:
+        """Record a job for an uploaded file and queue it; returns the job id.
+
+        A file that was analysed before is answered from the extraction cache
+        and its job is finished straight away.
+        """
+        raw_key = file_key(filepath, PROMPT_VERSION) if self.cache else None
+        cached = self.cache.get(raw_key) if self.cache else None
+        if cached is not None:
+            job = ContractJob(id=uuid.uuid4().hex, filename=filename, filepath=filepath,
+                              preview_key=preview_key, started_at=datetime.utcnow())
+            self._store_result(job, cached)
+            db.session.add(job)
+            db.session.commit()
+            remove_upload(filepath)
+            logger.info("Contract job %s answered from cache", job.id)
+            return job.id
+
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError("Too many contracts are being analysed, please try again shortly")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            job = ContractJob(id=job_id, status='queued', filename=filename,
+                              filepath=filepath, preview_key=preview_key)
+            db.session.add(job)
+            db.session.commit()
+            with self._lock:
+                self._job_ids.add(job_id)
+            executor.submit(self._run, job_id)
+        except Exception:
+            self._release(job_id)
+            raise
+
+        logger.info("Queued contract job %s for %s", job.id, filename)
+        return job.id
+
+    def _release(self, job_id: str) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._job_ids.discard(job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            with self.app.app_context():
+                self._process(job_id)
+        except Exception:
+            logger.exception("Contract job %s crashed", job_id)
+        finally:
+            self._release(job_id)
+
+    def shutdown(self) -> None:
+        """Stop this process's pool: wait for running jobs and fail the queued ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if executor is None or self._pid != os.getpid():
+                return
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        with self._lock:
+            # Cancelled before they started, so _run never released them
+            job_ids, self._job_ids = list(self._job_ids), set()
+            self._pending = 0
+        if not job_ids:
+            return
+        with self.app.app_context():
+            filepaths = db.session.execute(
+                select(ContractJob.filepath)
+                .where(ContractJob.id.in_(job_ids), ContractJob.status.in_(('queued', 'running')))
+            ).scalars().all()
+            db.session.execute(
+                update(ContractJob)
+                .where(ContractJob.id.in_(job_ids), ContractJob.status.in_(('queued', 'running')))
+                .values(status='failed', finished_at=datetime.utcnow(),
+                        error='The server restarted before the contract was analysed, please upload it again')
+            )
+            db.session.commit()
+        for filepath in filepaths:
+            remove_upload(filepath)
+        logger.warning("Failed %d queued contract jobs on shutdown", len(job_ids))
+
+    def _process(self, job_id: str) -> None:
+        job = db.session.get(ContractJob, job_id)
+        if job is None or job.status != 'queued':
+            logger.warning("Contract job %s is no longer queued, skipping it", job_id)
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        deadline = time.monotonic() + self.timeout
+        try:
+            parser = ContractParser(
+                timeout=self.timeout,
+                max_image_edge=self.app.config.get('CONTRACT_IMAGE_MAX_EDGE', DEFAULT_MAX_EDGE),
+                target_image_bytes=self.app.config.get('CONTRACT_IMAGE_TARGET_BYTES', DEFAULT_TARGET_BYTES),
+                grayscale=self.app.config.get('CONTRACT_IMAGE_GRAYSCALE', True)
+            )
+            image = parser.prepare_image(job.filepath)
+            key = content_key(image.data, PROMPT_VERSION)
+            extraction = self.cache.get(key) if self.cache else None
+
+            if extraction is None:
+                extracted_text = parser.extract_text_from_image(image, deadline=deadline)
+                extraction = CachedExtraction(
+                    key=key,
+                    extracted_text=extracted_text,
+                    client_data=parser.parse_client_data(extracted_text),
+                    sills_data=parser.parse_sill_data(extracted_text)
+                )
+                if self.cache:
+                    self.cache.put(key, extraction.extracted_text, extraction.client_data,
+                                   extraction.sills_data, aliases=[file_key(job.filepath, PROMPT_VERSION)])
+            else:
+                # Same contract saved as a different file; remember the file too
+                logger.info("Contract job %s answered from cache", job_id)
+                self.cache.add_alias(file_key(job.filepath, PROMPT_VERSION), key)
+
+            self._store_result(job, extraction)
+        except Exception as e:
+            logger.error("Contract job %s failed: %s", job_id, e)
+            job.status = 'failed'
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            remove_upload(job.filepath)
+
+    @staticmethod
+    def _store_result(job: ContractJob, extraction: CachedExtraction) -> None:
+        job.extracted_text = extraction.extracted_text
+        job.result = json.dumps({
+            'client_data': extraction.client_data,
+            'sills_data': extraction.sills_data
+        })
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+
+    def get(self, job_id: str) -> Optional[ContractJob]:
+        """Load a job, failing it if it has been running for longer than the timeout."""
+        job = db.session.get(ContractJob, job_id)
+        if job is None or job.status not in ('queued', 'running'):
+            return job
+
+        # A job whose worker died (restart, crash) would otherwise stay pending forever
+        if job.status == 'running':
+            started, limit = job.started_at or job.created_at, self.timeout * 2
+        else:
+            # Queued jobs may legitimately wait behind a full pool
+            started, limit = job.created_at, self.timeout * (2 + self.max_pending // max(self.workers, 1))
+        if datetime.utcnow() - started > timedelta(seconds=limit):
+            job.status = 'failed'
+            job.error = 'Contract analysis timed out'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        return job
+
+
+def job_result(job: ContractJob) -> Dict:
+    """Decode the stored result of a finished job."""
+    return json.loads(job.result) if job.result else {'client_data': {}, 'sills_data': []}
+
+
+def init_contract_jobs(app: Flask) -> ContractJobQueue:
+    cache = None
+    if app.config.get('CONTRACT_CACHE_ENABLED', True):
+        cache = ExtractionCache(
+            app.config.get('CONTRACT_CACHE_PATH') or os.path.join(app.instance_path, 'contract_cache.db'),
+            max_entries=app.config.get('CONTRACT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            max_bytes=app.config.get('CONTRACT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        )
+    queue = ContractJobQueue(app, cache=cache)
+    app.extensions['contract_jobs'] = queue
+    return queue
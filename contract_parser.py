@@ -1,54 +1,20 @@
 import os
 import base64
+import hashlib
 import io
 import logging
 import re
 import time
 from typing import Dict, List, Tuple, Optional
-from PIL import Image
 from openai import OpenAI as OpenAIClient
+from image_preprocessing import prepare_image, PreparedImage, DEFAULT_MAX_EDGE, DEFAULT_TARGET_BYTES
+from metrics import CONTRACT_IMAGE_BYTES, OPENAI_SECONDS, record_contract_extraction
 
 logger = logging.getLogger(__name__)
 
-class ContractParser:
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        self.logger.info("Initializing ContractParser...")
-        api_key = os.getenv('OPENAI_API_KEY')
-        self.logger.info(f"API key loaded: {'SET' if api_key else 'NOT SET'}")
-        self.client = OpenAIClient(api_key=api_key)
-        self.logger.info("OpenAI client created successfully")
-        self.max_retries = 3
-        self.retry_delay = 2
-
-    def extract_text(self, image_path: str) -> str:
-        """
-        Extracts text from an image using OpenAI API with retry mechanism.
-        """
-        self.logger.info(f"Starting text extraction from: {image_path}")
-        last_error = None
-        extracted_text = ""
-
-        for attempt in range(self.max_retries):
-            try:
-                self.logger.info(f"Attempt {attempt + 1} to extract text")
-                # Load and convert image to base64
-                with open(image_path, 'rb') as image_file:
-                    image_data = image_file.read()
-                    base64_image = base64.b64encode(image_data).decode('utf-8')
-                    self.logger.info(f"Image loaded and encoded, size: {len(image_data)} bytes")
+MODEL = "gpt-4o"
 
-                # Prepare API request with detailed instructions
-                self.logger.info("Sending request to OpenAI API...")
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": """Analyze this contract and extract the following information:
+EXTRACTION_PROMPT = """Analyze this contract and extract the following information:
 
 1. Client Details:
    - Full name (including title if present)
@@ -95,11 +61,87 @@ Window Sills:
    U/Side: [Yes/No]
 
 [Continue for all window sills found]"""
+
+# Identifies the model and prompt that produced a cached extraction
+PROMPT_VERSION = hashlib.sha256(f"{MODEL}\n{EXTRACTION_PROMPT}".encode('utf-8')).hexdigest()[:12]
+
+class ContractParser:
+    def __init__(self, timeout: Optional[float] = None,
+                 max_image_edge: int = DEFAULT_MAX_EDGE,
+                 target_image_bytes: int = DEFAULT_TARGET_BYTES,
+                 grayscale: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.logger.debug("Initializing ContractParser")
+        api_key = os.getenv('OPENAI_API_KEY')
+        self.logger.debug("API key loaded: %s", 'SET' if api_key else 'NOT SET')
+        # timeout bounds each OpenAI request, in seconds
+        client_options = {'timeout': timeout} if timeout else {}
+        self.client = OpenAIClient(api_key=api_key, **client_options)
+        self.logger.debug("OpenAI client created")
+        self.max_retries = 3
+        self.retry_delay = 2
+        self.max_image_edge = max_image_edge
+        self.target_image_bytes = target_image_bytes
+        self.grayscale = grayscale
+        # Size of the last image sent to the model, before and after preprocessing
+        self.last_image: Optional[PreparedImage] = None
+
+    def prepare_image(self, image_path: str) -> PreparedImage:
+        """
+        Downscales and re-encodes an image with this parser's limits.
+        """
+        image = prepare_image(image_path, max_edge=self.max_image_edge,
+                              target_bytes=self.target_image_bytes, grayscale=self.grayscale)
+        self.last_image = image
+        return image
+
+    def extract_text(self, image_path: str, deadline: Optional[float] = None) -> str:
+        """
+        Extracts text from an image using OpenAI API with retry mechanism.
+        No new attempt is started once the time.monotonic() deadline has passed.
+        """
+        self.logger.info("Starting text extraction from: %s", image_path)
+        # Downscale and re-encode once, not on every attempt
+        return self.extract_text_from_image(self.prepare_image(image_path), deadline=deadline)
+
+    def extract_text_from_image(self, image: PreparedImage, deadline: Optional[float] = None) -> str:
+        """
+        Sends an already prepared image to the OpenAI API with retry mechanism.
+        """
+        last_error = None
+        extracted_text = ""
+        base64_image = base64.b64encode(image.data).decode('utf-8')
+        self.logger.debug("Image prepared, size: %d -> %d bytes", image.original_bytes, image.prepared_bytes)
+        CONTRACT_IMAGE_BYTES.labels('original').observe(image.original_bytes)
+        CONTRACT_IMAGE_BYTES.labels('payload').observe(len(base64_image))
+        started = time.perf_counter()
+        attempts = 0
+
+        for attempt in range(self.max_retries):
+            if deadline is not None and time.monotonic() >= deadline:
+                last_error = TimeoutError("Contract analysis timed out")
+                break
+            attempts += 1
+            request_started = time.perf_counter()
+            responded = False
+            try:
+                self.logger.debug("Attempt %d to extract text", attempt + 1)
+
+                # Prepare API request with detailed instructions
+                response = self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": EXTRACTION_PROMPT
                                 },
                                 {
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
+                                        "url": f"data:{image.mime_type};base64,{base64_image}"
                                     }
                                 }
                             ]
@@ -110,25 +152,32 @@ Window Sills:
                 )
 
                 # Get text from response
-                self.logger.info("Received response from OpenAI API")
+                responded = True
+                OPENAI_SECONDS.labels('success').observe(time.perf_counter() - request_started)
                 extracted_text = response.choices[0].message.content
-                self.logger.info(f"Extracted text length: {len(extracted_text)} characters")
+                self.logger.debug("Extracted text length: %d characters", len(extracted_text))
                 
                 # Check if text contains required sections
                 if "unable" in extracted_text.lower():
                     raise ValueError("Model could not extract text from image")
                 
-                self.logger.info(f"Text extraction successful on attempt {attempt + 1}")
+                self.logger.info("Text extraction successful on attempt %d", attempt + 1)
+                record_contract_extraction(time.perf_counter() - started, attempts, succeeded=True)
                 return extracted_text
 
             except Exception as e:
+                if not responded:
+                    OPENAI_SECONDS.labels('error').observe(time.perf_counter() - request_started)
                 last_error = e
-                self.logger.warning(f"Error during text extraction (attempt {attempt + 1}): {str(e)}")
+                self.logger.warning("Error during text extraction (attempt %d): %s", attempt + 1, e)
                 if attempt < self.max_retries - 1:
+                    if deadline is not None and time.monotonic() + self.retry_delay >= deadline:
+                        break
                     time.sleep(self.retry_delay)
                 continue
 
-        self.logger.error(f"Failed to extract text after {self.max_retries} attempts. Last error: {str(last_error)}")
+        self.logger.error("Failed to extract text after %d attempts. Last error: %s", attempts, last_error)
+        record_contract_extraction(time.perf_counter() - started, attempts, succeeded=False)
         raise last_error
 
     def _validate_extracted_text(self, text: str) -> bool:
@@ -141,7 +190,7 @@ Window Sills:
         # Check client fields
         for field in required_client_fields:
             if not re.search(f'{field}\s*[^\n]+', text):
-                self.logger.warning(f"Missing required client field: {field}")
+                self.logger.warning("Missing required client field: %s", field)
                 return False
 
         # Check if there's at least one window sill
@@ -154,7 +203,7 @@ Window Sills:
         sill_text = text[text.find('Window Sills:'):]
         for field in required_sill_fields:
             if not re.search(f'{field}\s*[^\n]+', sill_text):
-                self.logger.warning(f"Missing required sill field: {field}")
+                self.logger.warning("Missing required sill field: %s", field)
                 return False
 
         return True
@@ -219,11 +268,13 @@ Window Sills:
             if source_match:
                 client_data['source'] = source_match.group(1).strip()
 
-            self.logger.info(f"Parsed client data: {client_data}")
+            # Client details are personal data: the fields found at INFO, the values at DEBUG only
+            self.logger.info("Parsed client data: %s", ', '.join(name for name, value in client_data.items() if value))
+            self.logger.debug("Client data: %s", client_data)
             return client_data
 
         except Exception as e:
-            self.logger.error(f"Error parsing client data: {str(e)}")
+            self.logger.error("Error parsing client data: %s", e)
             raise
 
     def parse_sill_data(self, text: str) -> List[Dict[str, str]]:
@@ -233,8 +284,7 @@ Window Sills:
         try:
             sills_data = []
             
-            self.logger.info("Starting to parse sill data")
-            self.logger.info(f"Full text to parse: {text}")
+            self.logger.debug("Parsing sill data from %d characters of text", len(text))
             
             # Find "Window Sills:" section and get all text after it
             window_sills_start = text.find('Window Sills:')
@@ -245,7 +295,7 @@ Window Sills:
                 for pattern in alt_patterns:
                     window_sills_start = text.find(pattern)
                     if window_sills_start != -1:
-                        self.logger.info(f"Found sills section with pattern: {pattern}")
+                        self.logger.debug("Found sills section with pattern: %s", pattern)
                         break
                 
                 if window_sills_start == -1:
@@ -254,27 +304,27 @@ Window Sills:
 
             # Get the sills text starting after "Window Sills:"
             sills_text = text[window_sills_start:].split(':', 1)[1].strip()
-            self.logger.info(f"Sills section text: {sills_text}")
+            self.logger.debug("Sills section text: %s", sills_text)
             
             # Find all individual sill entries using regex to match numbered sections
             sill_matches = re.findall(r'(\d+\.\s*Location:.*?)(?=\n\d+\.\s*Location:|\Z)', sills_text, re.DOTALL)
-            self.logger.info(f"Found sill matches: {len(sill_matches)}")
+            self.logger.debug("Found sill matches: %d", len(sill_matches))
             
             if not sill_matches:
                 # If no matches found, try a different approach - split on numbered lines
                 sill_sections = re.split(r'\n(?=\d+\.)', sills_text)
-                self.logger.info(f"Split on newlines with numbers: {sill_sections}")
+                self.logger.debug("Split on newlines with numbers: %s", sill_sections)
                 
                 # Remove empty sections and clean up
                 sill_sections = [s.strip() for s in sill_sections if s.strip()]
-                self.logger.info(f"After cleaning: {sill_sections} (count: {len(sill_sections)})")
+                self.logger.debug("After cleaning: %s (count: %d)", sill_sections, len(sill_sections))
             else:
                 # Use the regex matches as sections
                 sill_sections = [match.strip() for match in sill_matches]
-                self.logger.info(f"Using regex matches as sections: {len(sill_sections)} sections found")
+                self.logger.debug("Using regex matches as sections: %d sections found", len(sill_sections))
             
             for i, section in enumerate(sill_sections, 1):
-                self.logger.info(f"Processing section {i}: '{section}'")
+                self.logger.debug("Processing section %d: '%s'", i, section)
                 
                 sill = {
                     'number': str(i),
@@ -291,13 +341,13 @@ Window Sills:
                     location_value = location_match.group(1).strip()
                     if location_value and location_value.lower() not in ['n/a', 'none', '']:
                         sill['location'] = location_value
-                        self.logger.info(f"Found location: {sill['location']}")
+                        self.logger.debug("Found location: %s", sill['location'])
 
                 # Parse Type field - this often contains both color and type info
                 type_match = re.search(r'Type:\s*([^\n]+)', section)
                 if type_match:
                     type_full = type_match.group(1).strip()
-                    self.logger.info(f"Found full type string: {type_full}")
+                    self.logger.debug("Found full type string: %s", type_full)
                     
                     # Split color and type from the Type field
                     # Common patterns: "Black Grain Straight", "White Straight", "Oak Bay"
@@ -323,11 +373,11 @@ Window Sills:
                     # Set color from Type field if Color field is empty or N/A
                     if color_part and color_part.lower() not in ['n/a', 'none', '']:
                         sill['color'] = color_part
-                        self.logger.info(f"Extracted color from type: {sill['color']}")
+                        self.logger.debug("Extracted color from type: %s", sill['color'])
                     
                     if type_part:
                         sill['type'] = type_part
-                        self.logger.info(f"Extracted type: {sill['type']}")
+                        self.logger.debug("Extracted type: %s", sill['type'])
 
                 # Parse Color field separately (might override Type field color)
                 color_match = re.search(r'Color:\s*([^\n]+)', section)
@@ -335,7 +385,7 @@ Window Sills:
                     color_value = color_match.group(1).strip()
                     if color_value and color_value.lower() not in ['n/a', 'none', '']:
                         sill['color'] = color_value
-                        self.logger.info(f"Found explicit color: {sill['color']}")
+                        self.logger.debug("Found explicit color: %s", sill['color'])
 
                 # Parse size
                 size_match = re.search(r'Size:\s*(\d+(?:\.\d+)?)\s*(?:mm|cm)?', section)
@@ -343,7 +393,7 @@ Window Sills:
                     size_value = size_match.group(1)
                     if size_value and size_value != '0':
                         sill['size'] = size_value
-                        self.logger.info(f"Found size: {sill['size']}")
+                        self.logger.debug("Found size: %s", sill['size'])
 
                 # Parse U/Side
                 u_side_match = re.search(r'U/Side:\s*([^\n]+)', section)
@@ -351,38 +401,35 @@ Window Sills:
                     u_side_value = u_side_match.group(1).strip().lower()
                     if u_side_value and u_side_value not in ['n/a', 'none', '']:
                         sill['has_95mm'] = u_side_value in ['yes', 'true', '1', 'y']
-                        self.logger.info(f"Found U/Side: {u_side_value} -> {sill['has_95mm']}")
+                        self.logger.debug("Found U/Side: %s -> %s", u_side_value, sill['has_95mm'])
 
                 # Only add sill if it has meaningful data (location and size at minimum)
                 if sill['location'] != 'Unknown' and sill['size']:
-                    self.logger.info(f"Parsed window sill {i}: {sill}")
+                    self.logger.debug("Parsed window sill %d: %s", i, sill)
                     sills_data.append(sill)
                 else:
-                    self.logger.warning(f"Skipping sill {i} - insufficient data: {sill}")
+                    self.logger.warning("Skipping sill %d - insufficient data", i)
+                    self.logger.debug("Skipped sill %d: %s", i, sill)
 
-            self.logger.info(f"Total window sills parsed: {len(sills_data)}")
+            self.logger.info("Total window sills parsed: %d", len(sills_data))
             return sills_data
 
         except Exception as e:
-            self.logger.error(f"Error parsing window sill data: {str(e)}")
+            self.logger.error("Error parsing window sill data: %s", e)
             raise
 
-    def parse_contract(self, image_path: str) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    def parse_contract(self, image_path: str, preview_store=None) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
         """
         Parses contract from image and returns client data and window sill data.
+        Previews are written through preview_store (see preview_store.PreviewStore) when given.
         """
         try:
-            # Save copy of image for preview
-            preview_path = os.path.join('static', 'uploads', 'preview.jpg')
-            os.makedirs(os.path.dirname(preview_path), exist_ok=True)
-            
-            # Copy and convert image to JPEG
-            with Image.open(image_path) as img:
-                img.save(preview_path, 'JPEG')
+            if preview_store is not None:
+                preview_store.save(image_path)
             
             # Extract text from image
             text = self.extract_text(image_path)
-            self.logger.info(f"Full contract text: {text}")
+            self.logger.debug("Full contract text: %s", text)
             
             # Parse client and sill data
             client_data = self.parse_client_data(text)
@@ -391,5 +438,5 @@ Window Sills:
             return client_data, sills_data
 
         except Exception as e:
-            self.logger.error(f"Error parsing contract: {str(e)}")
+            self.logger.error("Error parsing contract: %s", e)
             raise 
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""One-dimensional cutting-stock optimizer used by the cutting layout.
+
+Every strategy takes the piece lengths for a single board type and the board
+length, and returns a list of boards. Each board is a list of indices into the
+input lengths, in the order the pieces should be cut.
+"""
+import bisect
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Board = List[int]
+
+# Tolerance used when comparing summed float lengths against a board length
+EPSILON = 1e-9
+
+DEFAULT_STRATEGY = 'auto'
+DEFAULT_EXACT_MAX_PIECES = 24
+DEFAULT_TIME_BUDGET = 0.25  # seconds
+
+
+class _CapacityTree:
+    """Max-tree over board slots, answering "leftmost board with room for x" in O(log n).
+
+    Every slot starts with a full board, so the leftmost fitting slot is either
+    an already opened board or the next unopened one, which is exactly first-fit.
+    """
+
+    def __init__(self, slots: int, capacity: float):
+        self.size = 1
+        while self.size < max(slots, 1):
+            self.size *= 2
+        self.tree = [capacity] * (2 * self.size)
+
+    def find_first(self, length: float) -> int:
+        if self.tree[1] + EPSILON < length:
+            return -1
+        node = 1
+        while node < self.size:
+            node *= 2
+            if self.tree[node] + EPSILON < length:
+                node += 1
+        return node - self.size
+
+    def consume(self, slot: int, length: float) -> None:
+        node = slot + self.size
+        self.tree[node] -= length
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+
+def _decreasing_order(lengths: Sequence[float]) -> List[int]:
+    return sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+
+def first_fit_decreasing(lengths: Sequence[float], board_length: float) -> List[Board]:
+    """Place pieces longest first into the first board with enough room."""
+    _check_lengths(lengths, board_length)
+    tree = _CapacityTree(len(lengths), board_length)
+    boards: List[Board] = []
+
+    for index in _decreasing_order(lengths):
+        slot = tree.find_first(lengths[index])
+        tree.consume(slot, lengths[index])
+        if slot == len(boards):
+            boards.append([])
+        boards[slot].append(index)
+
+    return boards
+
+
+def best_fit_decreasing(lengths: Sequence[float], board_length: float) -> List[Board]:
+    """Place pieces longest first into the board that leaves the least waste.
+
+    Remaining capacities are kept in a sorted list, so finding the tightest
+    board is a binary search.
+    """
+    _check_lengths(lengths, board_length)
+    boards: List[Board] = []
+    # Sorted (remaining_length, board_index) pairs
+    capacities: List[tuple] = []
+
+    for index in _decreasing_order(lengths):
+        length = lengths[index]
+        position = bisect.bisect_left(capacities, (length - EPSILON, -1))
+        if position < len(capacities):
+            remaining, board_index = capacities.pop(position)
+            boards[board_index].append(index)
+        else:
+            remaining, board_index = board_length, len(boards)
+            boards.append([index])
+        bisect.insort(capacities, (remaining - length, board_index))
+
+    return boards
+
+
+def fill_offcuts(lengths: Sequence[float],
+                 offcut_lengths: Sequence[float]) -> Tuple[List[Board], List[int]]:
+    """Place pieces longest first on the existing offcut that leaves the least waste.
+
+    Returns the pieces cut from each offcut, in the order of offcut_lengths,
+    and the indices of the pieces that fit on none of them. Remaining
+    offcut lengths are kept in a sorted list, so every lookup is a binary
+    search however large the inventory is.
+    """
+    placed: List[Board] = [[] for _ in offcut_lengths]
+    capacities = sorted((length, offcut) for offcut, length in enumerate(offcut_lengths))
+    unplaced: List[int] = []
+
+    for index in _decreasing_order(lengths):
+        length = lengths[index]
+        position = bisect.bisect_left(capacities, (length - EPSILON, -1))
+        if position == len(capacities):
+            unplaced.append(index)
+            continue
+        remaining, offcut = capacities.pop(position)
+        placed[offcut].append(index)
+        bisect.insort(capacities, (remaining - length, offcut))
+
+    return placed, unplaced
+
+
+def branch_and_bound(lengths: Sequence[float], board_length: float,
+                     time_budget: float = DEFAULT_TIME_BUDGET,
+                     max_pieces: int = DEFAULT_EXACT_MAX_PIECES) -> List[Board]:
+    """Search for a layout with the fewest boards within a time budget.
+
+    Starts from the best-fit-decreasing layout and only improves on it, so the
+    result is never worse than the heuristic even when the budget runs out.
+    The search recurses once per piece, so above max_pieces pieces the
+    best-fit-decreasing layout is returned as it is.
+    """
+    best = best_fit_decreasing(lengths, board_length)
+    lower_bound = math.ceil(sum(lengths) / board_length - EPSILON) if lengths else 0
+    if len(best) <= lower_bound or len(lengths) > max_pieces:
+        return best
+
+    order = _decreasing_order(lengths)
+    suffix_sums = [0.0] * (len(order) + 1)
+    for position in range(len(order) - 1, -1, -1):
+        suffix_sums[position] = suffix_sums[position + 1] + lengths[order[position]]
+
+    deadline = time.perf_counter() + time_budget
+    remaining: List[float] = []
+    current: List[Board] = []
+    state = {'best': best, 'timed_out': False}
+
+    def search(position: int) -> None:
+        if state['timed_out']:
+            return
+        if time.perf_counter() > deadline:
+            state['timed_out'] = True
+            return
+        if position == len(order):
+            if len(current) < len(state['best']):
+                state['best'] = [list(board) for board in current]
+            return
+
+        # Boards that must still be opened for the pieces left over
+        free_space = sum(remaining)
+        extra = max(0.0, suffix_sums[position] - free_space)
+        if len(current) + math.ceil(extra / board_length - EPSILON) >= len(state['best']):
+            return
+
+        index = order[position]
+        length = lengths[index]
+        tried = set()
+        for board_index, space in enumerate(remaining):
+            if space + EPSILON < length or space in tried:
+                continue
+            tried.add(space)
+            remaining[board_index] -= length
+            current[board_index].append(index)
+            search(position + 1)
+            current[board_index].pop()
+            remaining[board_index] += length
+            if len(state['best']) <= lower_bound:
+                return
+
+        if len(current) + 1 < len(state['best']):
+            remaining.append(board_length - length)
+            current.append([index])
+            search(position + 1)
+            current.pop()
+            remaining.pop()
+
+    search(0)
+    return state['best']
+
+
+STRATEGIES: Dict[str, Callable[..., List[Board]]] = {
+    'ffd': first_fit_decreasing,
+    'bfd': best_fit_decreasing,
+    'exact': branch_and_bound,
+}
+
+
+def optimize_cuts(lengths: Sequence[float], board_length: float,
+                  strategy: str = DEFAULT_STRATEGY,
+                  exact_max_pieces: int = DEFAULT_EXACT_MAX_PIECES,
+                  time_budget: float = DEFAULT_TIME_BUDGET) -> List[Board]:
+    """Pack piece lengths onto boards using the named strategy.
+
+    'auto' and 'exact' run the exact search for small jobs and
+    best-fit-decreasing for anything larger than exact_max_pieces.
+    """
+    if not lengths:
+        return []
+
+    if strategy == 'auto':
+        strategy = 'exact' if len(lengths) <= exact_max_pieces else 'bfd'
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown cutting strategy: {strategy}")
+
+    if strategy == 'exact':
+        return branch_and_bound(lengths, board_length, time_budget=time_budget,
+                                max_pieces=exact_max_pieces)
+    return STRATEGIES[strategy](lengths, board_length)
+
+
+def cheapest_stock_mix(lengths: Sequence[float], stock: Sequence[Tuple[float, float]],
+                       strategy: str = DEFAULT_STRATEGY,
+                       exact_max_pieces: int = DEFAULT_EXACT_MAX_PIECES,
+                       time_budget: float = DEFAULT_TIME_BUDGET) -> List[Tuple[float, Board]]:
+    """Pack pieces onto boards bought in several stock lengths at the lowest total price.
+
+    stock is a list of (length, price) pairs. Every stock length that holds
+    the longest piece is tried as the size all boards are packed to; each
+    packed board is then bought as the cheapest stock length it fits on.
+    The cheapest result wins, fewer boards on a tie. Returns (stock length,
+    board) pairs.
+    """
+    if not lengths:
+        return []
+    if not stock:
+        raise ValueError("No stock lengths to cut from")
+    stock = sorted(stock)
+    if len(stock) == 1:
+        board_length = stock[0][0]
+        return [(board_length, board) for board in optimize_cuts(
+            lengths, board_length, strategy, exact_max_pieces, time_budget)]
+
+    longest = max(lengths)
+    sizes = sorted({length for length, _ in stock if length + EPSILON >= longest})
+    if not sizes:
+        raise ValueError(f"Piece of {longest}mm does not fit on a {stock[-1][0]}mm board")
+
+    best: Optional[tuple] = None
+    for size in sizes:
+        layout = optimize_cuts(lengths, size, strategy, exact_max_pieces, time_budget)
+        boards: List[Tuple[float, Board]] = []
+        cost = 0.0
+        for board in layout:
+            used = sum(lengths[i] for i in board)
+            length, price = min(((length, price) for length, price in stock if length + EPSILON >= used),
+                                key=lambda option: (option[1], option[0]))
+            boards.append((length, board))
+            cost += price
+        if best is None or (cost, len(boards)) < best[0]:
+            best = ((cost, len(boards)), boards)
+
+    return best[1]
+
+
+def _check_lengths(lengths: Sequence[float], board_length: float) -> None:
+    if board_length <= 0:
+        raise ValueError("Board length must be positive")
+    longest: Optional[float] = max(lengths) if lengths else None
+    if longest is not None and longest > board_length + EPSILON:
+        raise ValueError(f"Piece of {longest}mm does not fit on a {board_length}mm board")
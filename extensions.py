@@ -3,9 +3,11 @@ from flask_bootstrap import Bootstrap
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_migrate import Migrate
+from flask_caching import Cache
 
 # Initialize extensions
 db = SQLAlchemy()
 bootstrap = Bootstrap()
 limiter = Limiter(key_func=get_remote_address)
-migrate = Migrate() 
\ No newline at end of file
+migrate = Migrate()
+cache = Cache() 
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Content-addressed cache of contract extraction results.
+
+Entries are keyed by the SHA-256 of the preprocessed image bytes plus the
+prompt version, so re-uploading the same contract skips the OpenAI call. A
+second key, the hash of the raw uploaded file, is kept as an alias so an
+identical re-upload is answered before the image is even decoded.
+
+The cache is a standalone SQLite file (not the application database) with
+least-recently-used eviction bounded by entry count and total size.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction (
+    key TEXT PRIMARY KEY,
+    extracted_text TEXT NOT NULL,
+    client_data TEXT NOT NULL,
+    sills_data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_extraction_last_used ON extraction (last_used);
+CREATE TABLE IF NOT EXISTS extraction_alias (
+    alias TEXT PRIMARY KEY,
+    key TEXT NOT NULL REFERENCES extraction (key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS ix_extraction_alias_key ON extraction_alias (key);
+"""
+
+
+@dataclass(frozen=True)
+class CachedExtraction:
+    key: str
+    extracted_text: str
+    client_data: Dict[str, str]
+    sills_data: List[Dict]
+
+
+def content_key(data: bytes, prompt_version: str) -> str:
+    """Cache key for image bytes analysed with a given prompt version."""
+    digest = hashlib.sha256(prompt_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def file_key(path: str, prompt_version: str) -> str:
+    """Cache key for the raw bytes of an uploaded file."""
+    digest = hashlib.sha256(prompt_version.encode('utf-8'))
+    digest.update(b'\0raw\0')
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialised = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialised:
+            # sqlite3 cannot create the file in a directory that does not exist
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA foreign_keys = ON")
+            if not self._initialised:
+                with self._lock:
+                    if not self._initialised:
+                        connection.execute("PRAGMA journal_mode = WAL")
+                        connection.executescript(SCHEMA)
+                        self._initialised = True
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        """A connection, or None when the cache file cannot be opened; the cache is then skipped."""
+        try:
+            return self._connect()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Extraction cache %s is unavailable: %s", self.path, e)
+            return None
+
+    def get(self, key: str) -> Optional[CachedExtraction]:
+        """Return the entry for a content key or an alias, refreshing its LRU position."""
+        connection = self._open()
+        if connection is None:
+            return None
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT e.key, e.extracted_text, e.client_data, e.sills_data FROM extraction e "
+                    "WHERE e.key = ? UNION ALL "
+                    "SELECT e.key, e.extracted_text, e.client_data, e.sills_data FROM extraction e "
+                    "JOIN extraction_alias a ON a.key = e.key WHERE a.alias = ? LIMIT 1",
+                    (key, key)
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute("UPDATE extraction SET last_used = ? WHERE key = ?",
+                                   (time.time(), row[0]))
+        except sqlite3.Error as e:
+            logger.warning("Extraction cache lookup failed: %s", e)
+            return None
+        finally:
+            connection.close()
+
+        return CachedExtraction(row[0], row[1], json.loads(row[2]), json.loads(row[3]))
+
+    def put(self, key: str, extracted_text: str, client_data: Dict[str, str],
+            sills_data: List[Dict], aliases: Iterable[str] = ()) -> None:
+        """Store an extraction result and evict the least recently used entries over the limits."""
+        client_json = json.dumps(client_data)
+        sills_json = json.dumps(sills_data)
+        size = len(extracted_text) + len(client_json) + len(sills_json)
+        now = time.time()
+
+        connection = self._open()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO extraction "
+                    "(key, extracted_text, client_data, sills_data, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, extracted_text, client_json, sills_json, size, now, now)
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO extraction_alias (alias, key) VALUES (?, ?)",
+                    [(alias, key) for alias in aliases if alias != key]
+                )
+                self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning("Extraction cache write failed: %s", e)
+        finally:
+            connection.close()
+
+    def add_alias(self, alias: str, key: str) -> None:
+        connection = self._open()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO extraction_alias (alias, key) VALUES (?, ?)",
+                                   (alias, key))
+        except sqlite3.Error as e:
+            logger.warning("Extraction cache alias write failed: %s", e)
+        finally:
+            connection.close()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        count, total = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in connection.execute(
+                "SELECT key, size FROM extraction ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM extraction WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        logger.info("Evicted %d contract extraction cache entries", evicted)
+
+    def clear(self) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM extraction_alias")
+                connection.execute("DELETE FROM extraction")
+        finally:
+            connection.close()
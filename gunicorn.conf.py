@@ -0,0 +1,82 @@
+"""Gunicorn configuration for the Sills application.
+
+Every setting can be overridden through the environment, e.g.
+GUNICORN_WORKERS=4 GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:app
+
+Reloading: `kill -HUP <master pid>` starts new workers and stops the old ones
+gracefully. With GUNICORN_PRELOAD enabled the application code is loaded in
+the master, so a code change needs a full restart (or USR2 upgrade) instead.
+"""
+import multiprocessing
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '56666')}"
+
+# One process per core plus one; threads cover the I/O-bound contract pages
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Load the app once in the master so workers share startup work (copy-on-write)
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+reload = _env_bool('GUNICORN_RELOAD', False)
+
+# A stopping worker sends no heartbeats while worker_exit lets its contract
+# analyses finish, so both limits leave room for one CONTRACT_JOB_TIMEOUT
+_contract_job_timeout = int(os.getenv('CONTRACT_JOB_TIMEOUT', 120))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', max(60, _contract_job_timeout + 10)))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', _contract_job_timeout + 10))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to bound memory growth; jitter avoids all restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Application logs go to stdout next to gunicorn's: workers sharing one rotating file would lose lines
+os.environ.setdefault('LOG_FILE', '')
+
+
+def on_starting(server):
+    """Check and initialise the database once, in the master, before forking."""
+    from app import initialize_database
+    from wsgi import app
+
+    if not initialize_database(app):
+        raise RuntimeError("Database initialisation failed, not starting workers")
+
+
+def post_fork(server, worker):
+    """Restart the log writer thread and drop database connections inherited from the master."""
+    from extensions import db
+    from logging_config import restart_log_listener
+    from wsgi import app
+
+    restart_log_listener()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """Let the worker's running contract jobs finish and fail its queued ones."""
+    from wsgi import app
+
+    queue = app.extensions.get('contract_jobs')
+    if queue is not None:
+        queue.shutdown()
+
+
+def child_exit(server, worker):
+    """Stop reporting the live-worker gauges of a worker that exited (see metrics.py)."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,83 @@
+"""Shrink contract images before they are sent to the vision model.
+
+Phone photos of contracts are often 10+ MB. The model reads a contract just
+as well from a rotated-upright, grayscale, contrast-normalised JPEG around
+2000px on the long edge, which is a fraction of the upload and token cost.
+"""
+import io
+import logging
+import mimetypes
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_EDGE = 2048  # px
+DEFAULT_TARGET_BYTES = 1_500_000
+START_QUALITY = 85
+MIN_QUALITY = 45
+QUALITY_STEP = 10
+SCALE_STEP = 0.8
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    prepared_bytes: int
+    width: int = 0
+    height: int = 0
+
+    @property
+    def ratio(self) -> float:
+        return self.prepared_bytes / self.original_bytes if self.original_bytes else 1.0
+
+
+def prepare_image(image_path: str, max_edge: int = DEFAULT_MAX_EDGE,
+                  target_bytes: int = DEFAULT_TARGET_BYTES,
+                  grayscale: bool = True, autocontrast: bool = True) -> PreparedImage:
+    """Rotate, downscale, normalise and re-encode an image to fit a byte budget.
+
+    Files Pillow cannot read (PDFs, for instance) are returned unchanged with
+    their real MIME type.
+    """
+    with open(image_path, 'rb') as image_file:
+        original = image_file.read()
+
+    try:
+        with Image.open(io.BytesIO(original)) as source:
+            img = ImageOps.exif_transpose(source)
+            img = img.convert('L' if grayscale else 'RGB')
+    except (UnidentifiedImageError, OSError) as e:
+        mime_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+        logger.info("Sending %s unprocessed (%s): %s", image_path, mime_type, e)
+        return PreparedImage(original, mime_type, len(original), len(original))
+
+    if autocontrast:
+        img = ImageOps.autocontrast(img, cutoff=1)
+
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    data = _encode_within_budget(img, target_bytes)
+    prepared = PreparedImage(data, 'image/jpeg', len(original), len(data), img.width, img.height)
+    logger.info("Prepared contract image: %d -> %d bytes (%dx%d)",
+                prepared.original_bytes, prepared.prepared_bytes, prepared.width, prepared.height)
+    return prepared
+
+
+def _encode_within_budget(img: Image.Image, target_bytes: int) -> bytes:
+    """Lower the JPEG quality, then the resolution, until the image fits target_bytes."""
+    while True:
+        for quality in range(START_QUALITY, MIN_QUALITY - 1, -QUALITY_STEP):
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG', quality=quality, optimize=True)
+            if buffer.tell() <= target_bytes:
+                return buffer.getvalue()
+
+        # Even the lowest quality is too big, so give up some resolution
+        if min(img.size) < 256:
+            return buffer.getvalue()
+        img = img.resize((int(img.width * SCALE_STEP), int(img.height * SCALE_STEP)), Image.LANCZOS)
@@ -0,0 +1,163 @@
+"""Job plan: the cutting layout, material totals and sill costs for one client.
+
+/materials, /price and /cutting_layout all read from the same plan, so the
+cutting layout is computed once. Plans are memoized per client, keyed by a
+hash of the client's sills and the settings snapshot version, so repeat
+visits reuse the result until a sill or a setting changes. The plan key
+changes with any of its inputs, so the JSON API uses it as the ETag.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from models import Sill
+from settings_snapshot import SettingsSnapshot
+from utils import (
+    calculate_cutting_layout, calculate_materials_for_sills, calculate_costs_for_sills
+)
+from cutting_optimizer import DEFAULT_STRATEGY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 128
+
+# Sill columns that affect the layout, materials or costs
+SILL_KEY_FIELDS = ('id', 'length', 'depth', 'color', 'sill_type', 'location', 'has_95mm')
+
+
+@dataclass(frozen=True)
+class JobPlan:
+    client_id: Optional[int]  # None for a what-if plan of unsaved sills
+    key: str
+    cutting_layout: Dict[str, List[Dict]]
+    materials: Dict[str, List[Dict]]
+    sill_costs: List[Dict]
+    total_material_cost: float
+    total_fitting_cost: float
+    total_cost: float
+
+    def layout_dict(self) -> Dict:
+        """The cutting layout in the compact form the JSON API returns."""
+        return {
+            name: [
+                {
+                    'board_length': board['board_length'],
+                    'offcut_id': board.get('offcut_id'),
+                    'used_length': board['total_length'],
+                    'remaining_length': board['remaining_length'],
+                    'pieces': [
+                        {'sill_id': piece['id'], 'length': piece['length'], 'location': piece['location']}
+                        for piece in board['pieces']
+                    ],
+                }
+                for board in boards
+            ]
+            for name, boards in self.cutting_layout.items()
+        }
+
+    def price_dict(self) -> Dict:
+        """Per-sill and total costs in the compact form the JSON API returns."""
+        return {
+            'sills': [
+                {
+                    'sill_id': item['sill']['id'],
+                    'material_cost': round(item['material_cost'], 2),
+                    'fitting_cost': round(item['fitting_cost'], 2),
+                    'total_cost': round(item['total_cost'], 2),
+                }
+                for item in self.sill_costs
+            ],
+            'total_material_cost': round(self.total_material_cost, 2),
+            'total_fitting_cost': round(self.total_fitting_cost, 2),
+            'total_cost': round(self.total_cost, 2),
+        }
+
+
+_lock = threading.Lock()
+_plans: 'OrderedDict[tuple, JobPlan]' = OrderedDict()
+
+
+def sills_content_hash(sills: List[Sill]) -> str:
+    """Hash the sill columns that feed into a plan, independent of query order."""
+    digest = hashlib.sha256()
+    for sill in sorted(sills, key=lambda s: s.id or 0):
+        digest.update(repr(tuple(getattr(sill, name) for name in SILL_KEY_FIELDS)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_job_plan(client_id: Optional[int], sills: List[Sill], snapshot: SettingsSnapshot,
+                   strategy: str = DEFAULT_STRATEGY, key: str = '',
+                   offcuts: Optional[Dict[str, List[Tuple[int, float]]]] = None) -> JobPlan:
+    """Compute the layout once and derive the materials and costs from it."""
+    settings = snapshot.settings
+    cutting_layout = calculate_cutting_layout(sills, settings, strategy=strategy, offcuts=offcuts,
+                                              stock=snapshot.stock)
+    materials = calculate_materials_for_sills(
+        sills, settings, strategy=strategy, cutting_layouts=cutting_layout, stock=snapshot.stock
+    ) if settings else {}
+
+    sill_costs = []
+    if snapshot.prices:
+        # Plain dicts so the cached plan never holds on to ORM instances
+        for item in calculate_costs_for_sills(sills, snapshot.prices, snapshot.stock):
+            sill_costs.append(dict(item, sill=item['sill'].to_dict()))
+
+    total_material_cost = sum(s['material_cost'] for s in sill_costs)
+    total_fitting_cost = sum(s['fitting_cost'] for s in sill_costs)
+
+    return JobPlan(
+        client_id=client_id,
+        key=key,
+        cutting_layout=cutting_layout,
+        materials=materials,
+        sill_costs=sill_costs,
+        total_material_cost=total_material_cost,
+        total_fitting_cost=total_fitting_cost,
+        total_cost=total_material_cost + total_fitting_cost
+    )
+
+
+def get_job_plan(client_id: int, sills: List[Sill], snapshot: SettingsSnapshot,
+                 strategy: str = DEFAULT_STRATEGY,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 offcuts: Optional[Dict[str, List[Tuple[int, float]]]] = None) -> JobPlan:
+    """Return the memoized plan for a client, building it if the inputs changed.
+
+    offcuts is the stock the layout may cut from (see offcuts.offcut_pool);
+    a change in it gives a new plan.
+    """
+    content_hash = sills_content_hash(sills)
+    offcuts_key = tuple(sorted((name, tuple(stock)) for name, stock in (offcuts or {}).items()))
+    cache_key = (client_id, content_hash, snapshot.version, strategy, offcuts_key)
+    variant = hashlib.sha256(repr((strategy, offcuts_key)).encode('utf-8')).hexdigest()[:8]
+
+    with _lock:
+        plan = _plans.get(cache_key)
+        if plan is not None:
+            _plans.move_to_end(cache_key)
+            logger.debug("Job plan cache hit for client %s", client_id)
+            return plan
+
+    plan = build_job_plan(client_id, sills, snapshot, strategy=strategy,
+                          key=f"{content_hash}-{snapshot.version}-{variant}", offcuts=offcuts)
+
+    with _lock:
+        _plans[cache_key] = plan
+        _plans.move_to_end(cache_key)
+        while len(_plans) > cache_size:
+            _plans.popitem(last=False)
+
+    return plan
+
+
+def clear_job_plans(client_id: Optional[int] = None) -> None:
+    """Forget memoized plans, for one client or for all of them."""
+    with _lock:
+        if client_id is None:
+            _plans.clear()
+            return
+        for cache_key in [k for k in _plans if k[0] == client_id]:
+            del _plans[cache_key]
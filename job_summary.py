@@ -0,0 +1,273 @@
+"""Client job summaries: running totals of each client's sills.
+
+A ClientJobSummary row holds a client's sill count, total length, last
+order date, metres per board, the least number of stock boards, and
+material and fitting cost. Listings
+and dashboards read it with one primary key lookup instead of pricing
+every sill.
+
+Rows are kept up to date incrementally. After each flush, the sills it
+inserted or edited are priced one by one, and their difference is added to
+their clients' rows in the same transaction. Deleting a sill, or moving it
+to another client or date, recounts the clients concerned from their
+sills. Bulk INSERTs bypass the flush, so contract_ingest refreshes its
+client explicitly.
+
+Totals are tied to the settings snapshot they were priced with. A row
+priced under other settings, prices or board stock is recomputed from the
+client's sills the next time it is read or changed. Every worker reloads
+its snapshot as soon as the settings version changes, so workers agree on
+which rows are current and never rewrite each other's.
+
+`flask rebuild-job-summaries` recomputes every row to repair any drift.
+"""
+import json
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from cutting_optimizer import EPSILON
+from models import Client, ClientJobSummary, Sill
+from settings_snapshot import SettingsSnapshot, get_settings_snapshot
+from utils import calculate_materials, calculate_material_cost, calculate_fitting_cost
+
+logger = logging.getLogger(__name__)
+
+# Sill columns the totals depend on
+SUMMARY_FIELDS = ('client_id', 'length', 'depth', 'color', 'sill_type', 'has_95mm', 'order_date')
+# Changes to these cannot be applied as a difference (a latest date cannot be
+# taken away), so the client is recounted from its sills instead
+RECOUNT_FIELDS = ('client_id', 'order_date')
+BATCH_SIZE = 500
+
+_table = ClientJobSummary.__table__
+
+
+@dataclass
+class JobTotals:
+    sill_count: int = 0
+    total_length: float = 0.0
+    board_metres: Dict[str, float] = field(default_factory=dict)
+    material_cost: float = 0.0
+    fitting_cost: float = 0.0
+    last_order_date: Optional[datetime] = None
+
+    def add(self, sill, snapshot: SettingsSnapshot, sign: int = 1) -> None:
+        """Add one sill's share of the totals, or take it away with sign=-1."""
+        self.sill_count += sign
+        self.total_length += sign * sill.length
+        for board in calculate_materials(sill, snapshot.settings).get('boards', []):
+            self.board_metres[board['name']] = self.board_metres.get(board['name'], 0.0) + sign * board['amount']
+        self.material_cost += sign * calculate_material_cost(sill, snapshot.prices, snapshot.stock)
+        self.fitting_cost += sign * calculate_fitting_cost(sill, snapshot.prices)
+        if sign > 0 and sill.order_date is not None:
+            self.last_order_date = max(filter(None, (self.last_order_date, sill.order_date)))
+
+    def merge(self, other: 'JobTotals') -> None:
+        self.sill_count += other.sill_count
+        self.total_length += other.total_length
+        for name, metres in other.board_metres.items():
+            self.board_metres[name] = self.board_metres.get(name, 0.0) + metres
+        self.material_cost += other.material_cost
+        self.fitting_cost += other.fitting_cost
+        if other.last_order_date is not None:
+            self.last_order_date = max(filter(None, (self.last_order_date, other.last_order_date)))
+
+    @classmethod
+    def from_row(cls, row) -> 'JobTotals':
+        return cls(row.sill_count, row.total_length, json.loads(row.board_metres),
+                   row.material_cost, row.fitting_cost, row.last_order_date)
+
+    def row(self, client_id: int, snapshot: SettingsSnapshot) -> Dict:
+        # Drop boards whose metres cancelled out, up to float rounding
+        metres = {name: round(value, 6) for name, value in sorted(self.board_metres.items())
+                  if value > EPSILON}
+        return {
+            'client_id': client_id,
+            'sill_count': self.sill_count,
+            'total_length': round(self.total_length, 6),
+            'board_metres': json.dumps(metres),
+            'board_count': sum(math.ceil(value * 1000 / snapshot.stock.max_length(name) - EPSILON)
+                               for name, value in metres.items()),
+            'material_cost': round(self.material_cost, 6),
+            'fitting_cost': round(self.fitting_cost, 6),
+            'last_order_date': self.last_order_date,
+            'settings_version': snapshot.version,
+            'updated_at': datetime.utcnow(),
+        }
+
+
+def _ready(snapshot: SettingsSnapshot) -> bool:
+    return bool(snapshot.settings and snapshot.prices)
+
+
+def compute_totals(connection, client_ids: List[int], snapshot: SettingsSnapshot) -> Dict[int, JobTotals]:
+    """Totals of the given clients from their sill rows; clients without sills get empty totals."""
+    totals = {client_id: JobTotals() for client_id in client_ids}
+    columns = [getattr(Sill, name) for name in SUMMARY_FIELDS]
+    for start in range(0, len(client_ids), BATCH_SIZE):
+        batch = client_ids[start:start + BATCH_SIZE]
+        for row in connection.execute(select(*columns).where(Sill.client_id.in_(batch))):
+            sill = SimpleNamespace(**row._asdict())
+            totals[sill.client_id].add(sill, snapshot)
+    return totals
+
+
+def _write(connection, rows: List[Dict]) -> None:
+    if not rows:
+        return
+    statement = sqlite_insert(_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[_table.c.client_id],
+        set_={name: statement.excluded[name] for name in rows[0] if name != 'client_id'}
+    )
+    connection.execute(statement, rows)
+
+
+def refresh_client_summaries(client_ids: Iterable[int], connection=None) -> List[Dict]:
+    """Recompute the clients' rows from their sills and return them.
+
+    Runs on the given connection, in its transaction, or else in a
+    transaction of its own. Nothing is written until the settings and
+    prices exist.
+    """
+    client_ids = sorted(set(client_ids))
+    snapshot = get_settings_snapshot()
+    if not client_ids or not _ready(snapshot):
+        return []
+
+    def refresh(connection) -> List[Dict]:
+        rows = [totals.row(client_id, snapshot)
+                for client_id, totals in compute_totals(connection, client_ids, snapshot).items()]
+        _write(connection, rows)
+        return rows
+
+    if connection is not None:
+        return refresh(connection)
+    with db.engine.begin() as connection:
+        return refresh(connection)
+
+
+def get_job_summaries(client_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Summaries (see ClientJobSummary.to_dict) of the given clients by id.
+
+    One primary key lookup; missing or stale rows are recomputed and saved first.
+    """
+    client_ids = list(client_ids)
+    if not client_ids:
+        return {}
+    snapshot = get_settings_snapshot()
+    rows = {row.client_id: row._asdict()
+            for row in db.session.execute(select(_table).where(_table.c.client_id.in_(client_ids)))}
+
+    stale = [client_id for client_id in client_ids
+             if client_id not in rows or rows[client_id]['settings_version'] != snapshot.version]
+    if stale:
+        logger.debug("Refreshing %d stale job summaries", len(stale))
+        for row in refresh_client_summaries(stale):
+            rows[row['client_id']] = row
+    return {client_id: ClientJobSummary(**row).to_dict() for client_id, row in rows.items()}
+
+
+def rebuild_job_summaries() -> int:
+    """Recompute every client's row and drop rows of clients that no longer exist."""
+    client_ids = list(db.session.execute(select(Client.id).order_by(Client.id)).scalars())
+    count = 0
+    with db.engine.begin() as connection:
+        connection.execute(delete(_table).where(_table.c.client_id.not_in(select(Client.id))))
+        for start in range(0, len(client_ids), BATCH_SIZE):
+            count += len(refresh_client_summaries(client_ids[start:start + BATCH_SIZE], connection))
+    logger.info("Rebuilt %d job summaries", count)
+    return count
+
+
+def _old_values(sill: Sill) -> Optional[SimpleNamespace]:
+    """The sill as it was before this flush, or None if it was never loaded."""
+    state = inspect(sill)
+    values = {}
+    for name in SUMMARY_FIELDS:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif name in state.dict:
+            values[name] = state.dict[name]
+        else:
+            return None
+    return SimpleNamespace(**values)
+
+
+def _old_client_id(sill: Sill) -> Optional[int]:
+    history = inspect(sill).attrs.client_id.history
+    return history.deleted[0] if history.deleted else inspect(sill).dict.get('client_id')
+
+
+def _after_flush(session, flush_context):
+    inserted = [obj for obj in session.new if isinstance(obj, Sill)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Sill)]
+    updated = [obj for obj in session.dirty if isinstance(obj, Sill)
+               and any(inspect(obj).attrs[name].history.has_changes() for name in SUMMARY_FIELDS)]
+    deleted_clients = {obj.id for obj in session.deleted if isinstance(obj, Client)}
+    if not (inserted or deleted or updated or deleted_clients):
+        return
+
+    connection = session.connection()
+    snapshot = get_settings_snapshot()
+    changes: Dict[int, JobTotals] = {}
+    recompute = set()
+
+    def change(sill, sign: int) -> None:
+        if sill.client_id is not None:
+            changes.setdefault(sill.client_id, JobTotals()).add(sill, snapshot, sign)
+
+    if _ready(snapshot):
+        for sill in inserted:
+            change(sill, 1)
+        # A deleted sill may have been the client's latest order
+        recompute.update(_old_client_id(sill) for sill in deleted)
+        for sill in updated:
+            state = inspect(sill)
+            old = _old_values(sill)
+            if old is None or any(state.attrs[name].history.has_changes() for name in RECOUNT_FIELDS):
+                recompute.update((_old_client_id(sill), sill.client_id))
+                continue
+            change(old, -1)
+            change(sill, 1)
+    recompute.discard(None)
+
+    client_ids = (set(changes) | recompute) - deleted_clients
+    if client_ids:
+        existing = {row.client_id: row for row in connection.execute(
+            select(_table).where(_table.c.client_id.in_(client_ids)))}
+        rows = []
+        for client_id in client_ids - recompute:
+            row = existing.get(client_id)
+            if row is None or row.settings_version != snapshot.version:
+                recompute.add(client_id)
+                continue
+            totals = JobTotals.from_row(row)
+            totals.merge(changes[client_id])
+            rows.append(totals.row(client_id, snapshot))
+        _write(connection, rows)
+        refresh_client_summaries(recompute & client_ids, connection)
+    if deleted_clients:
+        connection.execute(delete(_table).where(_table.c.client_id.in_(deleted_clients)))
+
+
+def _keep_old_client(target, value, old_value, initiator):
+    return value
+
+
+def init_job_summaries(app) -> None:
+    """Keep summaries up to date as sills are flushed."""
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        # Load the previous client of an expired sill before it is moved, so the
+        # client it leaves is recounted too (see _old_client_id)
+        event.listen(Sill.client_id, 'set', _keep_old_client, active_history=True, retval=True)
@@ -0,0 +1,147 @@
+"""Application logging: JSON lines, written off the request threads.
+
+configure_logging() gives the root logger a single QueueHandler. Request
+and worker threads only put records on an in-memory queue. A
+QueueListener thread formats them and writes them to stdout and, when
+LOG_FILE is set, to a file. The file rotates at LOG_MAX_BYTES, or on
+LOG_ROTATE_WHEN when that is set. A slow disk therefore never holds up a
+request.
+
+LOG_LEVEL sets the root level and LOG_LEVELS overrides it per logger. A
+record below its logger's level is dropped before its message is built.
+Pass values as %-style arguments, not f-strings: a disabled
+logger.debug("... %s", value) then costs one level check.
+
+Threads do not survive a fork, so gunicorn workers call
+restart_log_listener() from post_fork. With several workers, log to stdout
+and let the process manager collect the output (gunicorn.conf.py does
+this). Several processes rotating one file lose lines.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional
+
+from flask import has_request_context, request
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_handler: Optional['RequestQueueHandler'] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request and extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """Queues records for the listener thread, tagged with the request they were logged in."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs on the logging thread: resolve everything that may change or not
+        # be safe to read later, i.e. the message arguments and the request
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+        return record
+
+
+def parse_levels(levels: str) -> Dict[str, str]:
+    """'contract_parser=DEBUG,httpx=WARNING' -> {'contract_parser': 'DEBUG', 'httpx': 'WARNING'}."""
+    parsed = {}
+    for item in filter(None, (part.strip() for part in levels.split(','))):
+        name, separator, level = item.partition('=')
+        if not separator or not name.strip() or not level.strip():
+            raise ValueError(f"Invalid LOG_LEVELS entry {item!r}, expected logger=LEVEL")
+        parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+def _file_handler(config: Mapping) -> logging.Handler:
+    if config['LOG_ROTATE_WHEN']:
+        return logging.handlers.TimedRotatingFileHandler(
+            config['LOG_FILE'], when=config['LOG_ROTATE_WHEN'],
+            backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8', delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'],
+        backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8', delay=True
+    )
+
+
+def _start_listener(handlers) -> None:
+    global _listener
+    _handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging(config: Mapping) -> None:
+    """Route all logging through the queue; the first app created in a process sets it up."""
+    global _handler
+    if _handler is not None:
+        return
+
+    formatter = JsonFormatter() if config['LOG_FORMAT'] == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if config['LOG_FILE']:
+        handlers.append(_file_handler(config))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    _handler = RequestQueueHandler(queue.SimpleQueue())
+    root.addHandler(_handler)
+    root.setLevel(config['LOG_LEVEL'].upper())
+    for name, level in parse_levels(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level)
+
+    _start_listener(handlers)
+    atexit.register(stop_log_listener)
+
+
+def restart_log_listener() -> None:
+    """Start a new listener thread, with a new queue, in a forked process."""
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def stop_log_listener() -> None:
+    """Write out the records still queued and stop the listener thread."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
@@ -0,0 +1,352 @@
+"""Columnar material and cost calculations with NumPy.
+
+The per-sill functions in utils walk ORM objects one at a time, which is
+fine for one client's job but slow for a purchasing run across every
+active job. Here the sills of any set of clients are loaded into arrays
+(length, depth, colour code, type code, has_95mm) with a single query,
+and board metres, consumables and costs come from vectorized arithmetic
+and group-by reductions. Results match calculate_materials_for_sills,
+calculate_material_cost and calculate_fitting_cost.
+"""
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from board_stock import StockCatalogue, stock_summary
+from cutting_optimizer import cheapest_stock_mix, EPSILON, DEFAULT_STRATEGY
+from extensions import db
+from models import Client, Sill
+from settings_snapshot import PriceValues, SettingsValues
+
+CAPIT_SIZES = np.array([225, 250, 300])
+FITTING_PRICE_FIELDS = {
+    'Straight': 'fitting_price_straight',
+    'C-shaped': 'fitting_price_c_shape',
+    'Bay-Curve shaped': 'fitting_price_bay_curve',
+    'Conservatory': 'fitting_price_conservatory',
+}
+
+# Board lines a sill can need, in the order utils.calculate_materials lists them
+MAIN_BOARD, EXTRA_CAPIT_BOARD, BOARD_95MM = range(3)
+
+
+@dataclass(frozen=True)
+class SillColumns:
+    sill_id: np.ndarray
+    client_id: np.ndarray
+    length: np.ndarray
+    depth: np.ndarray
+    color_code: np.ndarray  # index into colors
+    type_code: np.ndarray  # index into sill_types
+    has_95mm: np.ndarray
+    colors: List[str]
+    sill_types: List[str]
+
+    def __len__(self) -> int:
+        return len(self.sill_id)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> 'SillColumns':
+        """Build from (id, client_id, length, depth, color, sill_type, has_95mm) tuples."""
+        rows = list(rows)
+        if not rows:
+            empty = np.array([], dtype=np.int64)
+            return cls(empty, empty, np.array([]), np.array([]), empty, empty,
+                       np.array([], dtype=bool), [], [])
+
+        sill_ids, client_ids, lengths, depths, colors, sill_types, has_95mm = zip(*rows)
+        color_names, color_code = _categorical(colors)
+        type_names, type_code = _categorical(sill_types)
+        return cls(
+            np.array(sill_ids, dtype=np.int64),
+            np.array(client_ids, dtype=np.int64),
+            np.array(lengths, dtype=np.float64),
+            np.array(depths, dtype=np.float64),
+            color_code,
+            type_code,
+            np.array([bool(value) for value in has_95mm]),
+            color_names,
+            type_names,
+        )
+
+    @classmethod
+    def from_sills(cls, sills: Sequence[Sill]) -> 'SillColumns':
+        return cls.from_rows((sill.id, sill.client_id, sill.length, sill.depth, sill.color,
+                              sill.sill_type, sill.has_95mm) for sill in sills)
+
+    def color_mask(self, color: str) -> np.ndarray:
+        if color not in self.colors:
+            return np.zeros(len(self), dtype=bool)
+        return self.color_code == self.colors.index(color)
+
+    def type_mask(self, sill_type: str) -> np.ndarray:
+        if sill_type not in self.sill_types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_code == self.sill_types.index(sill_type)
+
+
+def _categorical(values: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    # Codes follow first appearance, so grouped output keeps the per-sill functions' order
+    names = list(dict.fromkeys(values))
+    index = {name: code for code, name in enumerate(names)}
+    return names, np.fromiter((index[value] for value in values), dtype=np.int64, count=len(values))
+
+
+SILL_COLUMNS = ('id', 'client_id', 'length', 'depth', 'color', 'sill_type', 'has_95mm')
+
+
+def fetch_sill_rows(columns: Sequence[str] = SILL_COLUMNS, client_ids: Optional[Iterable[int]] = None,
+                    status: Optional[str] = 'active', since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> List[Tuple]:
+    """Plain tuples of the given sill columns, ordered by id, in one query.
+
+    Rows are fetched through the DB-API cursor: building SQLAlchemy Row
+    objects takes several times longer than the query itself for tens of
+    thousands of sills, and only plain tuples are needed here. The order
+    date range is since <= order_date < until.
+    """
+    conditions, params = [], []
+    if client_ids is not None:
+        client_ids = [int(client_id) for client_id in client_ids]
+        if not client_ids:
+            return []
+        conditions.append(f"client_id IN ({', '.join('?' * len(client_ids))})")
+        params.extend(client_ids)
+    if status is not None:
+        conditions.append("status = ?")
+        params.append(status)
+    # Same text format SQLAlchemy stores DateTime columns in on SQLite
+    if since is not None:
+        conditions.append("order_date >= ?")
+        params.append(since.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    if until is not None:
+        conditions.append("order_date < ?")
+        params.append(until.strftime('%Y-%m-%d %H:%M:%S.%f'))
+
+    sql = f"SELECT {', '.join(columns)} FROM sill"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        return cursor.execute(sql + " ORDER BY id", params).fetchall()
+    finally:
+        cursor.close()
+
+
+def load_sill_columns(client_ids: Optional[Iterable[int]] = None, status: Optional[str] = 'active',
+                      since: Optional[datetime] = None, until: Optional[datetime] = None) -> SillColumns:
+    """Load the sills of the given clients (all clients if None) into arrays."""
+    return SillColumns.from_rows(fetch_sill_rows(SILL_COLUMNS, client_ids, status, since, until))
+
+
+def _board_lines(cols: SillColumns):
+    """Yield (line, sill mask, group key, name for a key) for every board line."""
+    n_colors = max(len(cols.colors), 1)
+    straight = cols.type_mask('Straight')
+    white = cols.color_mask('White')
+
+    # Main board: GP for straight sills, otherwise a Capit board sized by depth (kind 1-3)
+    capit_kind = 1 + np.searchsorted([210, 240], cols.depth, side='left')
+    kind = np.where(straight, 0, capit_kind)
+
+    def main_name(key: int) -> str:
+        kind_value, color = divmod(key, n_colors)
+        if kind_value == 0:
+            return f"GP Board - {cols.colors[color]}"
+        return f"Capit Board {CAPIT_SIZES[kind_value - 1]}mm - {cols.colors[color]}"
+
+    def extra_name(key: int) -> str:
+        is_white, color = divmod(key, n_colors)
+        return f"Capit Board {'150mm' if is_white else '175mm'} - {cols.colors[color]}"
+
+    def board_95mm_name(key: int) -> str:
+        return f"95mm Board - {cols.colors[key]}"
+
+    everything = np.ones(len(cols), dtype=bool)
+    yield MAIN_BOARD, everything, kind * n_colors + cols.color_code, main_name
+    yield EXTRA_CAPIT_BOARD, ~straight, white.astype(np.int64) * n_colors + cols.color_code, extra_name
+    yield BOARD_95MM, cols.has_95mm, cols.color_code, board_95mm_name
+
+
+def board_sills(cols: SillColumns) -> List[Tuple[str, np.ndarray]]:
+    """Per board name, the indices of the sills that need a piece of it.
+
+    Names are in the order the per-sill code first lists them.
+    """
+    positions = np.arange(len(cols)) * 3
+
+    groups = []
+    for line, mask, keys, name_for in _board_lines(cols):
+        if not mask.any():
+            continue
+        indices = np.flatnonzero(mask)
+        unique_keys, inverse = np.unique(keys[mask], return_inverse=True)
+        first = np.full(len(unique_keys), np.iinfo(np.int64).max)
+        np.minimum.at(first, inverse, positions[mask] + line)
+        for group, key in enumerate(unique_keys):
+            groups.append((int(first[group]), name_for(int(key)), indices[inverse == group]))
+
+    groups.sort(key=lambda group: group[0])
+    return [(name, indices) for _, name, indices in groups]
+
+
+def board_lengths(cols: SillColumns, settings: SettingsValues) -> List[Tuple[str, np.ndarray]]:
+    """Per board name, the length (mm, with cutting allowance) each sill needs of it."""
+    total_length = cols.length + settings.cutting_allowance
+    return [(name, total_length[indices]) for name, indices in board_sills(cols)]
+
+
+def split_pieces(lengths: np.ndarray, board_length: float) -> np.ndarray:
+    """Cut lengths longer than a board into board-length pieces plus the remainder."""
+    return split_pieces_with_owners(lengths, board_length)[0]
+
+
+def split_pieces_with_owners(lengths: np.ndarray, board_length: float) -> Tuple[np.ndarray, np.ndarray]:
+    """split_pieces, plus for every piece the index of the length it was cut from."""
+    counts = np.maximum(np.ceil(lengths / board_length), 1).astype(np.int64)
+    pieces = np.full(int(counts.sum()), float(board_length))
+    last = np.cumsum(counts) - 1
+    pieces[last] = lengths - (counts - 1) * board_length
+    return pieces, np.repeat(np.arange(len(lengths)), counts)
+
+
+def consumables(cols: SillColumns, settings: SettingsValues) -> Dict[str, List[Dict]]:
+    """Glue, silicone and PVC cleaner totals, as in calculate_materials_for_sills."""
+    total_length = cols.length + settings.cutting_allowance
+    metres = total_length.sum() / 1000
+    coloured_metres = total_length[~cols.color_mask('White')].sum() / 1000
+
+    fixall = math.ceil(metres * settings.fixall_per_meter + coloured_metres * settings.glue_color_extra)
+
+    silicones = [{'name': "S2 Clear Silicone", 'amount': metres * settings.silicone_per_meter,
+                  'unit': 'bottles'}]
+    per_color = np.bincount(cols.color_code, weights=total_length, minlength=len(cols.colors)) / 1000
+    for code, color in enumerate(cols.colors):
+        name = "Silicone White" if color == 'White' else f"Silicone ({color})"
+        silicones.append({'name': name, 'amount': per_color[code] * settings.silicone_color_per_meter,
+                          'unit': 'bottles'})
+
+    return {
+        'glues': [
+            {'name': "Hot Glue", 'amount': fixall, 'unit': 'sticks'},
+            {'name': "Fixall White", 'amount': fixall, 'unit': 'ml'},
+        ],
+        'silicones': silicones,
+        'other': [{'name': "PVC Cleaner", 'amount': metres * settings.pvc_cleaner_per_meter,
+                   'unit': 'bottles'}],
+    }
+
+
+def materials_for_columns(cols: SillColumns, settings: SettingsValues, stock: StockCatalogue,
+                          strategy: str = DEFAULT_STRATEGY) -> Dict[str, List[Dict]]:
+    """Same result as utils.calculate_materials_for_sills for the same sills.
+
+    Boards are counted by packing each board type's pieces onto the
+    cheapest stock mix, so use this for one job; purchasing_report only
+    needs metres.
+    """
+    boards = []
+    for name, lengths in board_lengths(cols, settings):
+        pieces = split_pieces(lengths, stock.max_length(name))
+        layout = [{'board_length': length}
+                  for length, _ in cheapest_stock_mix(pieces.tolist(), stock.stock_for(name), strategy=strategy)]
+        boards.append({
+            'name': name,
+            'amount': len(layout),
+            'total_length': pieces.sum() / 1000,
+            'stock': stock_summary(layout),
+            'unit': 'boards',
+        })
+    return {'boards': boards, **consumables(cols, settings)}
+
+
+def piece_costs(stock: StockCatalogue, board_name: str, lengths: np.ndarray) -> np.ndarray:
+    """StockCatalogue.piece_cost for an array of lengths."""
+    stock_lengths, cheapest = (np.array(values) for values in stock.price_table(board_name))
+    longest = stock_lengths[-1]
+    full_boards = np.maximum(np.ceil(lengths / longest - EPSILON), 1) - 1
+    remainder = lengths - full_boards * longest
+    position = np.minimum(np.searchsorted(stock_lengths, remainder - EPSILON, side='left'), len(stock_lengths) - 1)
+    return full_boards * cheapest[-1] + cheapest[position]
+
+
+def sill_costs(cols: SillColumns, prices: PriceValues, stock: StockCatalogue) -> Tuple[np.ndarray, np.ndarray]:
+    """Material and fitting cost of every sill, as calculate_material_cost/calculate_fitting_cost."""
+    straight = cols.type_mask('Straight')
+
+    # Boards are priced by board type, which the colour does not change
+    material = np.zeros(len(cols))
+    capit_kind = np.searchsorted([210, 240], cols.depth, side='left')
+    for kind, size in enumerate(CAPIT_SIZES):
+        mask = ~straight & (capit_kind == kind)
+        if mask.any():
+            material[mask] = piece_costs(stock, f"Capit Board {size}mm", cols.length[mask])
+    if straight.any():
+        material[straight] = piece_costs(stock, "GP Board", cols.length[straight])
+    if cols.has_95mm.any():
+        material[cols.has_95mm] += piece_costs(stock, "95mm Board", cols.length[cols.has_95mm])
+
+    material += np.where(cols.color_mask('White'), np.ceil(cols.length / 500) * prices.hot_glue_price, 0.0)
+    material += np.ceil(cols.length / 3000) * (prices.silicone_price + prices.s2_clear_silicone_price)
+
+    type_prices = np.array([getattr(prices, FITTING_PRICE_FIELDS[name]) if name in FITTING_PRICE_FIELDS else 0.0
+                            for name in cols.sill_types] or [0.0])
+    fitting = type_prices[cols.type_code] + np.where(cols.has_95mm, prices.fitting_price_95mm, 0.0)
+    return material, fitting
+
+
+def purchasing_report(cols: SillColumns, settings: SettingsValues, prices: PriceValues,
+                      stock: StockCatalogue) -> Dict:
+    """Material totals and costs across many jobs, with a per-client breakdown."""
+    boards = []
+    for name, lengths in board_lengths(cols, settings):
+        metres = lengths.sum() / 1000
+        boards.append({
+            'name': name,
+            'metres': metres,
+            # Lower bound in the longest stock length; the real count depends on how each job is cut
+            'min_boards': int(math.ceil(metres * 1000 / stock.max_length(name) - EPSILON)),
+        })
+
+    material, fitting = sill_costs(cols, prices, stock)
+    client_ids, client_index = np.unique(cols.client_id, return_inverse=True)
+    per_client = {
+        'sills': np.bincount(client_index, minlength=len(client_ids)),
+        'metres': np.bincount(client_index, weights=cols.length + settings.cutting_allowance,
+                              minlength=len(client_ids)) / 1000,
+        'material_cost': np.bincount(client_index, weights=material, minlength=len(client_ids)),
+        'fitting_cost': np.bincount(client_index, weights=fitting, minlength=len(client_ids)),
+    }
+    clients = [
+        {
+            'client_id': int(client_id),
+            'sills': int(per_client['sills'][i]),
+            'metres': float(per_client['metres'][i]),
+            'material_cost': float(per_client['material_cost'][i]),
+            'fitting_cost': float(per_client['fitting_cost'][i]),
+            'total_cost': float(per_client['material_cost'][i] + per_client['fitting_cost'][i]),
+        }
+        for i, client_id in enumerate(client_ids)
+    ]
+
+    return {
+        'sill_count': len(cols),
+        'client_count': len(client_ids),
+        'boards': boards,
+        **consumables(cols, settings),
+        'clients': clients,
+        'total_material_cost': float(material.sum()),
+        'total_fitting_cost': float(fitting.sum()),
+        'total_cost': float(material.sum() + fitting.sum()),
+    }
+
+
+def client_names(client_ids: Iterable[int]) -> Dict[int, str]:
+    rows = db.session.execute(
+        select(Client.id, Client.first_name, Client.last_name).where(Client.id.in_(list(client_ids)))
+    )
+    return {row.id: f"{row.first_name} {row.last_name}" for row in rows}
@@ -0,0 +1,116 @@
+"""Prometheus metrics, served at /metrics.
+
+Exported:
+- request latency per route (prometheus-flask-exporter, grouped by endpoint)
+- SQL statements and SQL time per request, per route, counted through
+  SQLAlchemy cursor events (the raw DB-API reads in material_engine are not
+  counted)
+- contract extraction: attempts, retries, OpenAI latency and image sizes
+- cutting optimizer time and the boards used by the last layout
+
+Every measurement is a perf_counter call and a histogram observation, so
+metrics are on by default in production. Under gunicorn set
+PROMETHEUS_MULTIPROC_DIR to an empty directory so /metrics adds up all
+workers (see child_exit in gunicorn.conf.py).
+"""
+import logging
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_flask_exporter import PrometheusMetrics
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from extensions import limiter
+
+logger = logging.getLogger(__name__)
+
+SQL_QUERIES = Histogram(
+    'sills_sql_queries_per_request', 'SQL statements executed while handling a request',
+    ['endpoint'], buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+SQL_SECONDS = Histogram(
+    'sills_sql_seconds_per_request', 'Time spent in SQL statements while handling a request',
+    ['endpoint'], buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+
+CONTRACT_ATTEMPTS = Histogram(
+    'sills_contract_extract_attempts', 'OpenAI requests made to extract one contract',
+    buckets=(1, 2, 3, 5)
+)
+CONTRACT_RETRIES = Counter('sills_contract_extract_retries_total', 'OpenAI requests that were retries')
+CONTRACT_SECONDS = Histogram(
+    'sills_contract_extract_seconds', 'Time to extract the text of one contract, retries included',
+    ['outcome'], buckets=(1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+)
+OPENAI_SECONDS = Histogram(
+    'sills_openai_request_seconds', 'Latency of one OpenAI extraction request',
+    ['outcome'], buckets=(.5, 1, 2.5, 5, 7.5, 10, 15, 20, 30, 60)
+)
+CONTRACT_IMAGE_BYTES = Histogram(
+    'sills_contract_image_bytes', 'Contract image size as uploaded and as sent to OpenAI (base64)',
+    ['stage'], buckets=(50e3, 100e3, 250e3, 500e3, 1e6, 2e6, 4e6, 8e6, 16e6)
+)
+
+OPTIMIZER_SECONDS = Histogram(
+    'sills_cutting_optimizer_seconds', 'Time to pack the pieces of a cutting layout onto boards',
+    ['source', 'strategy'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+BOARDS_USED = Gauge(
+    'sills_cutting_boards_used', 'New boards used by the last cutting layout computed',
+    ['source'], multiprocess_mode='mostrecent'
+)
+
+http_metrics = PrometheusMetrics.for_app_factory(
+    path='/metrics', group_by='endpoint', metrics_decorator=limiter.exempt
+)
+
+
+def record_contract_extraction(seconds: float, attempts: int, succeeded: bool) -> None:
+    CONTRACT_SECONDS.labels('success' if succeeded else 'failure').observe(seconds)
+    CONTRACT_ATTEMPTS.observe(attempts)
+    if attempts > 1:
+        CONTRACT_RETRIES.inc(attempts - 1)
+
+
+def record_layout(source: str, strategy: str, seconds: float, boards: int) -> None:
+    """One packing run: source is 'job' for a client layout, 'production' for one production run board."""
+    OPTIMIZER_SECONDS.labels(source, strategy).observe(seconds)
+    BOARDS_USED.labels(source).set(boards)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_queries' in g:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is not None and has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += time.perf_counter() - start
+
+
+def init_metrics(app) -> None:
+    """Serve /metrics and collect per-request SQL counts, unless METRICS_ENABLED is off."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    http_metrics.init_app(app)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_metrics():
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_sql_metrics(response):
+        if 'sql_queries' in g:
+            endpoint = request.endpoint or 'none'
+            SQL_QUERIES.labels(endpoint).observe(g.sql_queries)
+            SQL_SECONDS.labels(endpoint).observe(g.sql_seconds)
+        return response
@@ -0,0 +1,29 @@
+"""Add indexes for the hot client and sill lookups
+
+Revision ID: 3f1c2a7d9b10
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have these indexes
+    op.create_index('ix_sill_client_id', 'sill', ['client_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_client_phone', 'client', ['phone'], unique=False, if_not_exists=True)
+    op.create_index('ix_client_name', 'client', ['last_name', 'first_name'], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_client_name', table_name='client', if_exists=True)
+    op.drop_index('ix_client_phone', table_name='client', if_exists=True)
+    op.drop_index('ix_sill_client_id', table_name='sill', if_exists=True)
@@ -0,0 +1,43 @@
+"""Add the contract job table
+
+Revision ID: a1d6f3b8c2e4
+Revises: d3f7a1c8e5b9
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d6f3b8c2e4'
+down_revision = 'd3f7a1c8e5b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'contract_job' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'contract_job',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('filepath', sa.String(length=500), nullable=False),
+            sa.Column('preview_key', sa.String(length=32), nullable=True),
+            sa.Column('extracted_text', sa.Text(), nullable=True),
+            sa.Column('result', sa.Text(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_contract_job_status', 'contract_job', ['status'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_contract_job_status', table_name='contract_job')
+    op.drop_table('contract_job')
@@ -0,0 +1,33 @@
+"""Add the client_fts full-text search index and its sync triggers
+
+Revision ID: a8e4c6f2d731
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e4c6f2d731'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = [
+    'client_fts_client_ai', 'client_fts_client_au', 'client_fts_client_ad',
+    'client_fts_sill_ai', 'client_fts_sill_au', 'client_fts_sill_ad',
+]
+
+
+def upgrade():
+    # The DDL lives in search_index so the migration and db.create_all() setups stay identical;
+    # it is idempotent and fills the index on first creation
+    from search_index import install_search_index
+    install_search_index(op.get_bind())
+
+
+def downgrade():
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS client_fts")
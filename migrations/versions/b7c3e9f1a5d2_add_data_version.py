@@ -0,0 +1,32 @@
+"""Add the data version counter for the response cache
+
+Revision ID: b7c3e9f1a5d2
+Revises: f4b8d2e6a9c3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3e9f1a5d2'
+down_revision = 'f4b8d2e6a9c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'data_version' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'data_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
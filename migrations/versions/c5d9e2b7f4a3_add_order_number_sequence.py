@@ -0,0 +1,32 @@
+"""Add the per-day order number sequence
+
+Revision ID: c5d9e2b7f4a3
+Revises: a8e4c6f2d731
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d9e2b7f4a3'
+down_revision = 'a8e4c6f2d731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'order_number_sequence' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'order_number_sequence',
+        sa.Column('day', sa.String(length=8), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('order_number_sequence')
@@ -0,0 +1,42 @@
+"""Add the client job summary table
+
+Revision ID: d3f7a1c8e5b9
+Revises: b7c3e9f1a5d2
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7a1c8e5b9'
+down_revision = 'b7c3e9f1a5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'client_job_summary' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'client_job_summary',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('sill_count', sa.Integer(), nullable=False),
+        sa.Column('total_length', sa.Float(), nullable=False),
+        sa.Column('board_metres', sa.Text(), nullable=False),
+        sa.Column('board_count', sa.Integer(), nullable=False),
+        sa.Column('material_cost', sa.Float(), nullable=False),
+        sa.Column('fitting_cost', sa.Float(), nullable=False),
+        sa.Column('last_order_date', sa.DateTime(), nullable=True),
+        sa.Column('settings_version', sa.String(length=16), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('client_id')
+    )
+    # Filled on first read, or all at once with `flask rebuild-job-summaries`
+
+
+def downgrade():
+    op.drop_table('client_job_summary')
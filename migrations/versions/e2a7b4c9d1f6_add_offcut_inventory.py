@@ -0,0 +1,42 @@
+"""Add the offcut inventory
+
+Revision ID: e2a7b4c9d1f6
+Revises: c5d9e2b7f4a3
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7b4c9d1f6'
+down_revision = 'c5d9e2b7f4a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'offcut' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'offcut',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('board_key', sa.String(length=100), nullable=False),
+            sa.Column('length', sa.Float(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('client_id', sa.Integer(), nullable=True),
+            sa.Column('source_client_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='SET NULL'),
+            sa.ForeignKeyConstraint(['source_client_id'], ['client.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_offcut_lookup', 'offcut', ['board_key', 'status', 'length'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_offcut_lookup', table_name='offcut')
+    op.drop_table('offcut')
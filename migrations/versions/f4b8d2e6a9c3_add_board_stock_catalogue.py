@@ -0,0 +1,35 @@
+"""Add the board stock catalogue
+
+Revision ID: f4b8d2e6a9c3
+Revises: e2a7b4c9d1f6
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d2e6a9c3'
+down_revision = 'e2a7b4c9d1f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the table
+    if 'board_stock' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'board_stock',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('board_type', sa.String(length=50), nullable=False),
+        sa.Column('length', sa.Float(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('board_type', 'length', name='uq_board_stock_type_length')
+    )
+
+
+def downgrade():
+    op.drop_table('board_stock')
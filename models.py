@@ -1,6 +1,7 @@
+import json
 from datetime import datetime
-import random
 from extensions import db
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import Optional, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -8,10 +9,14 @@ if TYPE_CHECKING:
 
 class Client(db.Model):
     __allow_unmapped__ = True
+    __table_args__ = (
+        # Serves both the /clients ordering and the first+last name dedupe lookup
+        db.Index('ix_client_name', 'last_name', 'first_name'),
+    )
     id: int = db.Column(db.Integer, primary_key=True)
     first_name: str = db.Column(db.String(50), nullable=False)
     last_name: str = db.Column(db.String(50), nullable=False)
-    phone: str = db.Column(db.String(20), nullable=False)
+    phone: str = db.Column(db.String(20), nullable=False, index=True)
     mobile: Optional[str] = db.Column(db.String(20), nullable=True)
     email: Optional[str] = db.Column(db.String(120), nullable=True)
     address: str = db.Column(db.String(200), nullable=False)
@@ -29,7 +34,7 @@ class Client(db.Model):
 class Sill(db.Model):
     __allow_unmapped__ = True
     id: int = db.Column(db.Integer, primary_key=True)
-    client_id: int = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
+    client_id: int = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False, index=True)
     order_number: str = db.Column(db.String(20), unique=True, nullable=False)
     length: float = db.Column(db.Float, nullable=False)
     depth: float = db.Column(db.Float, nullable=False)
@@ -44,7 +49,21 @@ class Sill(db.Model):
 
     @staticmethod
     def generate_order_number() -> str:
-        return f"ORD-{datetime.now().strftime('%Y%m%d')}-{random.randint(1000, 9999)}"
+        return Sill.allocate_order_numbers(1)[0]
+
+    @staticmethod
+    def allocate_order_numbers(count: int) -> List[str]:
+        """Reserve `count` consecutive order numbers for today in one statement.
+
+        Runs in the caller's transaction, so the numbers are released again if
+        it rolls back. The 5-digit suffix never collides with the older random
+        4-digit numbers, and numbers sort in the order they were issued.
+        """
+        if count < 1:
+            return []
+        day = datetime.now().strftime('%Y%m%d')
+        last_value = OrderNumberSequence.reserve(day, count)
+        return [f"ORD-{day}-{value:05d}" for value in range(last_value - count + 1, last_value + 1)]
 
     def to_dict(self) -> dict:
         return {
@@ -63,6 +82,107 @@ class Sill(db.Model):
             'order_date': self.order_date.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+class OrderNumberSequence(db.Model):
+    """Last order number issued per day, see Sill.allocate_order_numbers."""
+    __allow_unmapped__ = True
+    day: str = db.Column(db.String(8), primary_key=True)  # YYYYMMDD
+    last_value: int = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def reserve(day: str, count: int) -> int:
+        """Advance the day's counter by count and return its new value."""
+        # A single upsert takes SQLite's write lock, so concurrent workers queue up
+        # (see the busy_timeout pragma) instead of handing out the same numbers
+        statement = sqlite_insert(OrderNumberSequence).values(day=day, last_value=count)
+        statement = statement.on_conflict_do_update(
+            index_elements=[OrderNumberSequence.day],
+            set_={'last_value': OrderNumberSequence.last_value + count}
+        ).returning(OrderNumberSequence.last_value)
+        return db.session.execute(statement).scalar_one()
+
+class DataVersion(db.Model):
+    """Write counters, see response_cache: one row per counter.
+
+    PAGES is bumped by every write to data the pages show, SETTINGS only by
+    writes to settings, prices, defaults and board stock.
+    """
+    __allow_unmapped__ = True
+    PAGES = 1
+    SETTINGS = 2
+
+    id: int = db.Column(db.Integer, primary_key=True)
+    version: int = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def bump(connection, counter: int = PAGES) -> None:
+        """Advance the counter inside the connection's current transaction."""
+        statement = sqlite_insert(DataVersion.__table__).values(id=counter, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DataVersion.__table__.c.id],
+            set_={'version': DataVersion.__table__.c.version + 1}
+        )
+        connection.execute(statement)
+
+    @staticmethod
+    def current(counter: int = PAGES) -> int:
+        return db.session.execute(db.select(DataVersion.version).where(DataVersion.id == counter)).scalar() or 0
+
+class ClientJobSummary(db.Model):
+    """Running totals of a client's job, kept up to date by job_summary."""
+    __allow_unmapped__ = True
+    client_id: int = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='CASCADE'), primary_key=True)
+    sill_count: int = db.Column(db.Integer, nullable=False, default=0)
+    total_length: float = db.Column(db.Float, nullable=False, default=0)  # mm of sill
+    board_metres: str = db.Column(db.Text, nullable=False, default='{}')  # JSON: board name -> metres, with cutting allowance
+    board_count: int = db.Column(db.Integer, nullable=False, default=0)  # least stock boards those metres need
+    material_cost: float = db.Column(db.Float, nullable=False, default=0)
+    fitting_cost: float = db.Column(db.Float, nullable=False, default=0)
+    last_order_date: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+    settings_version: str = db.Column(db.String(16), nullable=False, default='')  # snapshot the totals were priced with
+    updated_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            'client_id': self.client_id,
+            'sill_count': self.sill_count,
+            'total_length': self.total_length,
+            'board_metres': json.loads(self.board_metres),
+            'board_count': self.board_count,
+            'material_cost': round(self.material_cost, 2),
+            'fitting_cost': round(self.fitting_cost, 2),
+            'total_cost': round(self.material_cost + self.fitting_cost, 2),
+            'last_order_date': self.last_order_date.strftime('%Y-%m-%d %H:%M:%S') if self.last_order_date else None,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+class Offcut(db.Model):
+    """Leftover length of a board, kept in stock to be cut for a later job."""
+    __allow_unmapped__ = True
+    __table_args__ = (
+        # Best-fit lookup: the shortest available offcut of a board that is long enough
+        db.Index('ix_offcut_lookup', 'board_key', 'status', 'length'),
+    )
+    id: int = db.Column(db.Integer, primary_key=True)
+    board_key: str = db.Column(db.String(100), nullable=False)  # board name as in the cutting layout
+    length: float = db.Column(db.Float, nullable=False)  # mm
+    status: str = db.Column(db.String(20), nullable=False, default='available')  # available, reserved, consumed, expired
+    client_id: Optional[int] = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='SET NULL'), nullable=True)  # reserved for / cut for
+    source_client_id: Optional[int] = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='SET NULL'), nullable=True)  # job it was left over from
+    created_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'board_key': self.board_key,
+            'length': self.length,
+            'status': self.status,
+            'client_id': self.client_id,
+            'source_client_id': self.source_client_id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
 class Settings(db.Model):
     __allow_unmapped__ = True
     id: int = db.Column(db.Integer, primary_key=True)
@@ -104,6 +224,25 @@ class MaterialPrices(db.Model):
     fitting_price_conservatory: float = db.Column(db.Float, nullable=False, default=35.0)
     fitting_price_95mm: float = db.Column(db.Float, nullable=False, default=5.0)
 
+class BoardStock(db.Model):
+    """A length a board type is bought in, and its price (see board_stock)."""
+    __allow_unmapped__ = True
+    __table_args__ = (
+        db.UniqueConstraint('board_type', 'length', name='uq_board_stock_type_length'),
+    )
+    id: int = db.Column(db.Integer, primary_key=True)
+    board_type: str = db.Column(db.String(50), nullable=False)  # e.g. 'GP Board', 'Capit Board 250mm'
+    length: float = db.Column(db.Float, nullable=False)  # mm
+    price: float = db.Column(db.Float, nullable=False)  # per board
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'board_type': self.board_type,
+            'length': self.length,
+            'price': self.price
+        }
+
 class DefaultSettings(db.Model):
     __allow_unmapped__ = True
     id: int = db.Column(db.Integer, primary_key=True)
@@ -118,4 +257,29 @@ class DefaultSettings(db.Model):
     silicone_color_per_meter: float = db.Column(db.Float, nullable=False, default=0.1)  # ml/tube
     pvc_cleaner_per_meter: float = db.Column(db.Float, nullable=False, default=0.1)  # ml/bottle
     fixall_per_meter: float = db.Column(db.Float, nullable=False, default=0.1)  # ml/bottle
-    glue_color_extra: float = db.Column(db.Float, nullable=False, default=0.05)  # ml/bottle extra for colored boards 
\ No newline at end of file
+    glue_color_extra: float = db.Column(db.Float, nullable=False, default=0.05)  # ml/bottle extra for colored boards
+
+class ContractJob(db.Model):
+    __allow_unmapped__ = True
+    id: str = db.Column(db.String(32), primary_key=True)
+    status: str = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    filename: str = db.Column(db.String(255), nullable=False)
+    filepath: str = db.Column(db.String(500), nullable=False)
+    preview_key: Optional[str] = db.Column(db.String(32), nullable=True)  # see preview_store
+    extracted_text: Optional[str] = db.Column(db.Text, nullable=True)
+    result: Optional[str] = db.Column(db.Text, nullable=True)  # JSON with client_data and sills_data
+    error: Optional[str] = db.Column(db.Text, nullable=True)
+    created_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+    finished_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""Offcut inventory: leftover board lengths reused by later cutting layouts.
+
+An offcut is available until it is reserved for a client's job, consumed
+when that job is cut, or expired when it is thrown away. Booking a job as
+cut also marks its sills 'cut', so the same layout cannot be booked twice.
+A job is never offered the leftovers of its own boards. Status changes
+are single conditional UPDATEs, so two requests can never both take the
+same offcut. Offcuts are looked up through the (board_key, status, length)
+index, so planning costs index seeks, whatever the size of the inventory.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select, union_all, update
+
+from extensions import db
+from board_stock import StockCatalogue
+from material_engine import SillColumns, board_lengths, split_pieces
+from models import Offcut, Sill
+from settings_snapshot import SettingsValues
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_LENGTH = 300  # mm; shorter leftovers are not worth keeping
+DEFAULT_CANDIDATES = 200  # most offcuts looked up per piece length when planning
+SILL_CUT = 'cut'  # Sill.status once its layout has been booked
+MAX_UNION_TERMS = 400
+
+# action: (statuses it applies to, new status)
+TRANSITIONS = {
+    'reserve': (('available',), 'reserved'),
+    'release': (('reserved',), 'available'),
+    'consume': (('available', 'reserved'), 'consumed'),
+    'expire': (('available', 'reserved'), 'expired'),
+}
+
+OffcutPool = Dict[str, List[Tuple[int, float]]]
+
+
+class OffcutStateError(ValueError):
+    """The offcut is not in a state that allows the requested change."""
+
+
+def job_pieces(sills: Sequence[Sill], settings: SettingsValues,
+               stock: StockCatalogue) -> Dict[str, List[float]]:
+    """The piece lengths (mm, with cutting allowance) each board of the job needs."""
+    if not sills:
+        return {}
+    cols = SillColumns.from_sills(sills)
+    return {name: split_pieces(lengths, stock.max_length(name)).tolist()
+            for name, lengths in board_lengths(cols, settings)}
+
+
+def offcut_pool(client_id: int, pieces: Dict[str, List[float]], stock: StockCatalogue,
+                limit: int = DEFAULT_CANDIDATES) -> OffcutPool:
+    """Offcuts a client's layout may be cut from, per board name.
+
+    These are the offcuts reserved for the client plus, for every distinct
+    piece length, the shortest available offcuts it fits on, as many as
+    the board has pieces (at most `limit`). Each piece uses at most one
+    offcut, so best-fit over this pool places pieces exactly as it would
+    over the whole inventory, and every lookup is an index seek. Offcuts
+    at least as long as the longest stock board are left for new boards.
+    """
+    if not pieces:
+        return {}
+
+    seeks = [
+        select(Offcut.id, Offcut.board_key, Offcut.length)
+        .where(Offcut.board_key == name, Offcut.status == 'available',
+               Offcut.length >= length, Offcut.length < stock.max_length(name),
+               or_(Offcut.source_client_id.is_(None), Offcut.source_client_id != client_id))
+        .order_by(Offcut.length)
+        .limit(min(len(lengths), limit))
+        .subquery()
+        for name, lengths in pieces.items()
+        for length in sorted(set(lengths))
+    ]
+    reserved = select(Offcut.id, Offcut.board_key, Offcut.length).where(
+        Offcut.board_key.in_(list(pieces)), Offcut.status == 'reserved',
+        Offcut.client_id == client_id
+    )
+
+    rows = list(db.session.execute(reserved))
+    # SQLite allows at most 500 terms in one compound SELECT
+    for start in range(0, len(seeks), MAX_UNION_TERMS):
+        chunk = seeks[start:start + MAX_UNION_TERMS]
+        rows.extend(db.session.execute(union_all(*[select(subquery) for subquery in chunk])))
+
+    pool: OffcutPool = {}
+    seen = set()
+    for offcut_id, board_key, length in rows:
+        if offcut_id not in seen:
+            seen.add(offcut_id)
+            pool.setdefault(board_key, []).append((offcut_id, length))
+    for offcuts in pool.values():
+        offcuts.sort(key=lambda offcut: (offcut[1], offcut[0]))
+    return pool
+
+
+def transition(offcut_id: int, action: str, client_id: Optional[int] = None) -> Offcut:
+    """Apply reserve/release/consume/expire to an offcut; the caller commits.
+
+    Reserving needs a client. An offcut reserved for one client cannot be
+    consumed for another.
+    """
+    if action not in TRANSITIONS:
+        raise ValueError(f"Unknown offcut action: {action}")
+    statuses, new_status = TRANSITIONS[action]
+    if action == 'reserve' and client_id is None:
+        raise OffcutStateError("A client is needed to reserve an offcut")
+
+    condition = [Offcut.id == offcut_id, Offcut.status.in_(statuses)]
+    values = {'status': new_status, 'updated_at': datetime.utcnow()}
+    if action == 'reserve':
+        values['client_id'] = client_id
+    elif action == 'release':
+        values['client_id'] = None
+    elif action == 'consume' and client_id is not None:
+        condition.append(or_(Offcut.status == 'available', Offcut.client_id == client_id))
+        values['client_id'] = client_id
+
+    result = db.session.execute(
+        update(Offcut).where(*condition).values(**values).execution_options(synchronize_session=False)
+    )
+    offcut = db.session.get(Offcut, offcut_id)
+    if offcut is None:
+        raise LookupError(f"Offcut {offcut_id} not found")
+    db.session.refresh(offcut)
+    if result.rowcount != 1:
+        raise OffcutStateError(f"Offcut {offcut_id} is {offcut.status} and cannot be {action}d")
+
+    logger.info("Offcut %d %s -> %s", offcut_id, action, new_status)
+    return offcut
+
+
+def expire_offcuts(older_than: datetime) -> int:
+    """Expire available offcuts created before the given time; the caller commits."""
+    result = db.session.execute(
+        update(Offcut)
+        .where(Offcut.status == 'available', Offcut.created_at < older_than)
+        .values(status='expired', updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    logger.info("Expired %d offcuts created before %s", result.rowcount, older_than)
+    return result.rowcount
+
+
+def mark_sills_cut(client_id: int, sill_ids: Sequence[int]) -> None:
+    """Mark the client's sills as cut, or raise OffcutStateError if any already is."""
+    result = db.session.execute(
+        update(Sill)
+        .where(Sill.id.in_(sill_ids), Sill.client_id == client_id, Sill.status != SILL_CUT)
+        .values(status=SILL_CUT)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(set(sill_ids)):
+        raise OffcutStateError("This layout has already been marked as cut")
+
+
+def record_layout_offcuts(client_id: int, sill_ids: Sequence[int], layout: Dict[str, List[Dict]],
+                          min_length: float = DEFAULT_MIN_LENGTH) -> Tuple[List[int], List[Offcut]]:
+    """Book the layout of the given sills as cut; the caller commits.
+
+    The sills are marked cut, offcuts the layout cuts from are consumed, and
+    every board's leftover of at least min_length is stocked as a new
+    offcut. Returns the consumed ids and the new offcuts.
+    """
+    mark_sills_cut(client_id, sill_ids)
+    consumed: List[int] = []
+    created: List[Offcut] = []
+    for board_key, boards in layout.items():
+        for board in boards:
+            if board.get('offcut_id') is not None:
+                transition(board['offcut_id'], 'consume', client_id=client_id)
+                consumed.append(board['offcut_id'])
+            if board['remaining_length'] >= min_length:
+                offcut = Offcut(board_key=board_key, length=round(board['remaining_length'], 1),
+                                status='available', source_client_id=client_id)
+                db.session.add(offcut)
+                created.append(offcut)
+
+    db.session.flush()
+    logger.info("Client %d layout: consumed %d offcuts, stocked %d", client_id, len(consumed), len(created))
+    return consumed, created
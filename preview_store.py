@@ -0,0 +1,151 @@
+"""Per-upload contract previews.
+
+Every upload gets its own thumbnails, named after the hash of the uploaded
+file, instead of sharing static/uploads/preview.jpg. Concurrent uploads can
+no longer overwrite each other's preview, and because a name never changes
+content the files can be served with immutable cache headers. Old previews
+are removed by a periodic garbage collection.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Long edge in px of each preview size
+PREVIEW_SIZES = {
+    'small': 800,
+    'large': 2000,
+}
+DEFAULT_MAX_AGE = 72 * 3600  # seconds a preview is kept after it was last used
+DEFAULT_GC_INTERVAL = 3600  # seconds between garbage collections
+KEY_LENGTH = 24
+
+
+class PreviewStore:
+    def __init__(self, root: str, max_age: int = DEFAULT_MAX_AGE,
+                 gc_interval: int = DEFAULT_GC_INTERVAL):
+        self.root = root
+        self.max_age = max_age
+        self.gc_interval = gc_interval
+        self._lock = threading.Lock()
+        self._gc_pid: Optional[int] = None
+
+    @staticmethod
+    def filename(key: str, size: str) -> str:
+        return f"{key}-{size}.jpg"
+
+    def save(self, image_path: str) -> Optional[str]:
+        """Write the previews for an uploaded image and return their key.
+
+        Returns None when the file is not an image Pillow can read (e.g. a PDF).
+        """
+        self.start_gc()
+        with open(image_path, 'rb') as image_file:
+            data = image_file.read()
+        key = hashlib.sha256(data).hexdigest()[:KEY_LENGTH]
+
+        # Already stored by an earlier upload of the same file; keep it alive
+        existing = [os.path.join(self.root, self.filename(key, size)) for size in PREVIEW_SIZES]
+        if all(os.path.exists(path) for path in existing):
+            for path in existing:
+                os.utime(path)
+            return key
+
+        try:
+            with Image.open(io.BytesIO(data)) as source:
+                img = ImageOps.exif_transpose(source).convert('RGB')
+        except (UnidentifiedImageError, OSError) as e:
+            logger.info("No preview for %s: %s", image_path, e)
+            return None
+
+        os.makedirs(self.root, exist_ok=True)
+        for size, edge in PREVIEW_SIZES.items():
+            preview = img.copy()
+            preview.thumbnail((edge, edge), Image.LANCZOS)
+            self._write_atomic(self.filename(key, size), preview)
+
+        return key
+
+    def _write_atomic(self, name: str, img: Image.Image) -> None:
+        # Write to a temporary file and rename, so a reader never sees half an image
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                img.save(tmp_file, 'JPEG', quality=85, optimize=True)
+            os.replace(tmp_path, os.path.join(self.root, name))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key: Optional[str]) -> None:
+        """Remove the previews of an upload that was given up on."""
+        if not key:
+            return
+        for size in PREVIEW_SIZES:
+            try:
+                os.remove(os.path.join(self.root, self.filename(key, size)))
+            except FileNotFoundError:
+                pass
+
+    def urls(self, key: Optional[str], url_for) -> Optional[Dict[str, str]]:
+        """Map each preview size to its URL, for templates."""
+        if not key:
+            return None
+        return {size: url_for('preview', name=self.filename(key, size)) for size in PREVIEW_SIZES}
+
+    def collect_garbage(self) -> int:
+        """Delete previews not used within max_age; returns how many files were removed."""
+        if not os.path.isdir(self.root):
+            return 0
+
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # Removed by another worker's collection
+                continue
+
+        if removed:
+            logger.info("Removed %d expired contract previews", removed)
+        return removed
+
+    def start_gc(self) -> None:
+        """Start the periodic collection in this process if it is not running yet."""
+        with self._lock:
+            if self._gc_pid == os.getpid():
+                return
+            self._gc_pid = os.getpid()
+
+        thread = threading.Thread(target=self._gc_loop, name='preview-gc', daemon=True)
+        thread.start()
+
+    def _gc_loop(self) -> None:
+        while True:
+            try:
+                self.collect_garbage()
+            except Exception:
+                logger.exception("Preview garbage collection failed")
+            time.sleep(self.gc_interval)
+
+
+def init_preview_store(app) -> PreviewStore:
+    store = PreviewStore(
+        app.config.get('PREVIEW_FOLDER', os.path.join(app.static_folder, 'uploads', 'previews')),
+        max_age=app.config.get('PREVIEW_MAX_AGE', DEFAULT_MAX_AGE),
+        gc_interval=app.config.get('PREVIEW_GC_INTERVAL', DEFAULT_GC_INTERVAL)
+    )
+    app.extensions['preview_store'] = store
+    return store
@@ -0,0 +1,131 @@
+"""Consolidated cutting plan for a production run spanning many jobs.
+
+The cutting layout page packs one client's sills at a time, so the offcut
+left on one job's board is never used for another job in the same colour.
+A production run instead pools every piece of every selected job by board
+(type, Capit size and colour) and packs each pool as a whole. Sills are
+loaded into arrays with one query (see material_engine) and each board's
+layout is only computed when it is consumed, so the route can stream the
+plan board by board.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from board_stock import StockCatalogue, stock_summary
+from cutting_optimizer import cheapest_stock_mix, DEFAULT_STRATEGY
+from material_engine import (
+    SILL_COLUMNS, SillColumns, fetch_sill_rows, board_sills,
+    split_pieces_with_owners, client_names
+)
+from metrics import record_layout
+from settings_snapshot import SettingsValues
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProductionRun:
+    columns: SillColumns
+    locations: List[str]
+    names: Dict[int, str]
+    settings: SettingsValues
+    stock: StockCatalogue
+    strategy: str = DEFAULT_STRATEGY
+
+    @property
+    def sill_count(self) -> int:
+        return len(self.columns)
+
+    @property
+    def client_count(self) -> int:
+        return len(np.unique(self.columns.client_id))
+
+    def summary(self) -> Dict:
+        return {
+            'sill_count': self.sill_count,
+            'client_count': self.client_count,
+            'cutting_allowance': self.settings.cutting_allowance,
+        }
+
+    @cached_property
+    def _sill_lists(self) -> Tuple[list, list, list, list]:
+        # Plain lists: indexing NumPy arrays one element at a time is slow
+        cols = self.columns
+        return (cols.sill_id.tolist(), cols.client_id.tolist(), cols.length.tolist(),
+                [cols.colors[code] for code in cols.color_code.tolist()])
+
+    def board_plans(self) -> Iterator[Dict]:
+        """The layout of every board in the run, computed one board at a time."""
+        for name, indices in board_sills(self.columns):
+            yield self.plan_board(name, indices)
+
+    def plan_board(self, name: str, indices: np.ndarray) -> Dict:
+        """Pack the pooled pieces of one board onto the cheapest mix of stock lengths."""
+        cols = self.columns
+        allowance = self.settings.cutting_allowance
+        lengths, owners = split_pieces_with_owners(cols.length[indices] + allowance, self.stock.max_length(name))
+        owners = indices[owners]
+
+        piece_lengths = lengths.tolist()
+        started = time.perf_counter()
+        layout = cheapest_stock_mix(piece_lengths, self.stock.stock_for(name), strategy=self.strategy)
+        record_layout('production', self.strategy, time.perf_counter() - started, len(layout))
+
+        owners = owners.tolist()
+        sill_ids, client_ids, original_lengths, colors = self._sill_lists
+
+        boards = []
+        for board_length, board_indices in layout:
+            pieces = []
+            for piece in board_indices:
+                sill = owners[piece]
+                client_id = client_ids[sill]
+                pieces.append({
+                    'id': sill_ids[sill],
+                    'length': piece_lengths[piece],
+                    'original_length': original_lengths[sill],
+                    'cutting_allowance': allowance,
+                    'location': self.locations[sill],
+                    'color': colors[sill],
+                    'client_id': client_id,
+                    'client_name': self.names.get(client_id, f"Client {client_id}"),
+                })
+            total_length = sum(piece['length'] for piece in pieces)
+            boards.append({
+                'pieces': pieces,
+                'total_length': total_length,
+                'remaining_length': board_length - total_length,
+                'board_length': board_length,
+            })
+
+        used = float(lengths.sum())
+        return {
+            'name': name,
+            'boards': boards,
+            'board_count': len(boards),
+            'stock': stock_summary(boards),
+            'piece_count': len(lengths),
+            'client_count': len(np.unique(cols.client_id[indices])),
+            'used_length': used,
+            'waste_length': sum(board['board_length'] for board in boards) - used,
+        }
+
+
+def load_production_run(settings: SettingsValues, stock: StockCatalogue,
+                        client_ids: Optional[Iterable[int]] = None,
+                        since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        strategy: str = DEFAULT_STRATEGY) -> ProductionRun:
+    """Active sills of the given clients and/or ordered in [since, until), ready to plan."""
+    rows = fetch_sill_rows(SILL_COLUMNS + ('location',), client_ids=client_ids, since=since, until=until)
+    columns = SillColumns.from_rows(row[:-1] for row in rows)
+    locations = [row[-1] for row in rows]
+    names = client_names(np.unique(columns.client_id).tolist()) if rows else {}
+
+    logger.info("Production run: %d sills across %d clients", len(rows), len(names))
+    return ProductionRun(columns, locations, names, settings, stock, strategy)
@@ -0,0 +1,52 @@
+"""How pages load clients and their sills.
+
+Routes go through these helpers instead of building Client/Sill queries
+inline, so every page picks its loading strategy on purpose:
+
+- listings load one page of clients, then their sill count, total length,
+  last order date and quote from the job summary table in one primary key
+  lookup (job_summary.get_job_summaries). A listing therefore costs the
+  same number of queries however many clients it shows, and never touches
+  Client.sills.
+- detail pages that walk a client's sills load them up front with
+  selectinload, in one extra query, instead of a lazy load from the template.
+"""
+from typing import List, Optional
+
+from flask import abort
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from models import Client, Sill
+
+
+def recent_clients(page: int, per_page: int):
+    """Newest clients first, as a Flask-SQLAlchemy pagination."""
+    return db.paginate(select(Client).order_by(Client.id.desc()), page=page, per_page=per_page)
+
+
+def get_client(client_id: Optional[int], with_sills: bool = False) -> Optional[Client]:
+    """The client, or None; with_sills loads Client.sills in the same call."""
+    if not client_id:
+        return None
+    options = [selectinload(Client.sills)] if with_sills else []
+    return db.session.get(Client, client_id, options=options)
+
+
+def get_client_or_404(client_id: int, with_sills: bool = False) -> Client:
+    client = get_client(client_id, with_sills=with_sills)
+    if client is None:
+        abort(404)
+    return client
+
+
+def client_sills(client_id: int) -> List[Sill]:
+    """All sills of a client, in the order they were added."""
+    return list(db.session.execute(
+        select(Sill).where(Sill.client_id == client_id).order_by(Sill.id)
+    ).scalars())
+
+
+def client_by_phone(phone: str) -> Optional[Client]:
+    return db.session.execute(select(Client).where(Client.phone == phone).limit(1)).scalar()
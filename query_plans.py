@@ -0,0 +1,106 @@
+"""EXPLAIN QUERY PLAN checks for the hot route queries.
+
+Each entry mirrors a query a route runs on every request. The check fails
+when SQLite would scan a whole table or sort through a temporary B-tree,
+which is what happens once an index the query relies on goes missing.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from sqlalchemy import asc, or_, select, tuple_
+
+from extensions import db
+from models import Client, Offcut, Sill
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class HotQuery:
+    routes: str
+    build: Callable
+    # A bare "SCAN" is fine for queries that walk the table in rowid order with a LIMIT
+    rowid_scan_ok: bool = False
+
+
+HOT_QUERIES: Dict[str, HotQuery] = {
+    'sills_for_client': HotQuery(
+        '/sills, /materials, /price, /cutting_layout',
+        lambda: select(Sill).filter_by(client_id=1),
+    ),
+    'client_by_phone': HotQuery(
+        '/add_client',
+        lambda: select(Client).filter_by(phone='0000000000').limit(1),
+    ),
+    'client_by_name': HotQuery(
+        '/save_contract',
+        lambda: select(Client).filter_by(first_name='A', last_name='B').limit(1),
+    ),
+    'clients_by_name': HotQuery(
+        '/clients',
+        lambda: select(Client).order_by(asc(Client.last_name), asc(Client.first_name)),
+    ),
+    'clients_page_after_cursor': HotQuery(
+        '/clients',
+        lambda: select(Client)
+        .where(tuple_(Client.last_name, Client.first_name, Client.id) > ('M', 'A', 1))
+        .order_by(Client.last_name, Client.first_name, Client.id).limit(51),
+    ),
+    'offcut_best_fit': HotQuery(
+        '/materials, /price, /cutting_layout',
+        lambda: select(Offcut.id, Offcut.length)
+        .where(Offcut.board_key == 'GP Board - White', Offcut.status == 'available',
+               Offcut.length >= 1000, Offcut.length < 5000,
+               or_(Offcut.source_client_id.is_(None), Offcut.source_client_id != 1))
+        .order_by(Offcut.length).limit(200),
+    ),
+    'clients_newest_first': HotQuery(
+        '/',
+        lambda: select(Client).order_by(Client.id.desc()).limit(10),
+        rowid_scan_ok=True,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PlanCheck:
+    name: str
+    routes: str
+    plan: List[str]
+    rowid_scan_ok: bool = False
+
+    @property
+    def problems(self) -> List[str]:
+        return [step for step in self.plan if _is_slow(step, self.rowid_scan_ok)]
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def _is_slow(step: str, rowid_scan_ok: bool = False) -> bool:
+    if 'USE TEMP B-TREE' in step:
+        return True
+    # "SCAN client" is a full table scan; "SCAN client USING INDEX ..." walks an index in order
+    return step.startswith('SCAN ') and ' USING ' not in step and not rowid_scan_ok
+
+
+def explain(statement) -> List[str]:
+    """Return the detail column of EXPLAIN QUERY PLAN for a statement."""
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans(queries: Dict[str, HotQuery] = HOT_QUERIES) -> List[PlanCheck]:
+    """Explain every hot query; must be called inside an application context."""
+    results = []
+    for name, query in queries.items():
+        check = PlanCheck(name, query.routes, explain(query.build()), query.rowid_scan_ok)
+        if check.ok:
+            logger.info("Query plan %s: %s", name, '; '.join(check.plan))
+        else:
+            logger.warning("Query plan %s (%s) does not use an index: %s",
+                           name, query.routes, '; '.join(check.problems))
+        results.append(check)
+    return results
@@ -0,0 +1,186 @@
+"""Rendered page cache with ETags for the read-heavy pages.
+
+A cached page is keyed by its URL, the session values the templates read
+(active client, last colour and type) and the data version: a counter in
+the database that every write to clients, sills, settings, prices, board
+stock or offcuts bumps inside the writing transaction (see the session
+events below). A write therefore invalidates every cached page at once,
+in every worker, without tracking which page shows what. Entries for old
+versions are simply never asked for again and age out of the LRU.
+
+Writes to settings, prices, defaults and board stock also bump the
+settings version, and every worker reloads its settings snapshot on the
+first request that sees it change. A page cached under a data version is
+therefore never rendered with older prices than that version.
+
+The ETag is a hash of the page, so a browser revalidating an unchanged
+page gets a 304 without the page being rendered. Pages are kept in an
+in-process LRU by default; set CACHE_TYPE=RedisCache and CACHE_REDIS_URL
+to share them between workers.
+"""
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from flask import Response, current_app, g, request, session
+from flask_caching.backends.base import BaseCache
+from sqlalchemy import event
+
+from extensions import db, cache
+from models import BoardStock, Client, DataVersion, DefaultSettings, MaterialPrices, Offcut, Settings, Sill
+
+logger = logging.getLogger(__name__)
+
+# Writes to these bump the data version
+TRACKED_MODELS = (Client, Sill, Settings, MaterialPrices, DefaultSettings, BoardStock, Offcut)
+# ...and writes to these also bump the settings version, which makes every
+# worker reload its settings snapshot (see settings_snapshot)
+SETTINGS_MODELS = (Settings, MaterialPrices, DefaultSettings, BoardStock)
+
+# Session values that change what a cached page renders
+SESSION_KEYS = ('active_client_id', 'last_client_id', 'last_color', 'last_sill_type')
+
+
+class LRUCache(BaseCache):
+    """Thread-safe in-process cache that drops the least recently used entry when full."""
+
+    def __init__(self, threshold: int = 500, default_timeout: int = 300):
+        super().__init__(default_timeout=default_timeout)
+        self._threshold = threshold
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(threshold=config['CACHE_THRESHOLD'])
+        return cls(*args, **kwargs)
+
+    def _expires(self, timeout) -> float:
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout else 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._entries[key] = (self._expires(timeout), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._threshold:
+                self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return True
+
+
+def _after_flush(session, flush_context):
+    # new/dirty/deleted still list what was just flushed
+    instances = list(chain(session.new, session.dirty, session.deleted))
+    if any(isinstance(instance, TRACKED_MODELS) for instance in instances):
+        DataVersion.bump(session.connection())
+    if any(isinstance(instance, SETTINGS_MODELS) for instance in instances):
+        DataVersion.bump(session.connection(), DataVersion.SETTINGS)
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, TRACKED_MODELS):
+            DataVersion.bump(orm_execute_state.session.connection())
+        if mapper is not None and issubclass(mapper.class_, SETTINGS_MODELS):
+            DataVersion.bump(orm_execute_state.session.connection(), DataVersion.SETTINGS)
+
+
+def data_version() -> int:
+    """The data version this request reads, looked up once per request."""
+    if 'data_version' not in g:
+        g.data_version = DataVersion.current()
+    return g.data_version
+
+
+def page_key() -> str:
+    state = '|'.join(str(session.get(name, '')) for name in SESSION_KEYS)
+    return f"page:{data_version()}:{state}:{request.full_path}"
+
+
+def _page_response(etag: str, body: bytes, mimetype: str) -> Response:
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    # Pages depend on the session, so only the browser may keep them, and it must revalidate
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def cached_page(view):
+    """Serve a GET page from the response cache, answering If-None-Match with 304.
+
+    Requests with flashed messages waiting are rendered fresh, and a page is
+    only stored if it rendered with status 200 and left the session alone.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if (request.method != 'GET' or not current_app.config['RESPONSE_CACHE_ENABLED']
+                or '_flashes' in session):
+            return view(*args, **kwargs)
+
+        try:
+            key = page_key()
+            entry = cache.get(key)
+        except Exception as e:
+            logger.warning("Response cache unavailable: %s", e)
+            return view(*args, **kwargs)
+        if entry is not None:
+            return _page_response(*entry)
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed or session.modified:
+            return response
+
+        body = response.get_data()
+        entry = (hashlib.sha256(body).hexdigest()[:32], body, response.mimetype)
+        try:
+            cache.set(key, entry)
+        except Exception as e:
+            logger.warning("Could not store page in the response cache: %s", e)
+        return _page_response(*entry)
+
+    return wrapper
+
+
+def init_response_cache(app) -> None:
+    """Set up the cache backend and the session events that bump the data version."""
+    cache.init_app(app)
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
@@ -1,27 +1,80 @@
 from flask import (
     render_template, request, jsonify, redirect, url_for, 
-    flash, abort, session, send_from_directory
+    flash, abort, session, send_from_directory, get_flashed_messages,
+    Response, stream_template, stream_with_context
 )
 from werkzeug.utils import secure_filename
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy import desc, asc
 from extensions import db, limiter
-from models import Client, Sill, Settings, MaterialPrices, DefaultSettings
-from utils import (
-    validate_uk_postcode, validate_phone, validate_email,
-    calculate_materials, calculate_cutting_layout
+from models import Client, Sill, Settings, MaterialPrices, DefaultSettings, Offcut, BoardStock, ContractJob
+from board_stock import BOARD_TYPES
+from utils import validate_uk_postcode, validate_phone, validate_email
+from contract_jobs import QueueFullError, job_result, remove_upload
+from settings_snapshot import get_settings_snapshot, invalidate_settings_snapshot
+from response_cache import cached_page
+from queries import (
+    recent_clients, get_client, get_client_or_404, client_sills, client_by_phone
 )
-from contract_parser import ContractParser
+from job_plan import get_job_plan, build_job_plan, JobPlan
+from job_summary import get_job_summaries
+from client_search import client_page, autocomplete_clients, AUTOCOMPLETE_LIMIT
+from search_index import search_clients
+from contract_ingest import ingest_contract, validate_sill, ContractValidationError
+from material_engine import (
+    load_sill_columns, purchasing_report as build_purchasing_report, client_names
+)
+from production_plan import load_production_run
+from offcuts import (
+    OffcutStateError, job_pieces, offcut_pool, transition as offcut_transition,
+    expire_offcuts, record_layout_offcuts, SILL_CUT
+)
+import json
 import logging
 import os
-import math
+import uuid
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 def register_routes(app):
+    def load_job_plan(client_id: int, sills: List[Sill]) -> JobPlan:
+        snapshot = get_settings_snapshot()
+        in_stock = {}
+        if snapshot.settings:
+            pieces = job_pieces(sills, snapshot.settings, snapshot.stock)
+            in_stock = offcut_pool(client_id, pieces, snapshot.stock,
+                                   limit=app.config['OFFCUT_CANDIDATES'])
+        return get_job_plan(client_id, sills, snapshot,
+                            strategy=app.config['CUTTING_STRATEGY'],
+                            cache_size=app.config['JOB_PLAN_CACHE_SIZE'],
+                            offcuts=in_stock)
+
+    def client_plan_response(client_id: int, view: str, body):
+        """JSON for one view of a client's job plan, or 304 if the client already has it.
+
+        The ETag is the plan key, which changes with the sills, settings, board
+        stock or offcuts, so polling clients only download a plan that changed.
+        """
+        client = get_client(client_id)
+        if client is None:
+            return jsonify({'status': 'error', 'message': 'Client not found'}), 404
+        snapshot = get_settings_snapshot()
+        if not snapshot.settings or not snapshot.prices:
+            return jsonify({'status': 'error', 'message': 'Settings not found'}), 500
+        
+        plan = load_job_plan(client_id, client_sills(client_id))
+        etag = f"{view}-{plan.key}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify({'client_id': client_id, view: body(plan)})
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
     @app.route('/')
+    @cached_page
     def index():
         try:
             page = request.args.get('page', 1, type=int)
@@ -29,21 +82,22 @@ def register_routes(app):
             
             try:
                 db.session.execute(db.text("SELECT 1"))
-                logger.info("Database connection OK")
+                logger.debug("Database connection OK")
                 
-                clients = Client.query.order_by(Client.id.desc()).paginate(page=page, per_page=per_page)
-                logger.info(f"Found {clients.total if clients else 0} clients")
+                clients = recent_clients(page, per_page)
+                logger.debug("Found %d clients", clients.total if clients else 0)
                 
-                return render_template('index.html', clients=clients.items, pagination=clients)
+                return render_template('index.html', clients=clients.items, pagination=clients,
+                                       summaries=get_job_summaries(client.id for client in clients.items))
             except Exception as db_error:
-                logger.error(f"Database error: {str(db_error)}")
+                logger.error("Database error: %s", db_error)
                 flash('Database connection error', 'danger')
                 return render_template('error.html', 
                                     error="Database connection error",
                                     error_type="Database Error",
                                     error_details=str(db_error)), 500
         except Exception as e:
-            logger.error(f'Error in index route: {str(e)}')
+            logger.error('Error in index route: %s', e)
             return render_template('error.html', 
                                 error="Internal server error",
                                 error_type=type(e).__name__,
@@ -51,26 +105,68 @@ def register_routes(app):
 
     @app.route('/clients')
     @limiter.limit("20/minute")
+    @cached_page
     def clients():
         try:
             active_client_id = session.get('active_client_id')
-            active_client = Client.query.get(active_client_id) if active_client_id else None
+            active_client = get_client(active_client_id, with_sills=True)
             
-            clients = Client.query.order_by(asc(Client.last_name), asc(Client.first_name)).all()
+            q = request.args.get('q', '').strip()
+            page = client_page(q,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               limit=app.config['CLIENTS_PAGE_SIZE'])
             return render_template('clients.html', 
-                                clients=clients, 
+                                clients=page.clients, 
+                                summaries=get_job_summaries(client.id for client in page.clients),
+                                next_cursor=page.next_cursor,
+                                prev_cursor=page.prev_cursor,
+                                q=q,
                                 active_client=active_client)
         except Exception as e:
-            logger.error(f"Error in clients route: {str(e)}")
+            logger.error("Error in clients route: %s", e)
             flash(f'Error loading clients: {str(e)}', 'error')
             return redirect(url_for('index'))
 
+    @app.route('/api/clients/autocomplete')
+    @limiter.limit("120/minute")
+    def clients_autocomplete():
+        limit = min(request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int), 100)
+        return jsonify({'clients': autocomplete_clients(request.args.get('q'), limit=limit)})
+
+    @app.route('/search')
+    @limiter.limit("60/minute")
+    def search():
+        q = request.args.get('q', '').strip()
+        hits = search_clients(db.session, q, limit=app.config['SEARCH_RESULTS_LIMIT']) if q else []
+        return render_template('search.html', q=q, hits=hits)
+
+    @app.route('/api/search')
+    @limiter.limit("120/minute")
+    def api_search():
+        limit = min(request.args.get('limit', app.config['SEARCH_RESULTS_LIMIT'], type=int), 100)
+        hits = search_clients(db.session, request.args.get('q'), limit=limit)
+        return jsonify({'results': [
+            {
+                'id': hit.client_id,
+                'first_name': hit.first_name,
+                'last_name': hit.last_name,
+                'phone': hit.phone,
+                'town': hit.town,
+                'postal_code': hit.postal_code,
+                'snippet': str(hit.snippet),
+                'score': hit.score,
+            }
+            for hit in hits
+        ]})
+
     @app.route('/sills', methods=['GET', 'POST'])
     @limiter.limit("20/minute")
+    @cached_page
     def sills():
         try:
             active_client_id = session.get('active_client_id')
-            active_client = Client.query.get(active_client_id) if active_client_id else None
+            active_client = get_client(active_client_id)
             
             if request.method == 'POST':
                 try:
@@ -137,89 +233,199 @@ def register_routes(app):
                 flash('Please select a client first', 'warning')
                 return redirect(url_for('clients'))
             
-            sills = Sill.query.filter_by(client_id=active_client_id).all()
-            clients = Client.query.order_by(asc(Client.last_name), asc(Client.first_name)).all()
+            sills = client_sills(active_client_id)
             
+            # Other clients for the edit form are looked up through /api/clients/autocomplete
             return render_template('sills.html', 
                                 sills=sills, 
                                 client=active_client,
                                 active_client=active_client,
-                                clients=clients,
                                 colors=app.config['COLORS'],
                                 sill_types=app.config['SILL_TYPES'])
         except Exception as e:
-            logger.error(f"Error in sills route: {str(e)}")
+            logger.error("Error in sills route: %s", e)
             return render_template('error.html', error=str(e)), 500
 
     @app.route('/materials')
     @limiter.limit("20/minute")
+    @cached_page
     def materials():
         active_client_id = session.get('active_client_id')
         if not active_client_id:
             flash('Please select a client first', 'warning')
             return redirect(url_for('clients'))
 
-        active_client = Client.query.get_or_404(active_client_id)
-        sills = Sill.query.filter_by(client_id=active_client_id).all()
+        active_client = get_client_or_404(active_client_id)
+        sills = client_sills(active_client_id)
         
-        settings = Settings.query.first()
+        settings = get_settings_snapshot().settings
         if not settings:
             flash('Settings not found', 'error')
             return redirect(url_for('settings'))
         
-        all_materials = calculate_materials_for_sills(sills, settings)
-        cutting_layouts = calculate_cutting_layout(sills)
+        plan = load_job_plan(active_client_id, sills)
 
         return render_template('materials.html', 
                             sills=sills, 
                             client=active_client,
-                            materials=all_materials,
-                            cutting_layouts=cutting_layouts)
+                            materials=plan.materials,
+                            cutting_layouts=plan.cutting_layout)
+
+    @app.route('/purchasing_report')
+    @limiter.limit("20/minute")
+    def purchasing_report():
+        """Materials and costs across all active jobs, optionally only those ordered in the last N days."""
+        days = request.args.get('days', 7, type=int)
+        since = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        
+        snapshot = get_settings_snapshot()
+        if not snapshot.settings or not snapshot.prices:
+            flash('Settings not found', 'error')
+            return redirect(url_for('settings'))
+        
+        columns = load_sill_columns(since=since)
+        report = build_purchasing_report(columns, snapshot.settings, snapshot.prices, snapshot.stock)
+        names = client_names(row['client_id'] for row in report['clients'])
+        for row in report['clients']:
+            row['name'] = names.get(row['client_id'], f"Client {row['client_id']}")
+        
+        if 'application/json' in request.headers.get('Accept', ''):
+            return jsonify({'days': days, **report})
+        return render_template('purchasing_report.html', report=report, days=days)
+
+    @app.route('/production_plan')
+    @limiter.limit("10/minute")
+    def production_plan():
+        """Cutting plan pooling the pieces of every selected job, streamed board by board.
+
+        Jobs are chosen by order date (?from=YYYY-MM-DD&to=YYYY-MM-DD, both inclusive)
+        and/or by client (?client_id=1&client_id=2). Send Accept: application/x-ndjson
+        for one JSON line with the totals followed by one line per board.
+        """
+        wants_ndjson = 'application/x-ndjson' in request.headers.get('Accept', '')
+        client_ids = request.args.getlist('client_id', type=int) or None
+        date_from = request.args.get('from', '')
+        date_to = request.args.get('to', '')
+        if not request.args:
+            date_from = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+        
+        try:
+            since = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+            until = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+        except ValueError:
+            if wants_ndjson:
+                return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+            flash('Dates must be in YYYY-MM-DD format', 'error')
+            return redirect(url_for('production_plan'))
+        
+        snapshot = get_settings_snapshot()
+        if not snapshot.settings:
+            flash('Settings not found', 'error')
+            return redirect(url_for('settings'))
+        
+        run = load_production_run(snapshot.settings, snapshot.stock, client_ids=client_ids,
+                                  since=since, until=until, strategy=app.config['CUTTING_STRATEGY'])
+        
+        if wants_ndjson:
+            def lines():
+                yield json.dumps(run.summary()) + '\n'
+                for plan in run.board_plans():
+                    yield json.dumps(plan) + '\n'
+            return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+        
+        # The session is saved before a streamed body renders, so take the flashed
+        # messages now; the template then reads them from the request
+        get_flashed_messages(with_categories=True)
+        return stream_template('production_plan.html',
+                               run=run,
+                               board_plans=run.board_plans(),
+                               date_from=date_from,
+                               date_to=date_to,
+                               client_ids=client_ids or [])
 
     @app.route('/price')
     @limiter.limit("20/minute")
+    @cached_page
     def price():
         active_client_id = session.get('active_client_id')
         if not active_client_id:
             flash('Please select a client first', 'warning')
             return redirect(url_for('clients'))
 
-        active_client = Client.query.get_or_404(active_client_id)
-        sills = Sill.query.filter_by(client_id=active_client_id).all()
-        prices = MaterialPrices.query.first()
+        active_client = get_client_or_404(active_client_id)
+        sills = client_sills(active_client_id)
+        prices = get_settings_snapshot().prices
 
         if not prices:
             flash('Material prices not found', 'error')
             return redirect(url_for('settings'))
 
-        sills_with_costs = calculate_costs_for_sills(sills, prices)
-        total_material_cost = sum(s['material_cost'] for s in sills_with_costs)
-        total_fitting_cost = sum(s['fitting_cost'] for s in sills_with_costs)
-        total_cost = total_material_cost + total_fitting_cost
+        plan = load_job_plan(active_client_id, sills)
 
         return render_template('price.html', 
-                            sills=sills_with_costs, 
+                            sills=plan.sill_costs, 
                             client=active_client,
-                            total_material_cost=total_material_cost,
-                            total_fitting_cost=total_fitting_cost,
-                            total_cost=total_cost)
+                            total_material_cost=plan.total_material_cost,
+                            total_fitting_cost=plan.total_fitting_cost,
+                            total_cost=plan.total_cost)
 
     @app.route('/settings', methods=['GET'])
     @limiter.limit("20/minute")
     def settings():
         settings = Settings.query.first()
         prices = MaterialPrices.query.first()
-        logger.info(f"Current settings: {settings.__dict__ if settings else 'No settings found'}")
-        logger.info(f"Current prices: {prices.__dict__ if prices else 'No prices found'}")
-        return render_template('settings.html', settings=settings, prices=prices)
+        board_stock = BoardStock.query.order_by(BoardStock.board_type, BoardStock.length).all()
+        logger.debug("Current settings: %s", settings.__dict__ if settings else 'No settings found')
+        logger.debug("Current prices: %s", prices.__dict__ if prices else 'No prices found')
+        return render_template('settings.html', settings=settings, prices=prices,
+                               board_stock=board_stock, board_types=BOARD_TYPES)
+
+    @app.route('/settings/board_stock', methods=['POST'])
+    @limiter.limit("20/minute")
+    def add_board_stock():
+        board_type = request.form.get('board_type', '')
+        length = request.form.get('length', type=float)
+        price = request.form.get('price', type=float)
+        if board_type not in BOARD_TYPES or not length or length <= 0 or price is None or price < 0:
+            flash('Choose a board type and enter a positive length and price', 'error')
+            return redirect(url_for('settings'))
+        
+        try:
+            db.session.add(BoardStock(board_type=board_type, length=length, price=price))
+            db.session.commit()
+            invalidate_settings_snapshot()
+            flash(f'{board_type} stock length {length:g}mm added', 'success')
+        except IntegrityError:
+            db.session.rollback()
+            flash(f'{board_type} already has a {length:g}mm stock length', 'error')
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error adding board stock: %s", e)
+            flash('Error adding board stock', 'error')
+        return redirect(url_for('settings'))
+
+    @app.route('/settings/board_stock/<int:stock_id>/delete', methods=['POST'])
+    @limiter.limit("20/minute")
+    def delete_board_stock(stock_id):
+        stock = BoardStock.query.get_or_404(stock_id)
+        try:
+            db.session.delete(stock)
+            db.session.commit()
+            invalidate_settings_snapshot()
+            flash(f'{stock.board_type} stock length {stock.length:g}mm removed', 'success')
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error deleting board stock: %s", e)
+            flash('Error deleting board stock', 'error')
+        return redirect(url_for('settings'))
 
     @app.route('/update_settings', methods=['POST'])
     @limiter.limit("20/minute")
     def update_settings():
-        logger.info("update_settings function called")
+        logger.debug("update_settings function called")
         try:
             # Log form data
-            logger.info(f"Received form data: {dict(request.form)}")
+            logger.debug("Received form data: %s", request.form)
             
             # Get form data
             settings = Settings.query.first()
@@ -235,8 +441,8 @@ def register_routes(app):
             
             # Update settings with detailed logging
             new_cutting_allowance = float(request.form.get('cutting_allowance', settings.cutting_allowance))
-            logger.info(f"Current cutting_allowance: {settings.cutting_allowance}")
-            logger.info(f"New cutting_allowance from form: {new_cutting_allowance}")
+            logger.debug("Current cutting_allowance: %s", settings.cutting_allowance)
+            logger.debug("New cutting_allowance from form: %s", new_cutting_allowance)
             
             settings.plate_length = float(request.form.get('plate_length', settings.plate_length))
             settings.length_95mm = float(request.form.get('length_95mm', settings.length_95mm))
@@ -268,7 +474,8 @@ def register_routes(app):
             prices.fitting_price_95mm = float(request.form.get('fitting_price_95mm', prices.fitting_price_95mm))
             
             db.session.commit()
-            logger.info(f"Settings committed to database. New cutting_allowance: {settings.cutting_allowance}")
+            invalidate_settings_snapshot()
+            logger.info("Settings committed to database. New cutting_allowance: %s", settings.cutting_allowance)
             
             # Check if it's an AJAX request
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
@@ -287,26 +494,26 @@ def register_routes(app):
     @app.route('/reset_settings', methods=['POST'])
     @limiter.limit("20/minute")
     def reset_settings():
-        logger.info("reset_settings function called")
+        logger.debug("reset_settings function called")
         try:
             # Reset to default values
             settings = Settings.query.first()
             prices = MaterialPrices.query.first()
             
-            logger.info(f"Before reset - Current settings cutting_allowance: {settings.cutting_allowance if settings else 'None'}")
+            logger.debug("Before reset - Current settings cutting_allowance: %s", settings.cutting_allowance if settings else 'None')
             
             if settings:
-                logger.info("Deleting current settings")
+                logger.debug("Deleting current settings")
                 db.session.delete(settings)
             if prices:
-                logger.info("Deleting current prices")
+                logger.debug("Deleting current prices")
                 db.session.delete(prices)
             
             # Get saved default settings or create new ones
             default_settings = DefaultSettings.query.first()
             
             if default_settings:
-                logger.info(f"Using saved default settings with cutting_allowance: {default_settings.cutting_allowance}")
+                logger.info("Using saved default settings with cutting_allowance: %s", default_settings.cutting_allowance)
                 # Use saved default settings
                 new_settings = Settings()
                 new_settings.plate_length = default_settings.plate_length
@@ -326,17 +533,18 @@ def register_routes(app):
             
             new_prices = MaterialPrices()
             
-            logger.info(f"Creating new settings with cutting_allowance: {new_settings.cutting_allowance}")
+            logger.info("Creating new settings with cutting_allowance: %s", new_settings.cutting_allowance)
             db.session.add(new_settings)
             db.session.add(new_prices)
             db.session.commit()
+            invalidate_settings_snapshot()
             logger.info("Settings reset completed successfully")
             
             flash('Settings reset to default values!', 'success')
             return redirect(url_for('settings'))
             
         except Exception as e:
-            logger.error(f"Error in reset_settings: {str(e)}")
+            logger.error("Error in reset_settings: %s", e)
             db.session.rollback()
             flash(f'Error resetting settings: {str(e)}', 'error')
             return redirect(url_for('settings'))
@@ -344,19 +552,19 @@ def register_routes(app):
     @app.route('/reset_to_builtin', methods=['POST'])
     @limiter.limit("20/minute")
     def reset_to_builtin():
-        logger.info("reset_to_builtin function called")
+        logger.debug("reset_to_builtin function called")
         try:
             # Reset to built-in default values (ignore saved defaults)
             settings = Settings.query.first()
             prices = MaterialPrices.query.first()
             
-            logger.info(f"Before builtin reset - Current settings cutting_allowance: {settings.cutting_allowance if settings else 'None'}")
+            logger.debug("Before builtin reset - Current settings cutting_allowance: %s", settings.cutting_allowance if settings else 'None')
             
             if settings:
-                logger.info("Deleting current settings")
+                logger.debug("Deleting current settings")
                 db.session.delete(settings)
             if prices:
-                logger.info("Deleting current prices")
+                logger.debug("Deleting current prices")
                 db.session.delete(prices)
             
             # Use built-in default settings (ignore DefaultSettings table)
@@ -364,17 +572,18 @@ def register_routes(app):
             new_settings = Settings()
             new_prices = MaterialPrices()
             
-            logger.info(f"Creating new settings with built-in cutting_allowance: {new_settings.cutting_allowance}")
+            logger.info("Creating new settings with built-in cutting_allowance: %s", new_settings.cutting_allowance)
             db.session.add(new_settings)
             db.session.add(new_prices)
             db.session.commit()
+            invalidate_settings_snapshot()
             logger.info("Built-in settings reset completed successfully")
             
             flash('Settings reset to built-in default values!', 'success')
             return redirect(url_for('settings'))
             
         except Exception as e:
-            logger.error(f"Error in reset_to_builtin: {str(e)}")
+            logger.error("Error in reset_to_builtin: %s", e)
             db.session.rollback()
             flash(f'Error resetting to built-in settings: {str(e)}', 'error')
             return redirect(url_for('settings'))
@@ -382,7 +591,7 @@ def register_routes(app):
     @app.route('/save_as_default', methods=['POST'])
     @limiter.limit("20/minute")
     def save_as_default():
-        logger.info("save_as_default function called")
+        logger.debug("save_as_default function called")
         try:
             # First, update current settings with form data, then save as default
             settings = Settings.query.first()
@@ -398,7 +607,7 @@ def register_routes(app):
             
             # Update settings with form data
             new_cutting_allowance = float(request.form.get('cutting_allowance', settings.cutting_allowance))
-            logger.info(f"Form data cutting_allowance: {new_cutting_allowance}")
+            logger.debug("Form data cutting_allowance: %s", new_cutting_allowance)
             
             settings.plate_length = float(request.form.get('plate_length', settings.plate_length))
             settings.length_95mm = float(request.form.get('length_95mm', settings.length_95mm))
@@ -429,7 +638,7 @@ def register_routes(app):
             prices.fitting_price_conservatory = float(request.form.get('fitting_price_conservatory', prices.fitting_price_conservatory))
             prices.fitting_price_95mm = float(request.form.get('fitting_price_95mm', prices.fitting_price_95mm))
             
-            logger.info(f"Updated settings with cutting_allowance: {settings.cutting_allowance}")
+            logger.info("Updated settings with cutting_allowance: %s", settings.cutting_allowance)
             
             # Now save as default
             default_settings = DefaultSettings.query.first()
@@ -441,7 +650,7 @@ def register_routes(app):
             default_settings.plate_length = settings.plate_length
             default_settings.length_95mm = settings.length_95mm
             default_settings.cutting_allowance = settings.cutting_allowance
-            logger.info(f"Setting default cutting_allowance to: {settings.cutting_allowance}")
+            logger.info("Setting default cutting_allowance to: %s", settings.cutting_allowance)
             default_settings.hot_glue_per_meter = settings.hot_glue_per_meter
             default_settings.glue_with_activator_per_meter = settings.glue_with_activator_per_meter
             default_settings.silicone_per_meter = settings.silicone_per_meter
@@ -451,7 +660,8 @@ def register_routes(app):
             default_settings.glue_color_extra = settings.glue_color_extra
             
             db.session.commit()
-            logger.info(f"Settings and defaults saved: cutting_allowance={default_settings.cutting_allowance}, fixall_per_meter={settings.fixall_per_meter}")
+            invalidate_settings_snapshot()
+            logger.info("Settings and defaults saved: cutting_allowance=%s, fixall_per_meter=%s", default_settings.cutting_allowance, settings.fixall_per_meter)
             
             # Check if it's an AJAX request
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
@@ -461,7 +671,7 @@ def register_routes(app):
             return redirect(url_for('settings'))
             
         except Exception as e:
-            logger.error(f"Error in save_as_default: {str(e)}")
+            logger.error("Error in save_as_default: %s", e)
             db.session.rollback()
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
                 return jsonify({'status': 'error', 'message': f'Error saving settings as default: {str(e)}'})
@@ -470,6 +680,7 @@ def register_routes(app):
 
     @app.route('/cutting_layout', methods=['GET'])
     @limiter.limit("20/minute")
+    @cached_page
     def cutting_layout():
         try:
             active_client_id = session.get('active_client_id')
@@ -477,13 +688,13 @@ def register_routes(app):
                 flash('Please select a client first', 'warning')
                 return redirect(url_for('clients'))
             
-            active_client = Client.query.get(active_client_id)
+            active_client = get_client(active_client_id)
             if not active_client:
                 flash('Selected client not found', 'error')
                 return redirect(url_for('clients'))
             
             # Get sills for the active client
-            sills = Sill.query.filter_by(client_id=active_client_id).all()
+            sills = client_sills(active_client_id)
             
             if not sills:
                 flash('No sills found for this client', 'info')
@@ -492,17 +703,51 @@ def register_routes(app):
                                     materials={})
             
             # Calculate cutting layout
-            cutting_layouts = calculate_cutting_layout(sills)
-            settings = Settings.query.first()
+            plan = load_job_plan(active_client_id, sills)
             
             return render_template('cutting_layout.html', 
                                 client=active_client,
-                                materials=cutting_layouts,
-                                settings=settings)
+                                materials=plan.cutting_layout,
+                                is_cut=all(sill.status == SILL_CUT for sill in sills),
+                                settings=get_settings_snapshot().settings)
         except Exception as e:
-            logger.error(f"Error in cutting_layout route: {str(e)}")
+            logger.error("Error in cutting_layout route: %s", e)
             return render_template('error.html', error=str(e)), 500
 
+    @app.route('/cutting_layout/record_offcuts', methods=['POST'])
+    @limiter.limit("10/minute")
+    def record_offcuts():
+        """Book the active client's sills not cut yet as cut: use up their offcuts and stock the leftovers."""
+        active_client_id = session.get('active_client_id')
+        if not active_client_id:
+            flash('Please select a client first', 'warning')
+            return redirect(url_for('clients'))
+        
+        sills = client_sills(active_client_id)
+        if not sills:
+            flash('No sills found for this client', 'info')
+            return redirect(url_for('cutting_layout'))
+        sills = [sill for sill in sills if sill.status != SILL_CUT]
+        if not sills:
+            flash('This layout has already been marked as cut', 'info')
+            return redirect(url_for('cutting_layout'))
+        
+        try:
+            plan = load_job_plan(active_client_id, sills)
+            consumed, created = record_layout_offcuts(active_client_id, [sill.id for sill in sills],
+                                                      plan.cutting_layout,
+                                                      min_length=app.config['OFFCUT_MIN_LENGTH'])
+            db.session.commit()
+            flash(f'Used {len(consumed)} offcuts from stock and stocked {len(created)} new offcuts', 'success')
+        except OffcutStateError as e:
+            db.session.rollback()
+            flash(f'Layout is out of date, please check it again: {str(e)}', 'warning')
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error recording offcuts: %s", e)
+            flash('Error recording offcuts', 'error')
+        return redirect(url_for('cutting_layout'))
+
     @app.route('/sills/<int:sill_id>', methods=['PUT', 'POST'])
     @limiter.limit("20/minute")
     def update_sill(sill_id):
@@ -554,7 +799,7 @@ def register_routes(app):
 
     @app.route('/set_active_client/<int:client_id>')
     def set_active_client(client_id):
-        client = Client.query.get_or_404(client_id)
+        client = get_client_or_404(client_id)
         session['active_client_id'] = client_id
         flash(f'Active client set to: {client.first_name} {client.last_name}', 'success')
         return redirect(request.referrer or url_for('clients'))
@@ -585,7 +830,7 @@ def register_routes(app):
                 flash('Invalid phone number format!', 'error')
                 return redirect(url_for('clients'))
 
-            existing_client = Client.query.filter_by(phone=client_data['phone']).first()
+            existing_client = client_by_phone(client_data['phone'])
             if existing_client:
                 flash(f'Client with phone number {client_data["phone"]} already exists!', 'error')
                 return redirect(url_for('clients'))
@@ -622,7 +867,7 @@ def register_routes(app):
     @limiter.limit("20/minute")
     def delete_client(client_id):
         try:
-            client = Client.query.get_or_404(client_id)
+            client = get_client_or_404(client_id)
             db.session.delete(client)
             db.session.commit()
             flash('Client deleted successfully!', 'success')
@@ -636,7 +881,7 @@ def register_routes(app):
     @limiter.limit("20/minute")
     def upload_contract():
         if request.method == 'POST':
-            logger.info("POST request received for upload_contract")
+            logger.debug("POST request received for upload_contract")
             try:
                 if 'contract_file' not in request.files:
                     logger.error("No contract_file in request.files")
@@ -644,7 +889,7 @@ def register_routes(app):
                     return redirect(request.url)
                 
                 file = request.files['contract_file']
-                logger.info(f"File received: {file.filename}")
+                logger.debug("File received: %s", file.filename)
                 if file.filename == '':
                     logger.error("Empty filename")
                     flash('No file selected', 'error')
@@ -652,122 +897,320 @@ def register_routes(app):
                 
                 if file and file.filename and allowed_file(file.filename, app.config['ALLOWED_EXTENSIONS']):
                     filename = secure_filename(file.filename)
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    logger.info(f"Saving file to: {filepath}")
+                    # Unique name so concurrent uploads of the same file name never clash
+                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+                    logger.debug("Saving file to: %s", filepath)
                     file.save(filepath)
                     
-                    # Copy image for preview
-                    preview_path = os.path.join('static', 'uploads', 'preview.jpg')
-                    os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+                    # Content-hashed previews, unique to this upload
+                    preview_key = app.extensions['preview_store'].save(filepath)
+                    logger.debug("Preview images saved with key: %s", preview_key)
                     
-                    # Convert and save as JPEG for preview
-                    from PIL import Image
-                    with Image.open(filepath) as img:
-                        # Convert to RGB if needed (for PNG with transparency)
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        img.save(preview_path, 'JPEG', quality=85)
-                        logger.info(f"Preview image saved to: {preview_path}")
+                    # Analysis runs in the background; the browser polls the job status
+                    try:
+                        job_id = app.extensions['contract_jobs'].submit(filepath, filename, preview_key)
+                    except QueueFullError as e:
+                        remove_upload(filepath)
+                        # Previews are shared by uploads of the same file; keep any a job still shows
+                        if preview_key and not ContractJob.query.filter_by(preview_key=preview_key).first():
+                            app.extensions['preview_store'].delete(preview_key)
+                        flash(str(e), 'warning')
+                        return redirect(request.url)
                     
-                    logger.info("Creating ContractParser...")
-                    parser = ContractParser()
-                    logger.info("Extracting text from image...")
-                    extracted_text = parser.extract_text(filepath)
-                    logger.info("Parsing client data...")
-                    client_data = parser.parse_client_data(extracted_text)
-                    logger.info("Parsing sills data...")
-                    sills_data = parser.parse_sill_data(extracted_text)
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
+                        return jsonify({
+                            'status': 'queued',
+                            'job_id': job_id,
+                            'status_url': url_for('contract_job_status', job_id=job_id),
+                            'result_url': url_for('contract_job', job_id=job_id)
+                        }), 202
                     
-                    return render_template(
-                        'verify_contract.html',
-                        client_data=client_data,
-                        sills_data=sills_data,
-                        extracted_text=extracted_text
-                    )
+                    return redirect(url_for('contract_job', job_id=job_id))
                 
                 flash('Invalid file type', 'error')
                 return redirect(request.url)
                 
             except Exception as e:
                 import traceback
-                logger.error(f"Error processing contract: {str(e)}")
-                logger.error(f"Full traceback: {traceback.format_exc()}")
+                logger.error("Error processing contract: %s", e)
+                logger.error("Full traceback: %s", traceback.format_exc())
                 flash(f'Error processing file: {str(e)}', 'error')
                 return redirect(request.url)
         
         return render_template('upload_contract.html')
 
+    @app.route('/contract_jobs/<job_id>')
+    def contract_job(job_id):
+        job = app.extensions['contract_jobs'].get(job_id)
+        if job is None:
+            abort(404)
+        
+        if job.status == 'failed':
+            flash(f'Error processing file: {job.error}', 'error')
+            return redirect(url_for('upload_contract'))
+        
+        if job.status != 'done':
+            return render_template('contract_job.html', job=job)
+        
+        result = job_result(job)
+        return render_template(
+            'verify_contract.html',
+            client_data=result['client_data'],
+            sills_data=result['sills_data'],
+            extracted_text=job.extracted_text,
+            preview=app.extensions['preview_store'].urls(job.preview_key, url_for)
+        )
+
+    @app.route('/previews/<name>')
+    def preview(name):
+        # Preview names are content hashes, so browsers may cache them forever
+        response = send_from_directory(app.extensions['preview_store'].root, name,
+                                       max_age=app.config['PREVIEW_CACHE_MAX_AGE'])
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.route('/contract_jobs/<job_id>/status')
+    def contract_job_status(job_id):
+        job = app.extensions['contract_jobs'].get(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+        
+        data = job.to_dict()
+        data['result_url'] = url_for('contract_job', job_id=job.id)
+        return jsonify(data)
+
     @app.route('/save_contract', methods=['POST'])
     @limiter.limit("20/minute")
     def save_contract():
         try:
-            first_name = request.form.get('first_name')
-            last_name = request.form.get('last_name')
-            phone = request.form.get('phone')
-            
-            # Check if client already exists by first and last name
-            existing_client = Client.query.filter_by(
-                first_name=first_name, 
-                last_name=last_name
-            ).first()
-            
-            if existing_client:
-                # Use existing client
-                client = existing_client
-                logger.info(f"Using existing client: {first_name} {last_name}")
-            else:
-                # Create new client
-                client_data = {
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'address': request.form.get('address'),
-                    'town': request.form.get('town'),
-                    'postal_code': request.form.get('postal_code'),
-                    'phone': phone,
-                    'mobile': request.form.get('mobile'),
-                    'email': request.form.get('email'),
-                    'source': request.form.get('source')
-                }
-                
-                client = Client(**client_data)
-                db.session.add(client)
-                db.session.flush()
-                logger.info(f"Created new client: {first_name} {last_name} with phone: {phone}")
-            
+            client_data = {
+                name: request.form.get(name)
+                for name in ['first_name', 'last_name', 'address', 'town', 'postal_code',
+                             'phone', 'mobile', 'email', 'source']
+            }
             sill_count = int(request.form.get('sill_count', 0))
-            for i in range(sill_count):
-                sill_data = {
-                    'client_id': client.id,
-                    'order_number': Sill.generate_order_number(),
-                    'length': float(request.form.get(f'sill_{i}_length')),
-                    'depth': float(request.form.get(f'sill_{i}_depth')),
+            sills_data = [
+                {
+                    'length': request.form.get(f'sill_{i}_length'),
+                    'depth': request.form.get(f'sill_{i}_depth'),
                     'location': request.form.get(f'sill_{i}_location'),
                     'color': request.form.get(f'sill_{i}_color'),
                     'sill_type': request.form.get(f'sill_{i}_type'),
                     'has_95mm': request.form.get(f'sill_{i}_has_95mm') == 'on'
                 }
-                new_sill = Sill(**sill_data)
-                db.session.add(new_sill)
+                for i in range(sill_count)
+            ]
             
+            result = ingest_contract(client_data, sills_data)
             db.session.commit()
             
-            if existing_client:
-                flash(f'Contract saved successfully. Added {sill_count} sills to existing client: {client.first_name} {client.last_name}', 'success')
+            name = f"{client_data['first_name']} {client_data['last_name']}"
+            if result.created_client:
+                flash(f'Contract saved successfully. Created new client: {name} with {result.inserted} sills', 'success')
             else:
-                flash(f'Contract saved successfully. Created new client: {client.first_name} {client.last_name} with {sill_count} sills', 'success')
+                flash(f'Contract saved successfully. Added {result.inserted} sills to existing client: {name}', 'success')
             
             return redirect(url_for('clients'))
             
+        except ContractValidationError as e:
+            db.session.rollback()
+            logger.warning("Contract not saved, %d invalid fields", len(e.errors))
+            flash(f'Contract not saved: {str(e)}', 'error')
+            return redirect(url_for('upload_contract'))
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error saving contract: {str(e)}")
+            logger.error("Error saving contract: %s", e)
             flash(f'Error saving contract: {str(e)}', 'error')
             return redirect(url_for('upload_contract'))
 
+    @app.route('/api/contracts', methods=['POST'])
+    @limiter.limit("20/minute")
+    def api_save_contract():
+        """Save a contract from JSON: {"client": {...}, "sills": [...], "partial": false}."""
+        payload = request.get_json(silent=True)
+        if (not isinstance(payload, dict) or not isinstance(payload.get('client') or {}, dict)
+                or not isinstance(payload.get('sills') or [], list)):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object with client and sills'}), 400
+        
+        try:
+            result = ingest_contract(payload.get('client') or {}, payload.get('sills') or [],
+                                     partial=bool(payload.get('partial', False)))
+            if result.errors and not result.inserted:
+                # Partial mode, but nothing was valid: keep the database untouched
+                db.session.rollback()
+                return jsonify({'status': 'error', 'message': 'No valid sills',
+                                'errors': [error.to_dict() for error in result.errors]}), 422
+            db.session.commit()
+        except ContractValidationError as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': 'Contract not saved',
+                            'errors': [error.to_dict() for error in e.errors]}), 422
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error saving contract via API: %s", e)
+            return jsonify({'status': 'error', 'message': 'Database error'}), 500
+        
+        return jsonify({'status': 'partial' if result.errors else 'success', **result.to_dict()}), 201
+
+    @app.route('/api/offcuts', methods=['GET'])
+    @limiter.limit("60/minute")
+    def api_list_offcuts():
+        """Offcuts in stock, shortest first; filter with ?board_key=...&status=available."""
+        status = request.args.get('status', 'available')
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        query = Offcut.query.filter_by(status=status)
+        board_key = request.args.get('board_key')
+        if board_key:
+            query = query.filter_by(board_key=board_key)
+        offcuts = query.order_by(Offcut.length, Offcut.id).limit(limit).all()
+        return jsonify({'offcuts': [offcut.to_dict() for offcut in offcuts]})
+
+    @app.route('/api/offcuts', methods=['POST'])
+    @limiter.limit("60/minute")
+    def api_create_offcut():
+        """Stock an offcut: {"board_key": "GP Board - White", "length": 1200, "source_client_id": 1}."""
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        
+        board_key = str(payload.get('board_key') or '').strip()
+        try:
+            length = float(payload.get('length'))
+        except (TypeError, ValueError):
+            length = 0
+        if not board_key or length <= 0:
+            return jsonify({'status': 'error', 'message': 'board_key and a positive length are required'}), 422
+        
+        try:
+            offcut = Offcut(board_key=board_key, length=length, status='available',
+                            source_client_id=payload.get('source_client_id'))
+            db.session.add(offcut)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error creating offcut: %s", e)
+            return jsonify({'status': 'error', 'message': 'Database error'}), 500
+        return jsonify({'status': 'success', 'offcut': offcut.to_dict()}), 201
+
+    @app.route('/api/offcuts/<int:offcut_id>/<any(reserve, release, consume, expire):action>', methods=['POST'])
+    @limiter.limit("60/minute")
+    def api_offcut_action(offcut_id, action):
+        """Reserve (needs {"client_id": ...}), release, consume or expire an offcut."""
+        payload = request.get_json(silent=True) or {}
+        client_id = payload.get('client_id')
+        if client_id is not None:
+            try:
+                client_id = int(client_id)
+            except (TypeError, ValueError):
+                return jsonify({'status': 'error', 'message': 'client_id must be a number'}), 422
+        elif action == 'reserve':
+            return jsonify({'status': 'error', 'message': 'client_id is required to reserve an offcut'}), 422
+        try:
+            offcut = offcut_transition(offcut_id, action, client_id=client_id)
+            db.session.commit()
+        except LookupError:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': 'Offcut not found'}), 404
+        except OffcutStateError as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': str(e)}), 409
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error on offcut %s %s: %s", offcut_id, action, e)
+            return jsonify({'status': 'error', 'message': 'Database error'}), 500
+        return jsonify({'status': 'success', 'offcut': offcut.to_dict()})
+
+    @app.route('/api/offcuts/expire', methods=['POST'])
+    @limiter.limit("10/minute")
+    def api_expire_offcuts():
+        """Expire available offcuts older than {"days": N} (OFFCUT_MAX_AGE_DAYS by default)."""
+        payload = request.get_json(silent=True) or {}
+        try:
+            days = int(payload.get('days', app.config['OFFCUT_MAX_AGE_DAYS']))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'days must be a whole number'}), 422
+        
+        try:
+            count = expire_offcuts(datetime.utcnow() - timedelta(days=days))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Error expiring offcuts: %s", e)
+            return jsonify({'status': 'error', 'message': 'Database error'}), 500
+        return jsonify({'status': 'success', 'expired': count})
+
+    @app.route('/api/clients/<int:client_id>/layout')
+    @limiter.limit("120/minute")
+    def api_client_layout(client_id):
+        """Cutting layout per board: stock length, offcut used and the sill pieces cut from it."""
+        return client_plan_response(client_id, 'layout', JobPlan.layout_dict)
+
+    @app.route('/api/clients/<int:client_id>/materials')
+    @limiter.limit("120/minute")
+    def api_client_materials(client_id):
+        return client_plan_response(client_id, 'materials', lambda plan: plan.materials)
+
+    @app.route('/api/clients/<int:client_id>/price')
+    @limiter.limit("120/minute")
+    def api_client_price(client_id):
+        return client_plan_response(client_id, 'price', JobPlan.price_dict)
+
+    @app.route('/api/clients/<int:client_id>/summary')
+    @limiter.limit("120/minute")
+    def api_client_summary(client_id):
+        """Stored job totals: sill count, metres per board, board count and costs."""
+        try:
+            if get_client(client_id) is None:
+                return jsonify({'status': 'error', 'message': 'Client not found'}), 404
+            summary = get_job_summaries([client_id]).get(client_id)
+        except SQLAlchemyError as e:
+            logger.error("Error loading job summary for client %s: %s", client_id, e)
+            return jsonify({'status': 'error', 'message': 'Database error'}), 500
+        if summary is None:
+            return jsonify({'status': 'error', 'message': 'Settings and material prices are not configured'}), 409
+        return jsonify({'status': 'success', 'summary': summary})
+
+    @app.route('/api/what-if', methods=['POST'])
+    @limiter.limit("30/minute")
+    def api_what_if():
+        """Layout, materials and price for {"sills": [...]} without saving anything.
+
+        Sills take the same fields as /api/contracts. Pieces refer to sills by
+        their position in the list, and only new boards are planned, not offcuts.
+        """
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('sills'), list) or not payload['sills']:
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object with a list of sills'}), 400
+        if len(payload['sills']) > app.config['WHAT_IF_MAX_SILLS']:
+            return jsonify({'status': 'error',
+                            'message': f"At most {app.config['WHAT_IF_MAX_SILLS']} sills per request"}), 422
+        
+        sills, errors = [], []
+        for index, data in enumerate(payload['sills']):
+            values, row_errors = validate_sill(data if isinstance(data, dict) else {}, index)
+            errors.extend(row_errors)
+            if values is not None:
+                # Never added to the session, so nothing is written
+                sills.append(Sill(id=index, status='active', order_date=datetime.utcnow(), **values))
+        if errors:
+            return jsonify({'status': 'error', 'message': 'Invalid sills',
+                            'errors': [error.to_dict() for error in errors]}), 422
+        
+        snapshot = get_settings_snapshot()
+        if not snapshot.settings or not snapshot.prices:
+            return jsonify({'status': 'error', 'message': 'Settings not found'}), 500
+        plan = build_job_plan(None, sills, snapshot, strategy=app.config['CUTTING_STRATEGY'])
+        return jsonify({
+            'layout': plan.layout_dict(),
+            'materials': plan.materials,
+            'price': plan.price_dict(),
+        })
+
     # Error handlers
     @app.errorhandler(404)
     def not_found_error(error):
-        logger.error(f"404 error: {request.url}")
+        logger.error("404 error: %s", request.url)
         return render_template('error.html',
                             error="Page not found",
                             error_type="404 Not Found",
@@ -784,7 +1227,7 @@ def register_routes(app):
 
     @app.errorhandler(429)
     def ratelimit_handler(error):
-        logger.error(f"Rate limit exceeded: {error}")
+        logger.error("Rate limit exceeded: %s", error)
         return render_template('error.html',
                             error="Rate limit exceeded.",
                             error_type="429 Too Many Requests",
@@ -792,141 +1235,3 @@ def register_routes(app):
 
 def allowed_file(filename: str, allowed_extensions: set) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
-
-def calculate_materials_for_sills(sills: List[Sill], settings: Settings) -> Dict:
-    total_main_boards_length = sum(
-        sill.length + settings.cutting_allowance 
-        for sill in sills
-    )
-
-    summed_materials = {
-        'boards': {},
-        'glues': {},
-        'silicones': {},
-        'other': {}
-    }
-    
-    # Get cutting layout to count actual boards needed
-    cutting_layouts = calculate_cutting_layout(sills)
-    
-    # Count actual boards from cutting layout with total length
-    for board_type, boards in cutting_layouts.items():
-        board_count = len(boards)  # Number of physical boards needed
-        total_length = sum(board['total_length'] for board in boards) / 1000  # Convert to meters
-        summed_materials['boards'][board_type] = {
-            'amount': board_count,
-            'total_length': total_length,
-            'unit': 'boards'
-        }
-
-    # Calculate materials based on total length
-    # Hot glue and fixall white should have same amount
-    fixall_base_amount = (total_main_boards_length / 1000) * settings.fixall_per_meter
-    colored_boards_length = sum(
-        sill.length + settings.cutting_allowance 
-        for sill in sills 
-        if sill.color != 'White'
-    )
-    fixall_extra_amount = (colored_boards_length / 1000) * settings.glue_color_extra
-    
-    total_fixall_amount = fixall_base_amount + fixall_extra_amount
-    
-    # Hot glue should match fixall white amount
-    summed_materials['glues']["Hot Glue"] = {
-        'amount': math.ceil(total_fixall_amount),
-        'unit': 'sticks'
-    }
-    
-    summed_materials['glues']["Fixall White"] = {
-        'amount': math.ceil(total_fixall_amount),
-        'unit': 'ml'
-    }
-
-    s2_clear_amount = (total_main_boards_length / 1000) * settings.silicone_per_meter
-    summed_materials['silicones']["S2 Clear Silicone"] = {'amount': s2_clear_amount, 'unit': 'bottles'}
-
-    color_silicones = {}
-    for sill in sills:
-        silicone_length = sill.length + settings.cutting_allowance
-        silicone_name = "Silicone White" if sill.color == 'White' else f"Silicone ({sill.color})"
-        
-        if silicone_name not in color_silicones:
-            color_silicones[silicone_name] = 0
-        color_silicones[silicone_name] += (silicone_length / 1000) * settings.silicone_color_per_meter
-
-    for silicone_name, amount in color_silicones.items():
-        summed_materials['silicones'][silicone_name] = {'amount': amount, 'unit': 'bottles'}
-
-    pvc_cleaner_amount = (total_main_boards_length / 1000) * settings.pvc_cleaner_per_meter
-    summed_materials['other']["PVC Cleaner"] = {'amount': pvc_cleaner_amount, 'unit': 'bottles'}
-
-    return {
-        'boards': [{'name': name, 'amount': data['amount'], 'total_length': data.get('total_length', 0), 'unit': data['unit']} 
-                  for name, data in summed_materials['boards'].items()],
-        'glues': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
-                 for name, data in summed_materials['glues'].items()],
-        'silicones': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
-                     for name, data in summed_materials['silicones'].items()],
-        'other': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
-                 for name, data in summed_materials['other'].items()]
-    }
-
-def calculate_costs_for_sills(sills: List[Sill], prices: MaterialPrices) -> List[Dict]:
-    sills_with_costs = []
-    for sill in sills:
-        material_cost = calculate_material_cost(sill, prices)
-        fitting_cost = calculate_fitting_cost(sill, prices)
-        total_sill_cost = material_cost + fitting_cost
-
-        sills_with_costs.append({
-            'sill': sill,
-            'material_cost': material_cost,
-            'fitting_cost': fitting_cost,
-            'total_cost': total_sill_cost
-        })
-
-    return sills_with_costs
-
-def calculate_material_cost(sill: Sill, prices: MaterialPrices) -> float:
-    material_cost = 0
-    standard_board_length = 6000
-    
-    # Board costs
-    boards_needed = math.ceil(sill.length / standard_board_length)
-    if sill.sill_type == 'Straight':
-        material_cost += boards_needed * prices.gp_board_price
-    else:
-        material_cost += boards_needed * prices.capit_board_price
-
-    if sill.has_95mm:
-        boards_95mm_needed = math.ceil(sill.length / standard_board_length)
-        material_cost += boards_95mm_needed * prices.board_95mm_price
-
-    # Hot Glue
-    if sill.color == 'White':
-        hot_glue_sticks = math.ceil(sill.length / 500)
-        material_cost += hot_glue_sticks * prices.hot_glue_price
-
-    # Silicone
-    silicone_tubes = math.ceil(sill.length / 3000)
-    material_cost += silicone_tubes * prices.silicone_price
-    material_cost += silicone_tubes * prices.s2_clear_silicone_price
-
-    return material_cost
-
-def calculate_fitting_cost(sill: Sill, prices: MaterialPrices) -> float:
-    fitting_cost = 0
-    
-    if sill.sill_type == 'Straight':
-        fitting_cost = prices.fitting_price_straight
-    elif sill.sill_type == 'C-shaped':
-        fitting_cost = prices.fitting_price_c_shape
-    elif sill.sill_type == 'Bay-Curve shaped':
-        fitting_cost = prices.fitting_price_bay_curve
-    elif sill.sill_type == 'Conservatory':
-        fitting_cost = prices.fitting_price_conservatory
-        
-    if sill.has_95mm:
-        fitting_cost += prices.fitting_price_95mm
-
-    return fitting_cost 
\ No newline at end of file
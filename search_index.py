@@ -0,0 +1,159 @@
+"""Full-text search over clients and their sills (SQLite FTS5).
+
+client_fts holds one document per client: name, phone numbers, email,
+address, town, postcode and the locations of the client's sills. SQL
+triggers on client and sill keep it in step, so ORM writes, bulk Core
+inserts and manual SQL are all indexed without extra application code.
+Phone numbers and postcodes are also indexed with spaces removed, so
+"02890" finds "028 9012 3456".
+
+The table's rank is bm25() with the column weights below, so a search is
+ORDER BY rank LIMIT n: FTS5 scores every match and builds snippets only
+for the rows it returns.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'client_fts'
+DEFAULT_LIMIT = 20
+
+# Column weights for bm25(); earlier columns rank higher on a match
+COLUMNS = ['name', 'phone', 'postal_code', 'address', 'town', 'email', 'locations']
+WEIGHTS = [10.0, 8.0, 8.0, 4.0, 2.0, 2.0, 1.0]
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    {', '.join(COLUMNS)},
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+)
+"""
+
+SET_RANK = (f"INSERT INTO {TABLE} ({TABLE}, rank) "
+            f"VALUES ('rank', 'bm25({', '.join(str(weight) for weight in WEIGHTS)})')")
+
+# Document for one client, selected from client/sill; :client_id is substituted per trigger
+_DOCUMENT_SELECT = f"""
+INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)})
+SELECT c.id,
+       c.first_name || ' ' || c.last_name,
+       c.phone || ' ' || replace(c.phone, ' ', '') || ' ' ||
+           coalesce(c.mobile, '') || ' ' || replace(coalesce(c.mobile, ''), ' ', ''),
+       c.postal_code || ' ' || replace(c.postal_code, ' ', ''),
+       c.address,
+       c.town,
+       coalesce(c.email, ''),
+       coalesce((SELECT group_concat(s.location, ' ') FROM sill s WHERE s.client_id = c.id), '')
+FROM client c WHERE c.id = :client_id;
+"""
+
+
+def _refresh(client_id: str) -> str:
+    return (f"DELETE FROM {TABLE} WHERE rowid = {client_id};\n"
+            + _DOCUMENT_SELECT.replace(':client_id', client_id))
+
+
+TRIGGERS = {
+    'client_fts_client_ai': f"AFTER INSERT ON client BEGIN {_refresh('new.id')} END",
+    'client_fts_client_au': f"AFTER UPDATE ON client BEGIN "
+                            f"DELETE FROM {TABLE} WHERE rowid = old.id; {_refresh('new.id')} END",
+    'client_fts_client_ad': f"AFTER DELETE ON client BEGIN DELETE FROM {TABLE} WHERE rowid = old.id; END",
+    'client_fts_sill_ai': f"AFTER INSERT ON sill BEGIN {_refresh('new.client_id')} END",
+    'client_fts_sill_au': f"AFTER UPDATE OF client_id, location ON sill BEGIN "
+                          f"{_refresh('old.client_id')} {_refresh('new.client_id')} END",
+    'client_fts_sill_ad': f"AFTER DELETE ON sill BEGIN {_refresh('old.client_id')} END",
+}
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    client_id: int
+    first_name: str
+    last_name: str
+    phone: str
+    town: str
+    postal_code: str
+    snippet: Markup
+    score: float
+
+
+def install_search_index(connection) -> bool:
+    """Create the FTS table and triggers if missing; returns True when the table was created."""
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': TABLE}
+    ).first() is not None
+
+    connection.exec_driver_sql(CREATE_TABLE)
+    # Stored with the table; set every time so an index made with other weights is updated
+    connection.exec_driver_sql(SET_RANK)
+    for name, body in TRIGGERS.items():
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    if not exists:
+        rebuild_search_index(connection)
+    return not exists
+
+
+def rebuild_search_index(connection) -> int:
+    """Re-index every client from scratch; returns the number of documents written."""
+    connection.exec_driver_sql(f"DELETE FROM {TABLE}")
+    connection.exec_driver_sql(
+        _DOCUMENT_SELECT.replace('WHERE c.id = :client_id', '').rstrip().rstrip(';')
+    )
+    connection.exec_driver_sql(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    count = connection.exec_driver_sql(f"SELECT COUNT(*) FROM {TABLE}").scalar()
+    logger.info("Rebuilt client search index with %d clients", count)
+    return count
+
+
+def build_match_query(q: Optional[str]) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    Words are reduced to letters and digits and quoted, so user input can
+    never be parsed as FTS5 syntax.
+    """
+    terms = [term for term in re.split(r'[^\w]+', (q or '').lower()) if term]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _highlight(snippet: str) -> Markup:
+    # snippet() marks matches with control characters; escape everything else
+    return Markup(str(escape(snippet)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+
+def search_clients(session, q: Optional[str], limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+    """Clients matching q, best match first."""
+    match = build_match_query(q)
+    if match is None:
+        return []
+
+    rows = session.execute(text(f"""
+        SELECT c.id, c.first_name, c.last_name, c.phone, c.town, c.postal_code,
+               m.snippet, m.score
+        FROM (
+            SELECT rowid AS client_id,
+                   snippet({TABLE}, -1, char(2), char(3), '…', 10) AS snippet,
+                   rank AS score
+            FROM {TABLE}
+            WHERE {TABLE} MATCH :match
+            ORDER BY rank
+            LIMIT :limit
+        ) AS m
+        JOIN client c ON c.id = m.client_id
+        ORDER BY m.score
+    """), {'match': match, 'limit': limit})
+
+    return [
+        SearchHit(row.id, row.first_name, row.last_name, row.phone, row.town, row.postal_code,
+                  _highlight(row.snippet), row.score)
+        for row in rows
+    ]
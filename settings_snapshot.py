@@ -0,0 +1,144 @@
+"""Immutable, in-process snapshot of the Settings, MaterialPrices, DefaultSettings and BoardStock rows.
+
+The calculators receive the snapshot explicitly instead of querying the
+settings tables themselves, so a request costs the same number of queries
+whatever the number of sills. The snapshot is cached per process and is
+dropped by the routes that change settings. Each request also compares it
+with the settings version in the database (DataVersion.SETTINGS, bumped by
+every write to the settings tables), so other worker processes reload on
+their next request after a change. SETTINGS_SNAPSHOT_TTL is a backstop for
+changes made outside the application.
+"""
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields, asdict
+from typing import Optional
+
+from flask import current_app, g, has_app_context
+
+from board_stock import StockCatalogue
+from models import Settings, MaterialPrices, DefaultSettings, BoardStock, DataVersion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30  # seconds
+
+
+@dataclass(frozen=True)
+class SettingsValues:
+    plate_length: float
+    length_95mm: float
+    cutting_allowance: float
+    hot_glue_per_meter: float
+    glue_with_activator_per_meter: float
+    silicone_per_meter: float
+    silicone_color_per_meter: float
+    pvc_cleaner_per_meter: float
+    fixall_per_meter: float
+    glue_color_extra: float
+
+    @classmethod
+    def from_model(cls, row) -> 'SettingsValues':
+        return cls(**{field.name: getattr(row, field.name) for field in fields(cls)})
+
+
+@dataclass(frozen=True)
+class PriceValues:
+    gp_board_price: float
+    capit_board_price: float
+    board_95mm_price: float
+    glue_price: float
+    hot_glue_price: float
+    silicone_price: float
+    silicone_color_price: float
+    pvc_cleaner_price: float
+    s2_clear_silicone_price: float
+    fixall_white_price: float
+    glue_with_activator_price: float
+    fitting_price_straight: float
+    fitting_price_c_shape: float
+    fitting_price_bay_curve: float
+    fitting_price_conservatory: float
+    fitting_price_95mm: float
+
+    @classmethod
+    def from_model(cls, row) -> 'PriceValues':
+        return cls(**{field.name: getattr(row, field.name) for field in fields(cls)})
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    settings: Optional[SettingsValues]
+    prices: Optional[PriceValues]
+    defaults: Optional[SettingsValues]
+    stock: StockCatalogue
+    # Content hash of the values above, stable across processes
+    version: str
+    loaded_at: float
+    # DataVersion.SETTINGS counter the snapshot was loaded at
+    settings_version: int = 0
+
+
+_lock = threading.Lock()
+_snapshot: Optional[SettingsSnapshot] = None
+
+
+def load_settings_snapshot(settings_version: int = 0) -> SettingsSnapshot:
+    """Read the settings tables and build a new snapshot."""
+    settings = Settings.query.first()
+    prices = MaterialPrices.query.first()
+    defaults = DefaultSettings.query.first()
+    stock_rows = [(row.board_type, row.length, row.price)
+                  for row in BoardStock.query.order_by(BoardStock.board_type, BoardStock.length)]
+
+    settings_values = SettingsValues.from_model(settings) if settings else None
+    price_values = PriceValues.from_model(prices) if prices else None
+    default_values = SettingsValues.from_model(defaults) if defaults else None
+
+    digest = hashlib.sha256()
+    for values in (settings_values, price_values, default_values):
+        digest.update(repr(sorted(asdict(values).items()) if values else None).encode('utf-8'))
+    digest.update(repr(stock_rows).encode('utf-8'))
+
+    return SettingsSnapshot(
+        settings=settings_values,
+        prices=price_values,
+        defaults=default_values,
+        stock=StockCatalogue.build(stock_rows, settings_values, price_values),
+        version=digest.hexdigest()[:16],
+        loaded_at=time.monotonic(),
+        settings_version=settings_version
+    )
+
+
+def get_settings_snapshot() -> SettingsSnapshot:
+    """Return the current snapshot, loading it at most once per request."""
+    if has_app_context() and 'settings_snapshot' in g:
+        return g.settings_snapshot
+
+    global _snapshot
+    ttl = current_app.config.get('SETTINGS_SNAPSHOT_TTL', DEFAULT_TTL) if has_app_context() else DEFAULT_TTL
+    settings_version = DataVersion.current(DataVersion.SETTINGS) if has_app_context() else None
+    with _lock:
+        snapshot = _snapshot
+        if (snapshot is None or settings_version not in (None, snapshot.settings_version)
+                or time.monotonic() - snapshot.loaded_at > ttl):
+            snapshot = load_settings_snapshot(settings_version or 0)
+            _snapshot = snapshot
+            logger.debug("Loaded settings snapshot %s", snapshot.version)
+
+    if has_app_context():
+        g.settings_snapshot = snapshot
+    return snapshot
+
+
+def invalidate_settings_snapshot() -> None:
+    """Drop the cached snapshot after settings, prices, defaults or board stock have changed."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+    if has_app_context():
+        g.pop('settings_snapshot', None)
+    logger.debug("Settings snapshot invalidated")
@@ -0,0 +1,195 @@
+"""Per-request SQL profiler for development, to find N+1 query patterns.
+
+When SQL_PROFILER_ENABLED is set (or the app runs in debug mode) every
+statement a request executes is recorded and grouped by its normalised
+SQL, with literals and IN lists collapsed. Statements fired by a lazy
+relationship load are tagged with the relationship, e.g. Client.sills. A
+statement that runs SQL_PROFILER_REPEAT_THRESHOLD times or more in one
+request is flagged: as N+1 when lazy loads cause it, as repeated otherwise.
+
+Every profiled response carries X-SQL-Queries and X-SQL-Time-Ms headers,
+plus X-SQL-N-Plus-One when something was flagged. HTML pages also get a
+summary panel. A request that runs more statements than its budget is
+logged. The budget is SQL_QUERY_BUDGET, or the view's own one set with
+@query_budget. With SQL_PROFILER_STRICT it raises QueryBudgetExceeded
+instead, which fails the test that made the request.
+"""
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_request_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+_LAZY_OPTION = 'sql_profiler_lazy_load'
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more SQL statements than its budget allows (strict mode)."""
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL with literals replaced by ? and IN lists collapsed, so repeats group together."""
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('(?)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+@dataclass
+class StatementGroup:
+    sql: str
+    count: int = 0
+    seconds: float = 0.0
+    lazy_load: Optional[str] = None  # relationship, when the statement is a lazy load
+
+
+@dataclass
+class RequestProfile:
+    groups: Dict[str, StatementGroup] = field(default_factory=dict)
+    count: int = 0
+    seconds: float = 0.0
+
+    def record(self, statement: str, seconds: float, lazy_load: Optional[str]) -> None:
+        sql = normalize_sql(statement)
+        group = self.groups.get(sql)
+        if group is None:
+            group = self.groups[sql] = StatementGroup(sql)
+        group.count += 1
+        group.seconds += seconds
+        group.lazy_load = group.lazy_load or lazy_load
+        self.count += 1
+        self.seconds += seconds
+
+    def flagged(self, threshold: int) -> List[StatementGroup]:
+        """Statement groups run at least threshold times, most frequent first."""
+        return sorted((group for group in self.groups.values() if group.count >= threshold),
+                      key=lambda group: group.count, reverse=True)
+
+    def by_time(self) -> List[StatementGroup]:
+        return sorted(self.groups.values(), key=lambda group: group.seconds, reverse=True)
+
+
+def query_budget(limit: int):
+    """Set the most SQL statements a view may run, overriding SQL_QUERY_BUDGET."""
+    def decorator(view):
+        view.sql_query_budget = limit
+        return view
+    return decorator
+
+
+def _profile() -> Optional[RequestProfile]:
+    if has_request_context():
+        return g.get('sql_profile')
+    return None
+
+
+def _do_orm_execute(orm_execute_state):
+    if (orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None
+            and _profile() is not None):
+        relationship = orm_execute_state.loader_strategy_path[-1]
+        orm_execute_state.update_execution_options(**{_LAZY_OPTION: str(relationship)})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile() is not None:
+        context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profiler_start', None)
+    profile = _profile()
+    if start is not None and profile is not None:
+        profile.record(statement, time.perf_counter() - start, context.execution_options.get(_LAZY_OPTION))
+
+
+def _describe(group: StatementGroup) -> str:
+    cause = f"lazy load of {group.lazy_load}" if group.lazy_load else 'repeated'
+    return f"{group.count}x {cause}: {group.sql[:200]}"
+
+
+def _panel(profile: RequestProfile, flagged: List[StatementGroup], budget: Optional[int]) -> str:
+    summary = f"SQL: {profile.count} statements in {profile.seconds * 1000:.1f} ms"
+    if budget is not None:
+        summary += f" (budget {budget})"
+    if flagged:
+        summary += f" - {len(flagged)} flagged"
+    warnings = ''.join(f"<li>{escape(_describe(group))}</li>" for group in flagged)
+    rows = ''.join(
+        f"<tr><td>{group.count}</td><td>{group.seconds * 1000:.1f}</td>"
+        f"<td>{escape(group.lazy_load or '')}</td><td><code>{escape(group.sql)}</code></td></tr>"
+        for group in profile.by_time()
+    )
+    is_open = ' open' if flagged or (budget is not None and profile.count > budget) else ''
+    return (
+        f'<div id="sql-profiler" class="container my-4"><details class="card card-body small"{is_open}>'
+        f'<summary>{summary}</summary>'
+        f'<ul class="text-danger mt-2">{warnings}</ul>'
+        '<table class="table table-sm mt-2"><thead><tr><th>Runs</th><th>ms</th>'
+        '<th>Lazy load</th><th>Statement</th></tr></thead>'
+        f'<tbody>{rows}</tbody></table></details></div>'
+    )
+
+
+def _budget() -> Optional[int]:
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    budget = getattr(view, 'sql_query_budget', None)
+    if budget is None:
+        budget = current_app.config['SQL_QUERY_BUDGET'] or None
+    return budget
+
+
+def init_sql_profiler(app) -> None:
+    """Install the profiler hooks; they stay idle unless the profiler is on for the app."""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        if app.config['SQL_PROFILER_ENABLED'] or app.debug:
+            g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def report_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        flagged = profile.flagged(app.config['SQL_PROFILER_REPEAT_THRESHOLD'])
+        budget = _budget()
+        response.headers['X-SQL-Queries'] = str(profile.count)
+        response.headers['X-SQL-Time-Ms'] = f"{profile.seconds * 1000:.1f}"
+        if flagged:
+            response.headers['X-SQL-N-Plus-One'] = ', '.join(
+                f"{group.lazy_load or 'repeated'}x{group.count}" for group in flagged
+            )
+            for group in flagged:
+                logger.warning("%s %s: %s", request.method, request.path, _describe(group))
+
+        if budget is not None and profile.count > budget:
+            message = f"{request.method} {request.path} ran {profile.count} SQL statements, budget is {budget}"
+            if app.config['SQL_PROFILER_STRICT']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        if (response.mimetype == 'text/html' and response.status_code == 200
+                and not response.is_streamed and not response.direct_passthrough):
+            body = response.get_data(as_text=True)
+            position = body.rfind('</body>')
+            if position != -1:
+                response.set_data(body[:position] + _panel(profile, flagged, budget) + body[position:])
+        return response
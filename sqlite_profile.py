@@ -0,0 +1,90 @@
+"""SQLite engine profile: pragmas applied to every connection and pool sizing.
+
+WAL journaling lets readers carry on while a writer commits, and a busy
+timeout makes writers wait for the lock instead of failing with "database
+is locked". Together they allow several gunicorn workers and threads to
+share the same database file.
+"""
+import logging
+from typing import Dict
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'cache_size': -64000,  # negative means KiB, so 64 MB
+    'mmap_size': 268435456,  # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+# Values SQLite reports back for the symbolic settings above
+_REPORTED_VALUES = {
+    'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3},
+    'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2},
+}
+
+
+def is_sqlite_file(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configure_engine_options(app: Flask) -> None:
+    """Size the connection pool for threaded workers; call before db.init_app."""
+    if not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_size', app.config.get('SQLITE_POOL_SIZE', 10))
+    options.setdefault('max_overflow', app.config.get('SQLITE_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', 30)
+    options.setdefault('pool_pre_ping', True)
+    connect_args = dict(options.get('connect_args') or {})
+    # Pooled connections move between threads; busy waiting is handled by the pragma
+    connect_args.setdefault('check_same_thread', False)
+    options['connect_args'] = connect_args
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def register_pragmas(app: Flask) -> None:
+    """Apply the configured pragmas to every new connection; call after db.init_app."""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    pragmas: Dict[str, object] = app.config.get('SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', apply_pragmas)
+
+
+def check_pragmas(app: Flask) -> Dict[str, object]:
+    """Log the pragmas actually in effect and warn about any the database did not accept."""
+    pragmas = app.config.get('SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    effective = {}
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for name, wanted in pragmas.items():
+                actual = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                effective[name] = actual
+                expected = _REPORTED_VALUES.get(name, {}).get(str(wanted).upper(), wanted)
+                if str(actual).lower() != str(expected).lower():
+                    logger.warning("SQLite pragma %s is %s, expected %s", name, actual, wanted)
+
+    logger.info("SQLite pragmas in effect: %s", ', '.join(f"{k}={v}" for k, v in effective.items()))
+    return effective
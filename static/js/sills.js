@@ -253,6 +253,53 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     };
 
+    // Client search for the edit form; options come from the server a few at a time
+    const editClientSearch = document.getElementById('edit_client_search');
+    const editClientSelect = document.getElementById('edit_client');
+    if (editClientSearch && editClientSelect) {
+        let searchTimer = null;
+        let searchController = null;
+
+        editClientSearch.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            const query = this.value.trim();
+            searchTimer = setTimeout(function() {
+                if (searchController) {
+                    searchController.abort();
+                }
+                searchController = new AbortController();
+
+                fetch(`/api/clients/autocomplete?q=${encodeURIComponent(query)}`, {
+                    headers: { 'Accept': 'application/json' },
+                    signal: searchController.signal
+                })
+                .then(response => response.json())
+                .then(data => {
+                    // Keep the current choice so the sill is not moved by accident
+                    const selected = editClientSelect.options[editClientSelect.selectedIndex];
+                    editClientSelect.innerHTML = '';
+                    if (selected) {
+                        editClientSelect.appendChild(selected);
+                    }
+                    data.clients.forEach(client => {
+                        if (selected && String(client.id) === selected.value) {
+                            return;
+                        }
+                        const option = document.createElement('option');
+                        option.value = client.id;
+                        option.textContent = client.label;
+                        editClientSelect.appendChild(option);
+                    });
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Client search failed:', error);
+                    }
+                });
+            }, 250);
+        });
+    }
+
     // Handle client selection
     if (clientSelectDropdown) {
         clientSelectDropdown.addEventListener('change', function() {
@@ -0,0 +1,90 @@
+import math
+import random
+
+import pytest
+
+from cutting_optimizer import (
+    EPSILON, best_fit_decreasing, branch_and_bound, first_fit_decreasing, optimize_cuts
+)
+
+BOARD = 6000
+
+
+def random_lengths(seed, count, low=200, high=3000):
+    rng = random.Random(seed)
+    return [round(rng.uniform(low, high), 1) for _ in range(count)]
+
+
+def assert_valid_layout(lengths, boards, board_length):
+    placed = sorted(index for board in boards for index in board)
+    assert placed == list(range(len(lengths)))
+    for board in boards:
+        assert board
+        assert sum(lengths[i] for i in board) <= board_length + EPSILON
+
+
+def replay(lengths, boards, board_length, choose):
+    """Re-run the placements longest piece first, checking each against choose(remaining, length)."""
+    board_of = {index: number for number, board in enumerate(boards) for index in board}
+    remaining = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        fitting = [number for number, space in enumerate(remaining) if space + EPSILON >= lengths[index]]
+        expected = choose(remaining, fitting) if fitting else len(remaining)
+        assert board_of[index] == expected
+        if expected == len(remaining):
+            remaining.append(board_length)
+        remaining[expected] -= lengths[index]
+
+
+@pytest.mark.parametrize('strategy', ['ffd', 'bfd', 'exact', 'auto'])
+@pytest.mark.parametrize('count', [1, 7, 20, 300])
+def test_every_strategy_places_each_piece_once_within_the_board(strategy, count):
+    lengths = random_lengths(count, count)
+    assert_valid_layout(lengths, optimize_cuts(lengths, BOARD, strategy=strategy), BOARD)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_first_fit_decreasing_uses_the_first_board_with_room(seed):
+    lengths = random_lengths(seed, 60)
+    replay(lengths, first_fit_decreasing(lengths, BOARD), BOARD,
+           lambda remaining, fitting: fitting[0])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_best_fit_decreasing_uses_the_tightest_board(seed):
+    lengths = random_lengths(seed, 60)
+    replay(lengths, best_fit_decreasing(lengths, BOARD), BOARD,
+           lambda remaining, fitting: min(fitting, key=lambda number: (remaining[number], number)))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_exact_never_uses_more_boards_than_best_fit(seed):
+    lengths = random_lengths(seed, 12, 500, 4000)
+    exact = optimize_cuts(lengths, BOARD, strategy='exact')
+    assert_valid_layout(lengths, exact, BOARD)
+    assert math.ceil(sum(lengths) / BOARD - EPSILON) <= len(exact) <= len(best_fit_decreasing(lengths, BOARD))
+
+
+def test_exact_finds_a_layout_best_fit_misses():
+    lengths = [4, 4, 9, 3, 2, 2, 7, 5, 3]
+    assert len(best_fit_decreasing(lengths, 10)) == 5
+    exact = branch_and_bound(lengths, 10, time_budget=5)
+    assert_valid_layout(lengths, exact, 10)
+    assert len(exact) == 4
+
+
+def test_exact_falls_back_to_best_fit_above_the_piece_limit():
+    lengths = random_lengths(42, 1500)
+    boards = optimize_cuts(lengths, BOARD, strategy='exact')
+    assert_valid_layout(lengths, boards, BOARD)
+    assert boards == best_fit_decreasing(lengths, BOARD)
+
+
+def test_piece_longer_than_the_board_is_rejected():
+    with pytest.raises(ValueError):
+        optimize_cuts([BOARD + 1], BOARD, strategy='bfd')
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        optimize_cuts([1000], BOARD, strategy='nope')
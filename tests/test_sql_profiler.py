@@ -0,0 +1,68 @@
+import pytest
+from flask import Flask
+
+from extensions import db
+from models import Client
+from sql_profiler import QueryBudgetExceeded, init_sql_profiler, normalize_sql, query_budget
+
+CLIENTS = 3
+
+
+def make_app(strict):
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQL_PROFILER_ENABLED=True,
+        SQL_PROFILER_STRICT=strict,
+        SQL_PROFILER_REPEAT_THRESHOLD=CLIENTS,
+        SQL_QUERY_BUDGET=0,
+    )
+    db.init_app(app)
+    init_sql_profiler(app)
+
+    @app.route('/sill-counts')
+    @query_budget(2)
+    def sill_counts():
+        # One query for the clients, then one lazy load of Client.sills each
+        return {client.id: len(client.sills) for client in Client.query.all()}
+
+    @app.route('/client-count')
+    @query_budget(2)
+    def client_count():
+        return str(Client.query.count())
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Client(first_name=f'F{i}', last_name=f'L{i}', phone='028 9012 3456',
+                                  address='1 Main Road', town='Belfast', postal_code='BT1 1AA')
+                           for i in range(CLIENTS))
+        db.session.commit()
+    return app
+
+
+def test_strict_mode_fails_a_request_over_its_budget():
+    client = make_app(strict=True).test_client()
+    with pytest.raises(QueryBudgetExceeded, match='ran 4 SQL statements, budget is 2'):
+        client.get('/sill-counts')
+
+
+def test_strict_mode_passes_a_request_within_its_budget():
+    response = make_app(strict=True).test_client().get('/client-count')
+    assert response.status_code == 200
+    assert response.headers['X-SQL-Queries'] == '1'
+    assert 'X-SQL-N-Plus-One' not in response.headers
+
+
+def test_headers_report_n_plus_one_when_not_strict():
+    response = make_app(strict=False).test_client().get('/sill-counts')
+    assert response.status_code == 200
+    assert response.headers['X-SQL-Queries'] == str(CLIENTS + 1)
+    assert response.headers['X-SQL-N-Plus-One'] == f'Client.sillsx{CLIENTS}'
+    assert 'X-SQL-Time-Ms' in response.headers
+
+
+def test_normalize_sql_groups_statements_that_differ_only_in_literals():
+    assert (normalize_sql("SELECT * FROM sill WHERE client_id IN (1, 2, 3) AND color = 'Oak'")
+            == normalize_sql("SELECT * FROM sill  WHERE client_id IN (7, 8) AND color = 'White'")
+            == 'SELECT * FROM sill WHERE client_id IN (?) AND color = ?')
@@ -1,7 +1,12 @@
 import re
 import math
+import time
 from typing import Dict, List, Tuple, Optional
-from models import Settings, Sill
+from models import Sill
+from cutting_optimizer import cheapest_stock_mix, fill_offcuts, DEFAULT_STRATEGY
+from board_stock import StockCatalogue, DEFAULT_BOARD_LENGTH, stock_summary
+from settings_snapshot import SettingsValues, PriceValues
+from metrics import record_layout
 
 def validate_uk_postcode(postcode: str) -> bool:
     """Validate UK postcode format."""
@@ -27,9 +32,8 @@ def get_capit_board_size(depth: float) -> int:
     else:
         return 300
 
-def calculate_materials(sill: Sill) -> Dict[str, List[Dict[str, float]]]:
-    """Calculate materials needed for a window sill."""
-    settings = Settings.query.first()
+def calculate_materials(sill: Sill, settings: Optional[SettingsValues]) -> Dict[str, List[Dict[str, float]]]:
+    """Calculate materials needed for a window sill using the settings snapshot."""
     if not settings:
         return {}
 
@@ -126,60 +130,237 @@ def calculate_materials(sill: Sill) -> Dict[str, List[Dict[str, float]]]:
 
     return materials
 
-def calculate_cutting_layout(sills: List[Sill], board_length: int = 5000) -> Dict[str, List[Dict]]:
-    """Calculate optimal cutting layout for boards."""
-    all_materials = {}
-    settings = Settings.query.first()
+def calculate_cutting_layout(sills: List[Sill], settings: Optional[SettingsValues],
+                             board_length: Optional[float] = None,
+                             strategy: str = DEFAULT_STRATEGY,
+                             offcuts: Optional[Dict[str, List[Tuple[int, float]]]] = None,
+                             stock: Optional[StockCatalogue] = None) -> Dict[str, List[Dict]]:
+    """Calculate optimal cutting layout for boards.
+
+    Boards are bought from the stock catalogue, picking the cheapest mix of
+    stock lengths per board; without one every board is board_length long,
+    or Settings.plate_length. offcuts maps a board name to (offcut id,
+    length) pairs in stock; pieces are cut from those first and new boards
+    are opened for the rest.
+    """
+    if stock is None:
+        stock = StockCatalogue.uniform(
+            board_length or (settings.plate_length if settings else DEFAULT_BOARD_LENGTH)
+        )
     
     # Default cutting allowance if no settings found
     cutting_allowance = settings.cutting_allowance if settings else 2.0
     
+    # Collect the pieces to cut for every board type
+    pieces_by_board: Dict[str, List[Dict]] = {}
     for sill in sills:
-        sill_materials = calculate_materials(sill)
+        sill_materials = calculate_materials(sill, settings)
         
-        for board in sill_materials['boards']:
-            board_key = board['name']
-            
-            if board_key not in all_materials:
-                all_materials[board_key] = []
-                
-            sill_length = sill.length + cutting_allowance
-            remaining_length = sill_length
+        for board in sill_materials.get('boards', []):
+            board_pieces = pieces_by_board.setdefault(board['name'], [])
+            remaining_length = sill.length + cutting_allowance
+            max_length = stock.max_length(board['name'])
             
+            # Sills longer than the longest stock board are split across several boards
             while remaining_length > 0:
-                current_length = min(remaining_length, board_length)
-                board_found = False
-                
-                for board_pieces in all_materials[board_key]:
-                    total_length = sum(piece['length'] for piece in board_pieces['pieces'])
-                    if total_length + current_length <= board_length:
-                        board_pieces['pieces'].append({
-                            'id': sill.id,
-                            'length': current_length,
-                            'original_length': sill.length,
-                            'cutting_allowance': cutting_allowance,
-                            'location': sill.location,
-                            'color': sill.color
-                        })
-                        board_pieces['total_length'] = total_length + current_length
-                        board_pieces['remaining_length'] = board_length - (total_length + current_length)
-                        board_found = True
-                        break
-                
-                if not board_found:
-                    all_materials[board_key].append({
-                        'pieces': [{
-                            'id': sill.id,
-                            'length': current_length,
-                            'original_length': sill.length,
-                            'cutting_allowance': cutting_allowance,
-                            'location': sill.location,
-                            'color': sill.color
-                        }],
-                        'total_length': current_length,
-                        'remaining_length': board_length - current_length
-                    })
-                
+                current_length = min(remaining_length, max_length)
+                board_pieces.append({
+                    'id': sill.id,
+                    'length': current_length,
+                    'original_length': sill.length,
+                    'cutting_allowance': cutting_allowance,
+                    'location': sill.location,
+                    'color': sill.color
+                })
                 remaining_length -= current_length
     
-    return all_materials 
\ No newline at end of file
+    def layout_board(board_pieces: List[Dict], length: float, offcut_id: Optional[int] = None) -> Dict:
+        total_length = sum(piece['length'] for piece in board_pieces)
+        return {
+            'pieces': board_pieces,
+            'total_length': total_length,
+            'remaining_length': length - total_length,
+            'board_length': length,
+            'offcut_id': offcut_id
+        }
+    
+    started = time.perf_counter()
+    new_boards = 0
+    all_materials = {}
+    for board_key, pieces in pieces_by_board.items():
+        lengths = [piece['length'] for piece in pieces]
+        all_materials[board_key] = []
+        
+        remaining = list(range(len(pieces)))
+        in_stock = (offcuts or {}).get(board_key)
+        if in_stock:
+            on_offcuts, remaining = fill_offcuts(lengths, [length for _, length in in_stock])
+            for (offcut_id, offcut_length), board_indices in zip(in_stock, on_offcuts):
+                if board_indices:
+                    all_materials[board_key].append(
+                        layout_board([pieces[i] for i in board_indices], offcut_length, offcut_id)
+                    )
+        
+        layout = cheapest_stock_mix([lengths[i] for i in remaining], stock.stock_for(board_key),
+                                    strategy=strategy)
+        for stock_length, board_indices in layout:
+            all_materials[board_key].append(
+                layout_board([pieces[remaining[i]] for i in board_indices], stock_length)
+            )
+        new_boards += len(layout)
+    
+    record_layout('job', strategy, time.perf_counter() - started, new_boards)
+    return all_materials
+
+def calculate_materials_for_sills(sills: List[Sill], settings: SettingsValues,
+                                  strategy: str = DEFAULT_STRATEGY,
+                                  cutting_layouts: Optional[Dict[str, List[Dict]]] = None,
+                                  stock: Optional[StockCatalogue] = None) -> Dict:
+    total_main_boards_length = sum(
+        sill.length + settings.cutting_allowance 
+        for sill in sills
+    )
+
+    summed_materials = {
+        'boards': {},
+        'glues': {},
+        'silicones': {},
+        'other': {}
+    }
+    
+    # Get cutting layout to count actual boards needed, unless the caller already has it
+    if cutting_layouts is None:
+        cutting_layouts = calculate_cutting_layout(sills, settings, strategy=strategy, stock=stock)
+    
+    # Count actual boards from cutting layout with total length
+    for board_type, boards in cutting_layouts.items():
+        # New boards needed; pieces cut from offcuts in stock need none
+        board_count = sum(1 for board in boards if board.get('offcut_id') is None)
+        total_length = sum(board['total_length'] for board in boards) / 1000  # Convert to meters
+        summed_materials['boards'][board_type] = {
+            'amount': board_count,
+            'total_length': total_length,
+            'stock': stock_summary(boards),
+            'unit': 'boards'
+        }
+
+    # Calculate materials based on total length
+    # Hot glue and fixall white should have same amount
+    fixall_base_amount = (total_main_boards_length / 1000) * settings.fixall_per_meter
+    colored_boards_length = sum(
+        sill.length + settings.cutting_allowance 
+        for sill in sills 
+        if sill.color != 'White'
+    )
+    fixall_extra_amount = (colored_boards_length / 1000) * settings.glue_color_extra
+    
+    total_fixall_amount = fixall_base_amount + fixall_extra_amount
+    
+    # Hot glue should match fixall white amount
+    summed_materials['glues']["Hot Glue"] = {
+        'amount': math.ceil(total_fixall_amount),
+        'unit': 'sticks'
+    }
+    
+    summed_materials['glues']["Fixall White"] = {
+        'amount': math.ceil(total_fixall_amount),
+        'unit': 'ml'
+    }
+
+    s2_clear_amount = (total_main_boards_length / 1000) * settings.silicone_per_meter
+    summed_materials['silicones']["S2 Clear Silicone"] = {'amount': s2_clear_amount, 'unit': 'bottles'}
+
+    color_silicones = {}
+    for sill in sills:
+        silicone_length = sill.length + settings.cutting_allowance
+        silicone_name = "Silicone White" if sill.color == 'White' else f"Silicone ({sill.color})"
+        
+        if silicone_name not in color_silicones:
+            color_silicones[silicone_name] = 0
+        color_silicones[silicone_name] += (silicone_length / 1000) * settings.silicone_color_per_meter
+
+    for silicone_name, amount in color_silicones.items():
+        summed_materials['silicones'][silicone_name] = {'amount': amount, 'unit': 'bottles'}
+
+    pvc_cleaner_amount = (total_main_boards_length / 1000) * settings.pvc_cleaner_per_meter
+    summed_materials['other']["PVC Cleaner"] = {'amount': pvc_cleaner_amount, 'unit': 'bottles'}
+
+    return {
+        'boards': [{'name': name, 'amount': data['amount'], 'total_length': data.get('total_length', 0),
+                    'stock': data.get('stock', []), 'unit': data['unit']} 
+                  for name, data in summed_materials['boards'].items()],
+        'glues': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
+                 for name, data in summed_materials['glues'].items()],
+        'silicones': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
+                     for name, data in summed_materials['silicones'].items()],
+        'other': [{'name': name, 'amount': data['amount'], 'unit': data['unit']} 
+                 for name, data in summed_materials['other'].items()]
+    }
+
+def calculate_costs_for_sills(sills: List[Sill], prices: PriceValues,
+                              stock: Optional[StockCatalogue] = None) -> List[Dict]:
+    if stock is None:
+        stock = StockCatalogue.build([], prices=prices)
+    sills_with_costs = []
+    for sill in sills:
+        material_cost = calculate_material_cost(sill, prices, stock)
+        fitting_cost = calculate_fitting_cost(sill, prices)
+        total_sill_cost = material_cost + fitting_cost
+
+        sills_with_costs.append({
+            'sill': sill,
+            'material_cost': material_cost,
+            'fitting_cost': fitting_cost,
+            'total_cost': total_sill_cost
+        })
+
+    return sills_with_costs
+
+def calculate_material_cost(sill: Sill, prices: PriceValues,
+                            stock: Optional[StockCatalogue] = None) -> float:
+    """Material cost of one sill; boards are priced from the stock catalogue.
+
+    Without a catalogue boards are 6000mm at the MaterialPrices board prices.
+    """
+    if stock is None:
+        stock = StockCatalogue.build([], prices=prices)
+    material_cost = 0
+    
+    # Board costs
+    if sill.sill_type == 'Straight':
+        material_cost += stock.piece_cost(f"GP Board - {sill.color}", sill.length)
+    else:
+        capit_size = get_capit_board_size(sill.depth)
+        material_cost += stock.piece_cost(f"Capit Board {capit_size}mm - {sill.color}", sill.length)
+
+    if sill.has_95mm:
+        material_cost += stock.piece_cost(f"95mm Board - {sill.color}", sill.length)
+
+    # Hot Glue
+    if sill.color == 'White':
+        hot_glue_sticks = math.ceil(sill.length / 500)
+        material_cost += hot_glue_sticks * prices.hot_glue_price
+
+    # Silicone
+    silicone_tubes = math.ceil(sill.length / 3000)
+    material_cost += silicone_tubes * prices.silicone_price
+    material_cost += silicone_tubes * prices.s2_clear_silicone_price
+
+    return material_cost
+
+def calculate_fitting_cost(sill: Sill, prices: PriceValues) -> float:
+    fitting_cost = 0
+    
+    if sill.sill_type == 'Straight':
+        fitting_cost = prices.fitting_price_straight
+    elif sill.sill_type == 'C-shaped':
+        fitting_cost = prices.fitting_price_c_shape
+    elif sill.sill_type == 'Bay-Curve shaped':
+        fitting_cost = prices.fitting_price_bay_curve
+    elif sill.sill_type == 'Conservatory':
+        fitting_cost = prices.fitting_price_conservatory
+        
+    if sill.has_95mm:
+        fitting_cost += prices.fitting_price_95mm
+
+    return fitting_cost
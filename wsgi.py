@@ -0,0 +1,10 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Database setup is not done here; gunicorn.conf.py runs it once in the master
+process before any worker starts.
+"""
+from app import create_app
+
+app = create_app()